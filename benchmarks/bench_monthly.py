@@ -0,0 +1,45 @@
+"""Compara o modelo anual (vetorizado) com o modelo mensal (72 períodos).
+
+Uso::
+
+    python benchmarks/bench_monthly.py [--cars 1000 10000]
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_storage import timed  # noqa: E402
+from myluxcars.core import GlobalParams, compute_per_year_tables  # noqa: E402
+from myluxcars.monthly import compute_monthly_tables  # noqa: E402
+from myluxcars.synthetic import synthetic_fleet  # noqa: E402
+
+# Alta temporada no verão (hemisfério norte) e fim de ano
+SEASONALITY = {"*": {"TaxaOcupacao_%": [0.7, 0.7, 0.9, 1.0, 1.0, 1.2, 1.4, 1.4, 1.0, 0.9, 0.8, 1.0],
+                     "PrecoDiaria": [0.9, 0.9, 1.0, 1.0, 1.0, 1.1, 1.2, 1.2, 1.0, 0.9, 0.9, 1.0]}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cars", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições (vale a melhor).")
+    args = parser.parse_args(argv)
+
+    params = GlobalParams()
+    print(f"{'carros':>9} {'anual (ms)':>12} {'mensal (ms)':>12} {'razão':>7}")
+    for n_cars in args.cars:
+        cars, yearly = synthetic_fleet(n_cars)
+        rng = np.random.default_rng(1)
+        cars["MesCompra"] = rng.integers(1, 13, n_cars)
+        annual = min(timed(compute_per_year_tables, cars, yearly, params)[0] for _ in range(args.repeat))
+        monthly = min(timed(compute_monthly_tables, cars, yearly, params, SEASONALITY)[0]
+                      for _ in range(args.repeat))
+        print(f"{n_cars:>9,} {annual * 1000:12.1f} {monthly * 1000:12.1f} {monthly / annual:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
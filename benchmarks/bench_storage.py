@@ -0,0 +1,66 @@
+"""Compara carga/gravação do projeto em JSON (caminho atual) e SQLite colunar.
+
+Uso::
+
+    python benchmarks/bench_storage.py [--rows 50000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from myluxcars.core import GlobalParams  # noqa: E402
+from myluxcars.project import load_project, project_to_dict  # noqa: E402
+from myluxcars.storage import load_car, load_project_sqlite, save_project_sqlite  # noqa: E402
+from myluxcars.synthetic import synthetic_fleet  # noqa: E402
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000, help="Linhas da tabela anual (carros × 6).")
+    args = parser.parse_args(argv)
+
+    cars, yearly = synthetic_fleet(max(1, args.rows // 6))
+    params = GlobalParams()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "projeto.json")
+        db_path = os.path.join(tmp, "projeto.sqlite")
+
+        def save_json():
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(project_to_dict(cars, yearly, params), f, indent=2, ensure_ascii=False)
+
+        results.append(("JSON – gravar", timed(save_json)[0]))
+        results.append(("JSON – carregar", timed(load_project, json_path)[0]))
+        results.append(("SQLite – gravar (completo)", timed(save_project_sqlite, db_path, cars, yearly,
+                                                          params.to_dict())[0]))
+        results.append(("SQLite – carregar (completo)", timed(load_project_sqlite, db_path)[0]))
+        results.append(("SQLite – carregar 1 carro", timed(load_car, db_path, cars["CarID"].iloc[len(cars) // 2])[0]))
+
+        edited = yearly.copy()
+        edited.loc[edited.index[10], "TaxaOcupacao_%"] = 99.0
+        results.append(("SQLite – gravar (1 carro alterado)", timed(save_project_sqlite, db_path, cars, edited,
+                                                                  params.to_dict())[0]))
+        sizes = {"JSON": os.path.getsize(json_path), "SQLite": os.path.getsize(db_path)}
+
+    print(f"Tabela anual: {len(yearly):,} linhas ({len(cars):,} carros)")
+    for name, seconds in results:
+        print(f"  {name:<38} {seconds * 1000:9.1f} ms")
+    for name, size in sizes.items():
+        print(f"  tamanho {name:<30} {size / 1e6:9.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Suíte de benchmarks: tempo e pico de memória de cada etapa por tamanho de frota.
+
+Cada etapa é medida em frotas sintéticas (:func:`myluxcars.synthetic.synthetic_fleet`)
+de 10 a 100 mil carros: o tempo é o melhor de ``--repeat`` execuções e o pico de
+memória vem de uma execução separada sob ``tracemalloc``. Os resultados vão para
+``benchmarks/results/latest.json``; com ``--save-baseline`` viram a referência, e as
+execuções seguintes marcam como regressão o que ficar acima da referência além da
+tolerância.
+
+Uso::
+
+    python benchmarks/run.py [--sizes 10 100 1000 10000 100000] [--stages calculo salvar_json]
+    python benchmarks/run.py --save-baseline          # grava a referência desta máquina
+    python benchmarks/run.py --strict                 # código de saída 1 se houver regressão
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from myluxcars.core import (CASH_FORMAT, PNL_FORMAT, GlobalParams, compute_per_year_tables,  # noqa: E402
+                            template_yearly_inputs)
+from myluxcars.project import load_project, save_project  # noqa: E402
+from myluxcars.synthetic import synthetic_fleet  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_SIZES = [10, 100, 1_000, 10_000, 100_000]
+# Abaixo destes limites a diferença é ruído de medição, não regressão
+MIN_SECONDS_DELTA = 0.005
+MIN_PEAK_MB_DELTA = 1.0
+
+
+def _stages(cars: pd.DataFrame, yearly: pd.DataFrame, params: GlobalParams, tmp: str):
+    """Etapas medidas: nome → função sem argumentos."""
+    json_path = os.path.join(tmp, "frota.json")
+    db_path = os.path.join(tmp, "frota.sqlite")
+    ids = cars["CarID"].tolist()
+    tables = compute_per_year_tables(cars, yearly, params)
+    save_project(json_path, cars, yearly, params)
+    save_project(db_path, cars, yearly, params)
+
+    def styler():
+        tables["PnL"].style.format(PNL_FORMAT).to_html()
+        tables["Cash"].style.format(CASH_FORMAT).to_html()
+
+    return {
+        "template_yearly": lambda: template_yearly_inputs(ids),
+        "calculo": lambda: compute_per_year_tables(cars, yearly, params),
+        "carregar_json": lambda: load_project(json_path),
+        "salvar_json": lambda: save_project(json_path, cars, yearly, params),
+        "carregar_sqlite": lambda: load_project(db_path),
+        "salvar_sqlite": lambda: (os.remove(db_path), save_project(db_path, cars, yearly, params)),
+        "styler": styler,
+    }
+
+
+def _best_time(fn, repeat: int) -> float:
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _peak_mb(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes, stages=None, repeat: int = 3, seed: int = 0):
+    """Lista de ``{"etapa", "carros", "segundos", "pico_mb"}``."""
+    params = GlobalParams()
+    results = []
+    for n_cars in sizes:
+        cars, yearly = synthetic_fleet(n_cars, seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, fn in _stages(cars, yearly, params, tmp).items():
+                if stages and name not in stages:
+                    continue
+                results.append({
+                    "etapa": name,
+                    "carros": n_cars,
+                    "segundos": _best_time(fn, repeat),
+                    "pico_mb": _peak_mb(fn),
+                })
+                print(f"  {name:<16} {n_cars:>9,} carros  {results[-1]['segundos'] * 1000:10.1f} ms"
+                      f"  {results[-1]['pico_mb']:9.1f} MB", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance: float):
+    """Marca ``regressao`` em cada resultado comparado à referência (mesma etapa e tamanho)."""
+    base = {(r["etapa"], r["carros"]): r for r in baseline.get("resultados", [])}
+    flagged = []
+    for r in results:
+        ref = base.get((r["etapa"], r["carros"]))
+        if ref is None:
+            continue
+        slow = (r["segundos"] > ref["segundos"] * (1 + tolerance)
+                and r["segundos"] - ref["segundos"] > MIN_SECONDS_DELTA)
+        heavy = (r["pico_mb"] > ref["pico_mb"] * (1 + tolerance)
+                 and r["pico_mb"] - ref["pico_mb"] > MIN_PEAK_MB_DELTA)
+        r["referencia_segundos"], r["referencia_pico_mb"] = ref["segundos"], ref["pico_mb"]
+        r["regressao"] = [k for k, bad in (("tempo", slow), ("memoria", heavy)) if bad]
+        if r["regressao"]:
+            flagged.append(r)
+    return flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Tamanhos de frota (carros).")
+    parser.add_argument("--stages", nargs="+", help="Só estas etapas (padrão: todas).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições por medida de tempo (vale a melhor).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Folga relativa antes de acusar regressão.")
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, "baseline.json"))
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Grava os resultados como nova referência.")
+    parser.add_argument("--strict", action="store_true", help="Sai com código 1 se houver regressão.")
+    args = parser.parse_args(argv)
+
+    print(f"Frotas sintéticas: {', '.join(f'{n:,}' for n in args.sizes)} carros")
+    results = run(args.sizes, args.stages, args.repeat, args.seed)
+
+    flagged = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            flagged = compare(results, json.load(f), args.tolerance)
+        for r in flagged:
+            print(f"REGRESSÃO {r['etapa']} ({r['carros']:,} carros): "
+                  f"{r['segundos'] * 1000:.1f} ms vs {r['referencia_segundos'] * 1000:.1f} ms, "
+                  f"{r['pico_mb']:.1f} MB vs {r['referencia_pico_mb']:.1f} MB ({', '.join(r['regressao'])})")
+        if not flagged:
+            print("Sem regressões em relação à referência.")
+
+    payload = {
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "maquina": platform.machine(),
+        "resultados": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {path}")
+    return 1 if flagged and args.strict else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,80 +1,62 @@
 import streamlit as st
-import pandas as pd
+import altair as alt
 import numpy as np
-from typing import Dict, List
+import pandas as pd
+import json
 import os
+import pathlib
+import sqlite3
 import sys
+import tempfile
+import uuid
+
+from myluxcars import core
+from myluxcars.amortization import LOAN_COLUMNS
+from myluxcars.core import (YEARS, DEFAULT_UPSELL, DEFAULT_TAX_RATE, DEFAULT_LOAN_RATE, CASH_FORMAT,
+                            FINANCING_TERM_TO_ANNUAL_INSTALLMENT, PNL_FORMAT, GlobalParams)
+from myluxcars.export import FORMATS as DETAIL_FORMATS, export_detail
+from myluxcars.fingerprint import inputs_fingerprint, value_fingerprint
+from myluxcars.fleet import build_fleet_matrix
+from myluxcars.importer import RULES, detect_mapping, import_table, merge_import, read_columns, validate_project
+from myluxcars.incremental import IncrementalEvaluator
+from myluxcars.memo import memoize, shared_cache
+from myluxcars.metrics import car_metrics
+from myluxcars.monthly import compute_monthly_tables
+from myluxcars.montecarlo import DEFAULT_DISTRIBUTIONS, run_monte_carlo
+from myluxcars.optimizer import apply_schedule, optimize_schedule
+from myluxcars.portfolio import evaluate_portfolio, list_projects, portfolio_key
+from myluxcars.profiling import Profile, ProfileHistory, disable, stage
+from myluxcars.snapshots import SnapshotStore
+from myluxcars.worker import BackgroundRunner
+from myluxcars.sensitivity import SENSITIVITY_PARAMS, default_ranges, stage_sums_by_term, sweep, tornado
+from myluxcars.project import project_from_dict, project_to_dict, shared_project_cache
 
 st.set_page_config(page_title="MyLuxCars – P&L & Caixa", layout="wide")
 
+# Perfil de desempenho opcional (barra lateral): cronometra as etapas deste rerun
+disable()
+run_profile = (Profile(label=pd.Timestamp.now().strftime("%H:%M:%S")).start()
+               if st.session_state.get("profiling_on", False) else None)
+
 
 # =============================
 # Helpers & Defaults
 # =============================
-YEARS = [1,2,3,4,5,6]
-DEFAULT_UPSELL = 0.05
-DEFAULT_TAX_RATE = 0.25
-DEFAULT_INTEREST_RATE = 0.045  # 4.5% do valor do carro/ano no P&L (juros)
-# Percentuais de parcela TOTAL ao ano (Caixa) por prazo (juros + principal) – relação % do preço do carro
-FINANCING_TERM_TO_ANNUAL_INSTALLMENT = {3: 0.376, 4: 0.294, 5: 0.244}
-
-# Depreciação acumulada default (premium EUA) – pode ser sobrescrita por carro/ano na grade
-DEFAULT_DEPR_ACC = {1:0.18, 2:0.30, 3:0.40, 4:0.50, 5:0.58, 6:0.65}
-
-@st.cache_data
-def empty_cars_df():
-    return pd.DataFrame({
-        "CarID": pd.Series([], dtype=str),
-        "Ano": pd.Series([], dtype=int),
-        "Marca": pd.Series([], dtype=str),
-        "Modelo": pd.Series([], dtype=str),
-        "Categoria": pd.Series([], dtype=str),
-        "PrecoCompra": pd.Series([], dtype=float)
-    })
+empty_cars_df = st.cache_data(core.empty_cars_df)
+template_yearly_inputs = st.cache_data(core.template_yearly_inputs)
 
-@st.cache_data
-def template_yearly_inputs(car_ids: List[str]):
-    rows = []
-    for car_id in car_ids:
-        for y in YEARS:
-            rows.append({
-                "CarID": car_id,
-                "AnoOffset": y,
-                # Defaults editáveis pelo usuário
-                "TaxaDepreciacao_%": round((DEFAULT_DEPR_ACC[y] - DEFAULT_DEPR_ACC.get(y-1, 0.0))*100, 2) if y in DEFAULT_DEPR_ACC else 10.0,
-                "Juros_%_sobre_preco": DEFAULT_INTEREST_RATE*100,
-                "AnoCompra": 1,   # default: compra no ano 1 do horizonte
-                "AnoVenda": np.nan,  # sem venda por padrão
-                "PrecoDiaria": 120.0,
-                "TaxaOcupacao_%": 60.0,
-                "Seguro_USD": 1200.0,
-                "Manutencao_USD": 1000.0,
-                "Sinistro_USD": 900.0,
-                "Combustivel_USD": 275.0,
-                "Estacionamento_USD": 0.0
-            })
-    return pd.DataFrame(rows)
+# Projeto padrão: o SQLite colunar (gravação parcial) tem preferência quando existir; o JSON segue suportado
+DEFAULT_PROJECT_PATH = 'frota_myluxcars.sqlite' if os.path.exists('frota_myluxcars.sqlite') else 'frota_myluxcars.json'
 
 # Inicialização de estado
 def load_default_data():
     """Carrega dados do arquivo JSON padrão se existir"""
     try:
         import json
-        with open('frota_myluxcars.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        # Carregar dados da frota
-        cars_data = pd.DataFrame(data['cars']) if 'cars' in data else empty_cars_df()
-
-        # Carregar dados anuais
-        yearly_data = pd.DataFrame(data['yearly']) if 'yearly' in data else template_yearly_inputs([])
-
-        # Carregar parâmetros globais
-        global_params = data.get('global_params', {})
-
-        return cars_data, yearly_data, global_params
-    except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
-        print(f"Arquivo frota_myluxcars.json não encontrado ou inválido: {e}")
+        # Lido uma vez por processo e compartilhado entre sessões (recarregado se o arquivo mudar)
+        return shared_project_cache().load(DEFAULT_PROJECT_PATH)
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, sqlite3.Error) as e:
+        print(f"Arquivo {DEFAULT_PROJECT_PATH} não encontrado ou inválido: {e}")
         return empty_cars_df(), template_yearly_inputs([]), {}
 
 if "cars" not in st.session_state:
@@ -119,9 +101,43 @@ other_fixed_by_year = {}
 tax_rate = st.sidebar.number_input("Impostos sobre EBT (%)", 0.0, 100.0, 
                                   saved_params.get('tax_rate', DEFAULT_TAX_RATE)*100.0, step=1.0)/100.0
 
+LOAN_MODE_LABELS = {"legado": "Parcela fixa (% do preço)", "amortizacao": "Tabela de amortização (Price)"}
+loan_mode = st.sidebar.radio("Financiamento", list(LOAN_MODE_LABELS), format_func=LOAN_MODE_LABELS.get,
+                             index=list(LOAN_MODE_LABELS).index(saved_params.get('loan_mode', 'legado')),
+                             help="Amortização: juros e principal exatos por carro, parcelas até o fim do prazo, "
+                                  "entrada na compra e quitação do saldo na venda.")
+amortizing = loan_mode == "amortizacao"
+loan_rate = st.sidebar.number_input("Taxa do financiamento (% a.a.)", 0.0, 100.0,
+                                    saved_params.get('loan_rate', DEFAULT_LOAN_RATE)*100.0, step=0.5,
+                                    disabled=not amortizing)/100.0
+down_payment_rate = st.sidebar.number_input("Entrada (% do preço)", 0.0, 100.0,
+                                            saved_params.get('down_payment_rate', 0.0)*100.0, step=5.0,
+                                            disabled=not amortizing)/100.0
+balloon_rate = st.sidebar.number_input("Balão no fim do prazo (% do preço)", 0.0, 100.0,
+                                       saved_params.get('balloon_rate', 0.0)*100.0, step=5.0,
+                                       disabled=not amortizing)/100.0
+
 st.sidebar.markdown("---")
 st.sidebar.caption("Deduções/Equipe/Marketing/Plataforma/Outros são definidos na seção 'Custos Gerais por Ano'.")
 
+st.sidebar.markdown("---")
+stochastic_mode = st.sidebar.checkbox("Modo estocástico (Monte Carlo)",
+                                      help="Sorteia cenários de ocupação, diária e depreciação por Categoria "
+                                           "e mostra bandas P5/P50/P95 nos gráficos.")
+n_scenarios = st.sidebar.select_slider("Nº de cenários", [1000, 5000, 10000, 50000, 100000], value=10000,
+                                       disabled=not stochastic_mode)
+
+st.sidebar.markdown("---")
+monthly_mode = st.sidebar.checkbox("Modelo mensal (sazonalidade)",
+                                   help="Calcula mês a mês (12 períodos por ano) com curvas sazonais por Categoria "
+                                        "e mês de compra/venda (colunas MesCompra/MesVenda do cadastro).")
+MONTH_LABELS = ["Jan","Fev","Mar","Abr","Mai","Jun","Jul","Ago","Set","Out","Nov","Dez"]
+
+st.sidebar.markdown("---")
+profiling_on = st.sidebar.checkbox("Perfil de desempenho (debug)", key="profiling_on",
+                                   help="Mede o tempo e as linhas de cada etapa do cálculo a cada rerun.")
+profile_keep = st.sidebar.number_input("Reruns guardados no perfil", 1, 500, 20, disabled=not profiling_on)
+
 # =============================
 # Layout
 # =============================
@@ -131,6 +147,86 @@ st.title("MyLuxCars – P&L e Fluxo de Caixa (6 anos)")
 if not st.session_state.cars.empty:
     st.success(f"✅ Sistema carregado com {len(st.session_state.cars)} carros da frota padrão!")
 
+# No modelo mensal, o cadastro ganha o mês de compra/venda (1 = janeiro reproduz o modelo anual)
+if monthly_mode:
+    for col in ["MesCompra", "MesVenda"]:
+        if col not in st.session_state.cars.columns:
+            st.session_state.cars = st.session_state.cars.assign(**{col: 1})
+# Na amortização, financiamento por carro (vazio = valores da barra lateral)
+if amortizing:
+    for col in LOAN_COLUMNS:
+        if col not in st.session_state.cars.columns:
+            st.session_state.cars = st.session_state.cars.assign(**{col: np.nan})
+
+def editable(df):
+    """Categóricos da importação compacta viram texto: o data_editor não aceita valores novos em categorias."""
+    return df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+
+with st.expander("Importar Frota em Massa (CSV/XLSX/Parquet)"):
+    st.caption("Arquivos grandes são lidos em blocos; linhas inválidas são descartadas e listadas abaixo. "
+               "Sem o arquivo de dados anuais, os carros novos recebem os valores padrão por ano.")
+    ic1, ic2 = st.columns(2)
+    with ic1:
+        import_cars_file = st.file_uploader("Cadastro de carros", type=["csv", "xlsx", "parquet"], key="import_cars_file")
+    with ic2:
+        import_yearly_file = st.file_uploader("Dados anuais por carro (opcional)", type=["csv", "xlsx", "parquet"],
+                                              key="import_yearly_file")
+    import_files = {"cars": import_cars_file, "yearly": import_yearly_file}
+    import_mappings = {}
+    for table, label in [("cars", "Cadastro"), ("yearly", "Dados anuais")]:
+        if import_files[table] is None:
+            continue
+        try:
+            file_cols = read_columns(import_files[table])
+        except Exception as e:
+            st.error(f"Erro ao ler {import_files[table].name}: {e}")
+            continue
+        detected = detect_mapping(file_cols, table)
+        st.markdown(f"**Mapeamento de colunas – {label}** (vazio = ignorar)")
+        map_df = st.data_editor(
+            pd.DataFrame({"ColunaArquivo": file_cols, "ColunaEsquema": [detected.get(c) for c in file_cols]}),
+            hide_index=True,
+            disabled=["ColunaArquivo"],
+            column_config={"ColunaEsquema": st.column_config.SelectboxColumn(options=list(RULES[table]))},
+            key=f"import_map_{table}",
+        )
+        import_mappings[table] = {r["ColunaArquivo"]: r["ColunaEsquema"] for r in map_df.to_dict("records")
+                                  if pd.notna(r["ColunaEsquema"])}
+    replace_fleet = st.radio("Modo", [False, True], horizontal=True, key="import_replace",
+                             format_func=lambda r: "Substituir a frota" if r else "Acrescentar/atualizar por CarID")
+    if "cars" in import_mappings and st.button("Importar"):
+        try:
+            with st.spinner("Importando..."):
+                cars_result = import_table(import_cars_file, "cars", mapping=import_mappings["cars"])
+                yearly_result = (import_table(import_yearly_file, "yearly", mapping=import_mappings["yearly"])
+                                 if "yearly" in import_mappings else None)
+        except (ValueError, ImportError) as e:
+            st.error(f"❌ Erro na importação: {e}")
+        else:
+            new_cars, new_yearly = merge_import(
+                st.session_state.cars, st.session_state.yearly, cars_result.data,
+                yearly_result.data if yearly_result is not None else None, replace=replace_fleet)
+            st.session_state.cars, st.session_state.yearly = editable(new_cars), editable(new_yearly)
+            results_by_table = {"cars": cars_result, "yearly": yearly_result}
+            st.session_state.import_report = {
+                "resumo": [f"{label}: {r.rows_imported:,} de {r.rows_read:,} linhas importadas, {r.error_count:,} erros, "
+                           f"{r.warning_count:,} avisos"
+                           for label, r in [("Cadastro", cars_result), ("Dados anuais", yearly_result)] if r is not None],
+                "erros": pd.concat([r.errors.assign(Tabela=t) for t, r in results_by_table.items() if r is not None],
+                                   ignore_index=True),
+            }
+            st.rerun()
+    import_report = st.session_state.get("import_report")
+    if import_report:
+        for line in import_report["resumo"]:
+            st.info(line)
+        if not import_report["erros"].empty:
+            st.caption(f"Primeiros {len(import_report['erros']):,} erros e avisos por linha "
+                       "(linha 1 = primeira linha de dados; linhas com aviso foram importadas):")
+            st.dataframe(import_report["erros"], hide_index=True, use_container_width=True)
+            st.download_button("Baixar erros (CSV)", import_report["erros"].to_csv(index=False).encode("utf-8"),
+                               file_name="erros_importacao_myluxcars.csv", mime="text/csv")
+
 with st.expander("1) Frota – Cadastre/edite os carros"):
     cars = st.data_editor(
         st.session_state.cars,
@@ -139,6 +235,15 @@ with st.expander("1) Frota – Cadastre/edite os carros"):
         column_config={
             "CarID": st.column_config.TextColumn(help="Identificador único do carro"),
             "PrecoCompra": st.column_config.NumberColumn(format="$%.0f"),
+            "MesCompra": st.column_config.NumberColumn(min_value=1, max_value=12, step=1,
+                                                       help="Mês da compra no AnoCompra (modelo mensal)"),
+            "MesVenda": st.column_config.NumberColumn(min_value=1, max_value=12, step=1,
+                                                      help="Mês da venda no AnoVenda; o carro opera até o mês anterior"),
+            "TaxaFinanciamento_%": st.column_config.NumberColumn(help="Taxa anual do empréstimo (vazio = barra lateral)"),
+            "PrazoFinanciamento": st.column_config.NumberColumn(min_value=0, step=1,
+                                                                help="Prazo em anos (vazio = prazo global)"),
+            "Entrada_%": st.column_config.NumberColumn(help="Entrada em % do preço (vazio = barra lateral)"),
+            "Balao_%": st.column_config.NumberColumn(help="Balão final em % do preço (vazio = barra lateral)"),
         },
         key="cars_editor"
     )
@@ -158,7 +263,8 @@ with st.expander("1) Frota – Cadastre/edite os carros"):
         if st.session_state.yearly.empty:
             st.session_state.yearly = new_rows
         else:
-            st.session_state.yearly = pd.concat([st.session_state.yearly, new_rows], ignore_index=True)
+            with stage("app.concat_edicoes", rows=len(new_rows)):
+                st.session_state.yearly = pd.concat([st.session_state.yearly, new_rows], ignore_index=True)
 
 with st.expander("2) Inputs por Carro/Ano – Operação, Juros e Depreciação"):
     # Filtro por CarID opcional
@@ -190,7 +296,9 @@ with st.expander("2) Inputs por Carro/Ano – Operação, Juros e Depreciação"
             key="yearly_editor"
         )
         # Persist edits back into session state (merge on index)
-        st.session_state.yearly = pd.concat([yearly_view, st.session_state.yearly[~st.session_state.yearly.index.isin(yearly_view.index)]])
+        with stage("app.concat_edicoes", rows=len(st.session_state.yearly)):
+            kept = st.session_state.yearly[~st.session_state.yearly.index.isin(yearly_view.index)]
+            st.session_state.yearly = pd.concat([yearly_view, kept])
     else:
         st.info("Adicione carros na seção 1 para configurar os parâmetros por carro/ano.")
 
@@ -227,187 +335,387 @@ with st.expander("3) Custos Gerais por Ano"):
         other_fixed_by_year[y] = c[5].number_input("     ", key=f"other_{y}", min_value=0.0, 
                                                  value=float(saved_other.get(str(y), 0.0)), step=500.0)
 
+if stochastic_mode:
+    with st.expander("4) Distribuições por Categoria (Monte Carlo)"):
+        st.caption("Desvio-padrão relativo (%) do fator multiplicativo sorteado por cenário para cada categoria.")
+        default_dist = DEFAULT_DISTRIBUTIONS["*"]
+        categorias = sorted(str(c) for c in st.session_state.cars.get("Categoria", pd.Series(dtype=str)).dropna().unique())
+        dist_df = st.data_editor(
+            pd.DataFrame({
+                "Categoria": categorias,
+                "TaxaOcupacao_%": default_dist["TaxaOcupacao_%"][1]*100,
+                "PrecoDiaria": default_dist["PrecoDiaria"][1]*100,
+                "TaxaDepreciacao_%": default_dist["TaxaDepreciacao_%"][1]*100,
+            }),
+            hide_index=True,
+            disabled=["Categoria"],
+            key="mc_dist_editor"
+        )
+    mc_distributions = {
+        row["Categoria"]: {col: (1.0, row[col]/100.0) for col in ["TaxaOcupacao_%","PrecoDiaria","TaxaDepreciacao_%"]}
+        for row in dist_df.to_dict('records')
+    }
+
+seasonality = None
+if monthly_mode:
+    with st.expander("5) Sazonalidade Mensal por Categoria"):
+        st.caption("Fatores multiplicativos por mês (1,0 = sem efeito). A linha '*' vale para categorias não listadas.")
+        categorias = ["*"] + sorted(st.session_state.cars["Categoria"].dropna().astype(str).unique().tolist())
+        flat = pd.DataFrame(1.0, index=pd.Index(categorias, name="Categoria"), columns=MONTH_LABELS).reset_index()
+        st.markdown("**Ocupação**")
+        occ_df = st.data_editor(flat, hide_index=True, disabled=["Categoria"], key="season_occ_editor")
+        st.markdown("**Diária**")
+        rate_df = st.data_editor(flat, hide_index=True, disabled=["Categoria"], key="season_rate_editor")
+    occ_curves = occ_df.set_index("Categoria")[MONTH_LABELS]
+    rate_curves = rate_df.set_index("Categoria")[MONTH_LABELS]
+    seasonality = {
+        cat: {"TaxaOcupacao_%": occ_curves.loc[cat].tolist(), "PrecoDiaria": rate_curves.loc[cat].tolist()}
+        for cat in occ_curves.index
+    }
+
 # =============================
 # Cálculos
 # =============================
 
-def compute_per_year_tables(cars: pd.DataFrame, yearly: pd.DataFrame) -> Dict[str, pd.DataFrame]:
-    if cars.empty or yearly.empty:
-        idx = pd.Index([y for y in YEARS if y<=horizon_years], name="Ano")
-        zeros = pd.DataFrame(0.0, index=idx, columns=["ReceitaBruta","Upsell","Deducoes","ReceitaLiquida",
-                                                      "Seguro","Manutencao","Sinistro","Combustivel","Estacionamento",
-                                                      "Depreciacao","CustoFrotaTotal","LucroBruto",
-                                                      "Equipe","Marketing","Plataforma","OutrosFixos","EBITDA",
-                                                      "Juros","EBT","Impostos","LucroLiquido",
-                                                      "Depreciacao_add","Principal","VendaFrota","CaixaFinal"])        
-        return {"PnL": zeros.copy(), "Cash": zeros.copy()}
-
-    # Join Yearly with cars
-    y = yearly.copy()
-
-    # Verificar se yearly tem as colunas necessárias
-    if 'AnoOffset' not in y.columns:
-        # Se não tem dados, retorna zeros
-        idx = pd.Index([y for y in YEARS if y<=horizon_years], name="Ano")
-        zeros = pd.DataFrame(0.0, index=idx, columns=["ReceitaBruta","Upsell","Deducoes","ReceitaLiquida",
-                                                      "Seguro","Manutencao","Sinistro","Combustivel","Estacionamento",
-                                                      "Depreciacao","CustoFrotaTotal","LucroBruto",
-                                                      "Equipe","Marketing","Plataforma","OutrosFixos","EBITDA",
-                                                      "Juros","EBT","Impostos","LucroLiquido",
-                                                      "Depreciacao_add","Principal","VendaFrota","CaixaFinal"])        
-        return {"PnL": zeros.copy(), "Cash": zeros.copy()}
-
-    y = y[y["AnoOffset"]<=horizon_years]
-    cars_use = cars.dropna(subset=["CarID"]).copy()
-    y = y.merge(cars_use, on="CarID", how="inner", suffixes=("_Y","_C"))
-
-    def active_in_year(row):
-        # carro conta se ano está entre ano compra e (ano venda inclusive para venda, exclusivo para operação)
-        ano = row["AnoOffset"]
-        ano_compra = row.get("AnoCompra", 1)
-        ano_venda = row.get("AnoVenda", np.nan)
-        if pd.isna(ano_venda):
-            return ano >= ano_compra
-        return (ano >= ano_compra) and (ano < ano_venda)
-
-    # Receitas e custos por linha
-    y["IsActive"] = y.apply(active_in_year, axis=1)
-
-    # Receita
-    y["ReceitaBruta"] = np.where(
-        y["IsActive"],
-        y["PrecoDiaria"] * (y["TaxaOcupacao_%"] / 100.0) * 365.0,
-        0.0
-    )
-    y["Upsell"] = y["ReceitaBruta"] * upsell_rate
-    # Deduções % por ano
-    y["Deducoes"] = (y["ReceitaBruta"] + y["Upsell"]) * y["AnoOffset"].map(deductions_rate_by_year)
-    y["ReceitaLiquida"] = (y["ReceitaBruta"] + y["Upsell"]) - y["Deducoes"]
-
-    # Custos operacionais por carro/ano
-    for col in ["Seguro_USD","Manutencao_USD","Sinistro_USD","Combustivel_USD","Estacionamento_USD"]:
-        y[col.replace("_USD", "")] = np.where(y["IsActive"], y[col], 0.0)
-
-    # Depreciação (percentual * preço)
-    y["Depreciacao"] = np.where(
-        y["IsActive"],
-        (y["TaxaDepreciacao_%"]/100.0) * y["PrecoCompra"],
-        0.0
-    )
-
-    # P&L – soma por ano
-    grouped = y.groupby("AnoOffset").agg({
-        "ReceitaBruta":"sum","Upsell":"sum","Deducoes":"sum","ReceitaLiquida":"sum",
-        "Seguro":"sum","Manutencao":"sum","Sinistro":"sum","Combustivel":"sum","Estacionamento":"sum",
-        "Depreciacao":"sum"
-    }).rename_axis("Ano")
-
-    grouped["CustoFrotaTotal"] = grouped[["Seguro","Manutencao","Sinistro","Combustivel","Estacionamento","Depreciacao"]].sum(axis=1)
-    grouped["LucroBruto"] = grouped["ReceitaLiquida"] - grouped["CustoFrotaTotal"]
-
-    # Opex por ano (globais)
-    grouped["Equipe"] = grouped.index.map(team_cost_by_year).astype(float)
-    grouped["Marketing"] = grouped["ReceitaLiquida"] * grouped.index.map(marketing_rate_by_year).astype(float)
-    grouped["Plataforma"] = grouped.index.map(platform_cost_by_year).astype(float)
-    grouped["OutrosFixos"] = grouped.index.map(other_fixed_by_year).astype(float)
-
-    grouped["EBITDA"] = grouped["LucroBruto"] - (grouped["Equipe"] + grouped["Marketing"] + grouped["Plataforma"] + grouped["OutrosFixos"])
-
-    # Juros P&L – por carro/ano (% do preço original)
-    y["JurosPL"] = np.where(y["IsActive"], (y["Juros_%_sobre_preco"]/100.0) * y["PrecoCompra"], 0.0)
-    juros_by_year = y.groupby("AnoOffset")["JurosPL"].sum()
-    grouped["Juros"] = juros_by_year
-
-    grouped["EBT"] = grouped["EBITDA"] - grouped["Juros"]
-    grouped["Impostos"] = np.where(grouped["EBT"]>0, grouped["EBT"]*tax_rate, 0.0)
-    grouped["LucroLiquido"] = grouped["EBT"] - grouped["Impostos"]
-
-    pnl_table = grouped.copy()
-
-    # ================= CASHFLOW =================
-    cash = pnl_table[["LucroLiquido"]].copy()
-    cash["Depreciacao_add"] = pnl_table["Depreciacao"]  # volta depreciação
-
-    # Principal (Caixa): parcela total – juros P&L
-    # Parcela total anual depende do prazo global
-    annual_install_pct = FINANCING_TERM_TO_ANNUAL_INSTALLMENT[financing_term]
-    y["ParcelaTotal"] = np.where(y["IsActive"], annual_install_pct * y["PrecoCompra"], 0.0)
-    y["Principal"] = np.maximum(y["ParcelaTotal"] - y["JurosPL"], 0.0)
-    principal_by_year = y.groupby("AnoOffset")["Principal"].sum()
-    cash["Principal"] = principal_by_year
-
-    # Venda Frota no ano de venda – pelo valor contábil (Preço – depreciação acumulada até o ano-1 e reconhece depreciação do ano de venda antes?)
-    # Convenção: a depreciação do ano da venda é reconhecida e a venda ocorre no fim do ano pelo valor contábil após a depreciação do próprio ano.
-    # Cálculo do valor contábil por linha
-    def compute_book_value(df: pd.DataFrame) -> pd.Series:
-        book_vals = []
-        for (car), sub in df.sort_values(["AnoOffset"]).groupby("CarID"):
-            preco = sub["PrecoCompra"].iloc[0]
-            deprec_acc = 0.0
-            for _, r in sub.iterrows():
-                deprec_acc += (r["TaxaDepreciacao_%"]/100.0) * preco if r["IsActive"] else 0.0
-                if not pd.isna(r.get("AnoVenda")) and r["AnoOffset"]==r["AnoVenda"]:
-                    # valor contábil após reconhecer a depreciação deste ano
-                    book_vals.append((r.name, max(preco - deprec_acc, 0.0)))
-        # Map back
-        s = pd.Series({idx: val for idx,val in book_vals})
-        return s
-
-    book_map = compute_book_value(y)
-    y["VendaValorContabil"] = y.index.map(book_map)
-    venda_by_year = y.groupby("AnoOffset")["VendaValorContabil"].sum(min_count=1).fillna(0.0)
-    cash["VendaFrota"] = venda_by_year
-
-    cash["CaixaFinal"] = cash["LucroLiquido"] + cash["Depreciacao_add"] - cash["Principal"] + cash["VendaFrota"]
-
-    # Limitar ao horizonte
-    pnl_table = pnl_table.loc[pnl_table.index<=horizon_years]
-    cash = cash.loc[cash.index<=horizon_years]
-
-    return {"PnL": pnl_table, "Cash": cash}
+params = GlobalParams(
+    horizon_years=horizon_years,
+    financing_term=financing_term,
+    upsell_rate=upsell_rate,
+    tax_rate=tax_rate,
+    deductions_rate_by_year=deductions_rate_by_year,
+    marketing_rate_by_year=marketing_rate_by_year,
+    team_cost_by_year=team_cost_by_year,
+    platform_cost_by_year=platform_cost_by_year,
+    other_fixed_by_year=other_fixed_by_year,
+    loan_mode=loan_mode,
+    loan_rate=loan_rate,
+    down_payment_rate=down_payment_rate,
+    balloon_rate=balloon_rate,
+)
 
 # =============================
 # Run calculations & Show
 # =============================
-results = compute_per_year_tables(st.session_state.cars, st.session_state.yearly)
+# Avaliador incremental por sessão: após uma edição, só os carros alterados são recalculados
+if "evaluator" not in st.session_state:
+    st.session_state.evaluator = IncrementalEvaluator()
+
+# Memo do processo indexado pelo conteúdo das entradas: interações só de interface
+# (expanders, filtros, downloads) reaproveitam tabelas, Stylers, gráficos e exportações
+with stage("app.fingerprint", rows=len(st.session_state.yearly)):
+    inputs_fp = inputs_fingerprint(st.session_state.cars, st.session_state.yearly, params)
+
+def memo(namespace, key, compute, spinner=None):
+    key = (inputs_fp,) + tuple(key)
+    if spinner and (namespace, key) not in shared_cache():
+        with st.spinner(spinner):
+            return memoize(namespace, key, compute)
+    return memoize(namespace, key, compute)
+
+# Cálculos pesados rodam fora da thread do script (myluxcars.worker), um runner por tipo de cálculo.
+# Se o job não termina logo, a página mostra o último resultado pronto com uma barra de progresso;
+# uma edição nova cancela o job obsoleto.
+BACKGROUND_WAIT = 0.5  # segundos esperando o job antes de mostrar o resultado anterior
+
+def runner(slot):
+    runners = st.session_state.setdefault("runners", {})
+    if slot not in runners:
+        runners[slot] = BackgroundRunner()
+    return runners[slot]
+
+@st.fragment(run_every=0.5)
+def job_progress(slot):
+    job = runner(slot).job
+    if job is None or not job.running:
+        st.rerun()  # terminou: rerun completo com o resultado novo
+    bar, cancel = st.columns([5, 1])
+    bar.progress(job.progress, text=f"{job.label}: {job.message}" if job.message else job.label)
+    if cancel.button("Cancelar", key=f"cancelar_{slot}"):
+        job.cancel()
+
+def background(namespace, key, fn, *args, label=""):
+    """Como ``memo``, mas calculado num job do runner ``namespace``.
+
+    Devolve ``(resultado, chave)``: a chave do job que produziu o resultado – diferente da
+    pedida quando a página mostra o resultado anterior enquanto o novo é calculado.
+    """
+    key = (inputs_fp,) + tuple(key)
+    if (namespace, key) in shared_cache():
+        return memoize(namespace, key, lambda: fn(*args)), key
+    slot = runner(namespace)
+    job = slot.submit(key, memoize, namespace, key, lambda: fn(*args), label=label)
+    last = slot.last()
+    if not job.wait(BACKGROUND_WAIT) and last is None:
+        # Nada anterior para mostrar: espera aqui mesmo, com a barra de progresso
+        bar = st.progress(0.0, text=label)
+        while not job.wait(0.1):
+            bar.progress(job.progress, text=f"{label}: {job.message}" if job.message else label)
+        bar.empty()
+    if job.ok:
+        return job.result, key
+    if job.running:
+        st.caption("Entradas alteradas – mostrando o resultado anterior até o novo cálculo terminar.")
+        job_progress(namespace)
+    elif job.cancelled:
+        if st.button("Recalcular", key=f"recalcular_{namespace}"):
+            slot.submit(key, memoize, namespace, key, lambda: fn(*args), label=label, restart=True)
+            st.rerun()
+        if last is None:
+            st.info(f"{label} cancelado.")
+            st.stop()
+        st.info(f"{label} cancelado – mostrando o resultado anterior.")
+    else:
+        raise job.error
+    return last[1], last[0]
+
+if monthly_mode:
+    results_key = ("mensal", value_fingerprint(seasonality))
+else:
+    results_key = ("anual",)
+
+with stage("app.calculo", rows=len(st.session_state.yearly)):
+    if monthly_mode:
+        results, results_job = background("tabelas", results_key, compute_monthly_tables, st.session_state.cars,
+                                          st.session_state.yearly, params, seasonality, label="Modelo mensal")
+    else:
+        results, results_job = background("tabelas", results_key, st.session_state.evaluator.evaluate,
+                                          st.session_state.cars, st.session_state.yearly, params, label="Cálculo")
+    # Mostrando o resultado anterior: gráficos e exportações ficam memoizados sob a chave dele
+    if results_job != (inputs_fp,) + results_key:
+        results_key = ("anterior", results_job)
 
 pnl, cash = results["PnL"], results["Cash"]
 
+# Styler novo a cada rerun: ele guarda estado de renderização e não pode ser compartilhado
+# entre sessões pelo memo do processo (as tabelas, memoizadas, são o custo de verdade)
 st.subheader("P&L (Por Ano)")
-st.dataframe(pnl.style.format({
-    "ReceitaBruta":"$ {:,.0f}", "Upsell":"$ {:,.0f}", "Deducoes":"$ {:,.0f}", "ReceitaLiquida":"$ {:,.0f}",
-    "Seguro":"$ {:,.0f}", "Manutencao":"$ {:,.0f}", "Sinistro":"$ {:,.0f}", "Combustivel":"$ {:,.0f}", "Estacionamento":"$ {:,.0f}",
-    "Depreciacao":"$ {:,.0f}", "CustoFrotaTotal":"$ {:,.0f}", "LucroBruto":"$ {:,.0f}",
-    "Equipe":"$ {:,.0f}", "Marketing":"$ {:,.0f}", "Plataforma":"$ {:,.0f}", "OutrosFixos":"$ {:,.0f}", "EBITDA":"$ {:,.0f}",
-    "Juros":"$ {:,.0f}", "EBT":"$ {:,.0f}", "Impostos":"$ {:,.0f}", "LucroLiquido":"$ {:,.0f}"
-}))
+with stage("app.styler_pnl", rows=len(pnl)):
+    st.dataframe(pnl.style.format(PNL_FORMAT))
 
 st.subheader("Fluxo de Caixa (Por Ano)")
-st.dataframe(cash.style.format({
-    "LucroLiquido":"$ {:,.0f}", "Depreciacao_add":"$ {:,.0f}", "Principal":"$ {:,.0f}", "VendaFrota":"$ {:,.0f}", "CaixaFinal":"$ {:,.0f}"
-}))
+with stage("app.styler_caixa", rows=len(cash)):
+    st.dataframe(cash.style.format(CASH_FORMAT))
+
+if monthly_mode:
+    st.subheader("Receita e Custos por Mês")
+    mensal = results["Mensal"]
+    mensal_chart = memo("grafico_mensal", results_key, lambda: mensal[["ReceitaBruta", "CustosOperacionais"]].set_axis(
+        [f"A{ano}-{MONTH_LABELS[mes - 1]}" for ano, mes in mensal.index], axis=0))
+    st.line_chart(mensal_chart)
 
 # =============================
 # Charts
 # =============================
+def stochastic_bands(cars, yearly, params, n, distributions):
+    fm = build_fleet_matrix(cars, yearly, params.horizon_years)
+    return run_monte_carlo(fm, params, n, distributions)
+
+def run_stochastic(n, distributions):
+    bands, _ = background("monte_carlo", (n, value_fingerprint(distributions)), stochastic_bands,
+                          st.session_state.cars, st.session_state.yearly, params, n, distributions,
+                          label="Simulação de cenários")
+    return bands
+
+def fan_chart(band: pd.DataFrame, title: str):
+    df = band.reset_index()
+    area = alt.Chart(df).mark_area(opacity=0.3).encode(
+        x="Ano:O", y=alt.Y("P5:Q", title=title), y2="P95:Q", tooltip=["Ano", "P5", "P50", "P95"])
+    line = alt.Chart(df).mark_line(point=True).encode(x="Ano:O", y="P50:Q")
+    return area + line
+
 colA, colB = st.columns(2)
-with colA:
-    st.markdown("**Gráfico – Receita Líquida, EBITDA, Lucro Líquido**")
-    chart_df = pnl[["ReceitaLiquida","EBITDA","LucroLiquido"]].copy()
-    st.line_chart(chart_df)
-with colB:
-    st.markdown("**Gráfico – Caixa Líquido por Ano**")
-    st.bar_chart(cash[["CaixaFinal"]])
+with stage("app.graficos"):
+    if stochastic_mode:
+        bands = run_stochastic(n_scenarios, mc_distributions)
+        with colA:
+            st.markdown(f"**Gráfico – Lucro Líquido (P5–P95, {n_scenarios:,} cenários)**")
+            st.altair_chart(fan_chart(bands["LucroLiquido"], "Lucro Líquido"), use_container_width=True)
+        with colB:
+            st.markdown(f"**Gráfico – Caixa Líquido por Ano (P5–P95, {n_scenarios:,} cenários)**")
+            st.altair_chart(fan_chart(bands["CaixaFinal"], "Caixa Final"), use_container_width=True)
+    else:
+        with colA:
+            st.markdown("**Gráfico – Receita Líquida, EBITDA, Lucro Líquido**")
+            chart_df = memo("grafico_pnl", results_key, lambda: pnl[["ReceitaLiquida","EBITDA","LucroLiquido"]].copy())
+            st.line_chart(chart_df)
+        with colB:
+            st.markdown("**Gráfico – Caixa Líquido por Ano**")
+            st.bar_chart(cash[["CaixaFinal"]])
+
+# =============================
+# Métricas por carro
+# =============================
+def compute_car_metrics(discount_rate):
+    def compute():
+        fm = build_fleet_matrix(st.session_state.cars, st.session_state.yearly, params.horizon_years)
+        return car_metrics(fm, params, discount_rate)
+    return memo("metricas_carro", (discount_rate,), compute, spinner="Calculando métricas por carro...")
+
+with st.expander("Métricas por Carro – VPL, TIR e Payback"):
+    st.caption("Fluxo por carro = receita líquida − custos operacionais − parcela (juros + principal) + venda; "
+               "antes de impostos e custos fixos. Clique no cabeçalho da coluna para ordenar.")
+    discount_rate = st.number_input("Taxa de desconto (% a.a.)", 0.0, 100.0, 10.0, step=0.5) / 100.0
+    with stage("app.metricas_carro", rows=len(st.session_state.cars)):
+        metrics_df = compute_car_metrics(discount_rate)
+    st.dataframe(
+        metrics_df,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "PrecoCompra": st.column_config.NumberColumn(format="$%.0f"),
+            "FluxoTotal": st.column_config.NumberColumn(format="$%.0f"),
+            "VPL": st.column_config.NumberColumn(format="$%.0f"),
+            "TIR": st.column_config.NumberColumn(format="percent", help="Vazia quando o fluxo não troca de sinal"),
+            "PaybackAno": st.column_config.NumberColumn(format="%d"),
+        },
+    )
+    metrics_csv = memo("metricas_carro_csv", (discount_rate,), lambda: metrics_df.to_csv(index=False).encode("utf-8"))
+    st.download_button("Baixar Métricas por Carro (CSV)", metrics_csv,
+                       file_name="metricas_carros_myluxcars.csv", mime="text/csv")
+
+# =============================
+# Sensibilidade (tornado e mapa de calor)
+# =============================
+def compute_stage_sums():
+    def compute():
+        fm = build_fleet_matrix(st.session_state.cars, st.session_state.yearly, params.horizon_years)
+        return stage_sums_by_term(fm, params), fm.years
+    return memo("estagio_carros", (), compute, spinner="Calculando estágio por carro...")
+
+def sensitivity_axis(name, ranges, n_points):
+    if name == "financing_term":
+        return sorted(FINANCING_TERM_TO_ANNUAL_INSTALLMENT)
+    low, high = ranges[name]
+    return [round(v, 4) for v in np.linspace(low, high, n_points)]
+
+with st.expander("Sensibilidade – Tornado e Mapa de Calor"):
+    st.caption("Resultados acumulados no horizonte. Deduções e marketing varridos valem para todos os anos.")
+    with stage("app.sensibilidade", rows=len(st.session_state.cars)):
+        sums_by_term, sens_years = compute_stage_sums()
+    sens_metric = st.radio("Métrica", ["LucroLiquido", "CaixaFinal"], horizontal=True, key="sens_metric",
+                           format_func=lambda m: "Lucro Líquido" if m == "LucroLiquido" else "Caixa Final")
+    ranges = default_ranges(params)
+
+    tor = tornado(sums_by_term, sens_years, params, ranges, sens_metric)
+    tor_chart = alt.Chart(tor).mark_bar().encode(
+        y=alt.Y("Parametro:N", sort=None, title=None),
+        x=alt.X("ResultadoBaixo:Q", title=f"{sens_metric} acumulado"), x2="ResultadoAlto:Q",
+        tooltip=["Parametro", "ValorBaixo", "ValorAlto", "ResultadoBaixo", "ResultadoAlto"])
+    base_rule = alt.Chart(tor.head(1)).mark_rule(color="black").encode(x="Base:Q")
+    st.markdown("**Tornado – variação entre as faixas baixa e alta de cada parâmetro**")
+    st.altair_chart(tor_chart + base_rule, use_container_width=True)
+
+    hc1, hc2, hc3 = st.columns(3)
+    with hc1:
+        x_param = st.selectbox("Eixo X", list(SENSITIVITY_PARAMS), index=0, format_func=SENSITIVITY_PARAMS.get)
+    with hc2:
+        y_param = st.selectbox("Eixo Y", [k for k in SENSITIVITY_PARAMS if k != x_param], index=0,
+                               format_func=SENSITIVITY_PARAMS.get)
+    with hc3:
+        n_points = st.slider("Pontos por eixo", 3, 25, 9)
+    grid = sweep(sums_by_term, sens_years, params, {
+        x_param: sensitivity_axis(x_param, ranges, n_points),
+        y_param: sensitivity_axis(y_param, ranges, n_points),
+    })
+    heat = alt.Chart(grid).mark_rect().encode(
+        x=alt.X(f"{x_param}:O", title=SENSITIVITY_PARAMS[x_param]),
+        y=alt.Y(f"{y_param}:O", title=SENSITIVITY_PARAMS[y_param], sort="descending"),
+        color=alt.Color(f"{sens_metric}Acumulado:Q", title=sens_metric),
+        tooltip=[x_param, y_param, f"{sens_metric}Acumulado"])
+    st.altair_chart(heat, use_container_width=True)
+
+# =============================
+# Otimizador de compra/venda
+# =============================
+OPT_CONSTRAINTS = {"Nenhuma": None, "Capital imobilizado máximo por ano": "capital",
+                   "Caixa mínimo por ano": "caixa_minimo"}
+
+def optimize_fleet(cars, yearly, params, objective, discount_rate, constraint, limit):
+    fm = build_fleet_matrix(cars, yearly, params.horizon_years)
+    return optimize_schedule(fm, params, objective, discount_rate, constraint, limit)
+
+with st.expander("Otimizador – Melhor Ano de Compra e Venda por Carro"):
+    st.caption("Testa todas as combinações de AnoCompra/AnoVenda de cada carro (antes de impostos). "
+               "Com restrição de frota, carros podem ficar de fora (AnoCompra vazio).")
+    oc1, oc2, oc3 = st.columns(3)
+    with oc1:
+        opt_objective = st.radio("Objetivo", ["vpl", "caixa"], horizontal=True,
+                                 format_func=lambda o: "VPL" if o == "vpl" else "Caixa acumulado")
+    with oc2:
+        opt_constraint = OPT_CONSTRAINTS[st.selectbox("Restrição", list(OPT_CONSTRAINTS))]
+    with oc3:
+        opt_limit = st.number_input("Limite ($)", value=0.0, step=10000.0, disabled=opt_constraint is None)
+    if st.button("Otimizar calendário"):
+        runner("otimizador").submit((inputs_fp, opt_objective, discount_rate, opt_constraint, opt_limit),
+                                    optimize_fleet, st.session_state.cars, st.session_state.yearly, params,
+                                    opt_objective, discount_rate, opt_constraint, opt_limit,
+                                    label="Otimização").wait(BACKGROUND_WAIT)
+    opt_job = runner("otimizador").job
+    if opt_job is not None:
+        if opt_job.running:
+            job_progress("otimizador")
+        elif opt_job.ok and st.session_state.get("opt_job") is not opt_job:
+            # Resultado novo: passa a ser o exibido (e some depois de aplicado)
+            st.session_state.opt_job = opt_job
+            st.session_state.opt_result = opt_job.result
+        elif opt_job.error is not None and not opt_job.cancelled:
+            st.error(f"❌ Erro ao otimizar: {opt_job.error}")
+    opt_result = st.session_state.get("opt_result")
+    if opt_result is not None:
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Objetivo atual", f"${opt_result.current_objective:,.0f}")
+        m2.metric("Objetivo otimizado", f"${opt_result.objective:,.0f}",
+                  f"{opt_result.objective - opt_result.current_objective:,.0f}")
+        m3.metric("Restrição atendida", "Sim" if opt_result.feasible else "Não")
+        if opt_result.usage is not None:
+            st.bar_chart(opt_result.usage)
+        st.dataframe(opt_result.schedule, hide_index=True, use_container_width=True,
+                     column_config={c: st.column_config.NumberColumn(format="$%.0f")
+                                    for c in ["Objetivo", "ObjetivoAtual", "Ganho"]})
+        if st.button("Aplicar calendário aos inputs anuais"):
+            st.session_state.yearly = apply_schedule(st.session_state.yearly, opt_result.schedule)
+            st.session_state.opt_result = None
+            st.rerun()
 
 # =============================
 # Export
 # =============================
-with st.expander("Exportar (CSV)"):
-    pnl_csv = pnl.to_csv().encode("utf-8")
-    cash_csv = cash.to_csv().encode("utf-8")
+with st.expander("Exportar (CSV/Parquet/XLSX)"):
+    pnl_csv = memo("pnl_csv", results_key, lambda: pnl.to_csv().encode("utf-8"))
+    cash_csv = memo("caixa_csv", results_key, lambda: cash.to_csv().encode("utf-8"))
     st.download_button("Baixar P&L (CSV)", pnl_csv, file_name="pnl_myluxcars.csv", mime="text/csv")
     st.download_button("Baixar Caixa (CSV)", cash_csv, file_name="caixa_myluxcars.csv", mime="text/csv")
 
+    st.markdown("**Detalhe por carro × ano** (receita, custos, depreciação, juros, principal, valor contábil na venda)")
+    st.caption("Gerado em blocos de carros numa tarefa em segundo plano; o app continua utilizável enquanto isso. "
+               "O detalhe é anual, mesmo com a sazonalidade mensal ativa.")
+    detail_fmt = st.selectbox("Formato do detalhe", list(DETAIL_FORMATS), key="detail_fmt",
+                              format_func=lambda f: {"csv": "CSV", "parquet": "Parquet",
+                                                     "xlsx": "XLSX (com abas PnL e Caixa)"}[f])
+    detail_runner = runner("detalhe")
+    if st.button("Gerar detalhe", disabled=detail_runner.job is not None and detail_runner.job.running):
+        old_path = st.session_state.get("detail_path")
+        if old_path and os.path.exists(old_path):
+            os.remove(old_path)
+        detail_path = os.path.join(tempfile.gettempdir(), f"myluxcars_detalhe_{uuid.uuid4().hex}.{detail_fmt}")
+        st.session_state.detail_path = detail_path
+        detail_runner.submit((inputs_fp, detail_fmt, detail_path), export_detail, detail_path, detail_fmt,
+                             st.session_state.cars, st.session_state.yearly, params,
+                             label="Exportação do detalhe").wait(BACKGROUND_WAIT)
+    detail_job = detail_runner.job
+    if detail_job is not None:
+        _, job_fmt, job_path = detail_job.key
+        if detail_job.running:
+            job_progress("detalhe")
+        elif detail_job.cancelled:
+            st.info("Exportação cancelada.")
+        elif detail_job.error is not None:
+            st.error(f"❌ Erro ao exportar detalhe: {detail_job.error}")
+        elif os.path.exists(job_path):
+            st.success(f"Detalhe pronto: {detail_job.result['linhas']:,} linhas de {detail_job.result['carros']:,} carros.")
+            st.download_button(f"Baixar detalhe ({job_fmt.upper()})", pathlib.Path(job_path).read_bytes,
+                               file_name=f"detalhe_myluxcars.{job_fmt}", mime=DETAIL_FORMATS[job_fmt])
+
 # =============================
 # Salvar/Carregar Dados Completos
 # =============================
@@ -416,27 +724,12 @@ with st.expander("Salvar/Carregar Projeto Completo"):
 
     # Preparar dados para salvar
     def prepare_data_for_export():
-        return {
-            "cars": st.session_state.cars.to_dict('records'),
-            "yearly": st.session_state.yearly.to_dict('records'),
-            "global_params": {
-                "horizon_years": horizon_years,
-                "financing_term": financing_term,
-                "upsell_rate": upsell_rate,
-                "tax_rate": tax_rate,
-                "deductions_rate_by_year": deductions_rate_by_year,
-                "marketing_rate_by_year": marketing_rate_by_year,
-                "team_cost_by_year": team_cost_by_year,
-                "platform_cost_by_year": platform_cost_by_year,
-                "other_fixed_by_year": other_fixed_by_year
-            },
-            "timestamp": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+        return project_to_dict(st.session_state.cars, st.session_state.yearly, params)
 
     # Botão para download do JSON
     if st.button("Gerar Arquivo de Dados"):
-        data_to_export = prepare_data_for_export()
-        json_str = pd.io.json.dumps(data_to_export, indent=2)
+        # Memoizado pelo conteúdo: o timestamp do arquivo é o da primeira geração deste conteúdo
+        json_str = memo("projeto_json", (), lambda: pd.io.json.dumps(prepare_data_for_export(), indent=2))
 
         st.download_button(
             label="Baixar Dados Completos (JSON)",
@@ -449,14 +742,43 @@ with st.expander("Salvar/Carregar Projeto Completo"):
     # Botão para salvar como arquivo padrão
     if st.button("💾 Salvar como Padrão do Sistema"):
         try:
-            data_to_export = prepare_data_for_export()
-            import json
-            with open('frota_myluxcars.json', 'w', encoding='utf-8') as f:
-                json.dump(data_to_export, f, indent=2, ensure_ascii=False)
-            st.success("✅ Dados salvos como padrão! Próxima vez que abrir o sistema, estes dados aparecerão automaticamente.")
+            # Gravação atômica e travada, com nova versão no histórico; o cache compartilhado é relido na hora
+            saved = SnapshotStore(DEFAULT_PROJECT_PATH).save(st.session_state.cars, st.session_state.yearly, params)
+            shared_project_cache().refresh(DEFAULT_PROJECT_PATH)
+            st.success(f"✅ Dados salvos como padrão (versão {saved['versao']})! "
+                       "Próxima vez que abrir o sistema, estes dados aparecerão automaticamente.")
         except Exception as e:
             st.error(f"❌ Erro ao salvar arquivo padrão: {str(e)}")
 
+    # Histórico de versões do padrão
+    snapshot_store = SnapshotStore(DEFAULT_PROJECT_PATH)
+    versions = snapshot_store.list()
+    if not versions.empty:
+        st.markdown("**Histórico de versões do padrão:**")
+        st.dataframe(versions, hide_index=True, use_container_width=True)
+        version_ids = versions["Versao"].tolist()
+        vc1, vc2 = st.columns(2)
+        with vc1:
+            diff_old = st.selectbox("Comparar versão", version_ids, index=min(1, len(version_ids) - 1), key="snap_old")
+        with vc2:
+            diff_new = st.selectbox("com a versão", version_ids, index=0, key="snap_new")
+        if diff_old != diff_new:
+            changes = snapshot_store.diff(diff_old, diff_new)
+            if changes.empty:
+                st.info("Sem diferenças entre as versões.")
+            else:
+                st.dataframe(changes, hide_index=True, use_container_width=True)
+        restore_version = st.selectbox("Restaurar versão", version_ids, key="snap_restore")
+        if st.button("Restaurar como Padrão"):
+            try:
+                snapshot_store.restore(restore_version)
+                shared_project_cache().refresh(DEFAULT_PROJECT_PATH)
+                st.session_state.cars, st.session_state.yearly, st.session_state.global_params = \
+                    shared_project_cache().load(DEFAULT_PROJECT_PATH)
+                st.rerun()
+            except Exception as e:
+                st.error(f"❌ Erro ao restaurar versão: {str(e)}")
+
     st.markdown("---")
     st.markdown("**Carregue um arquivo de dados salvo anteriormente:**")
 
@@ -468,17 +790,22 @@ with st.expander("Salvar/Carregar Projeto Completo"):
 
     if uploaded_file is not None:
         try:
-            # Ler o arquivo JSON
-            data_loaded = pd.read_json(uploaded_file)
+            # Ler o arquivo JSON e validar cadastro e dados anuais contra o esquema
+            data_loaded = json.load(uploaded_file)
+            if not isinstance(data_loaded, dict) or 'cars' not in data_loaded:
+                raise ValueError("o arquivo não tem o bloco 'cars' de um projeto MyLuxCars")
+            loaded_cars, loaded_yearly, _ = project_from_dict(data_loaded)
+            loaded_cars, loaded_yearly, load_errors = validate_project(loaded_cars, loaded_yearly)
+            if not load_errors.empty:
+                n_invalid = int((load_errors["Nivel"] == "erro").sum())
+                st.warning(f"{n_invalid:,} erros (linhas que não serão carregadas) e {len(load_errors) - n_invalid:,} "
+                           "avisos (linhas carregadas como estão).")
+                st.dataframe(load_errors, hide_index=True, use_container_width=True)
 
             if st.button("Carregar Dados do Arquivo"):
-                # Restaurar dados da frota
-                if 'cars' in data_loaded:
-                    st.session_state.cars = pd.DataFrame(data_loaded['cars'])
-
-                # Restaurar dados anuais
-                if 'yearly' in data_loaded:
-                    st.session_state.yearly = pd.DataFrame(data_loaded['yearly'])
+                # Restaurar dados da frota e dados anuais
+                st.session_state.cars = editable(loaded_cars)
+                st.session_state.yearly = editable(loaded_yearly)
 
                 # Restaurar parâmetros globais
                 if 'global_params' in data_loaded:
@@ -517,7 +844,110 @@ with st.expander("Salvar/Carregar Projeto Completo"):
     **💡 Dica:** Use "Salvar como Padrão" para que seus dados apareçam automaticamente toda vez que abrir o sistema!
     """)
 
-st.caption("Obs.: Juros no P&L usam a coluna 'Juros_%_sobre_preco'. Parcela total (caixa) usa o prazo global selecionado e a tabela padrão de % sobre o preço do carro.")
+# =============================
+# Portfólio de frotas
+# =============================
+TABLE_LABELS = {"PnL": "P&L", "Cash": "Caixa"}
+
+def show_tables(tables):
+    st.markdown("**P&L**")
+    st.dataframe(tables["PnL"].style.format(PNL_FORMAT))
+    st.markdown("**Caixa**")
+    st.dataframe(tables["Cash"].style.format(CASH_FORMAT))
+
+with st.expander("Portfólio – Várias Frotas (diretório de projetos)"):
+    st.caption("Cada arquivo de projeto (JSON/SQLite) do diretório é uma frota, calculada com os próprios "
+               "parâmetros globais; o consolidado soma as frotas ano a ano. Só as frotas cujo arquivo mudou "
+               "são recalculadas.")
+    portfolio_dir = st.text_input("Diretório dos projetos", key="portfolio_dir", placeholder="ex.: frotas/")
+    portfolio_paths = list_projects(portfolio_dir) if portfolio_dir and os.path.isdir(portfolio_dir) else []
+    if portfolio_dir and not os.path.isdir(portfolio_dir):
+        st.warning(f"Diretório não encontrado: {portfolio_dir}")
+    elif portfolio_dir and not portfolio_paths:
+        st.info("Nenhum arquivo de projeto (.json/.sqlite) no diretório.")
+    if portfolio_paths:
+        portfolio_runner = runner("portfolio")
+        portfolio_job = portfolio_runner.submit(portfolio_key(portfolio_paths), evaluate_portfolio, portfolio_paths,
+                                                label="Portfólio")
+        portfolio_job.wait(BACKGROUND_WAIT)
+        if portfolio_job.running:
+            job_progress("portfolio")
+        elif portfolio_job.error is not None and not portfolio_job.cancelled:
+            st.error(f"❌ Erro ao avaliar o portfólio: {portfolio_job.error}")
+        portfolio_last = portfolio_runner.last()
+        if portfolio_last is not None:
+            if portfolio_last[0] != portfolio_job.key:
+                st.caption("Mostrando o resultado anterior até o novo cálculo terminar.")
+            portfolio = portfolio_last[1]
+            for name, error in portfolio.errors.items():
+                st.warning(f"{name}: não foi possível avaliar ({error})")
+            st.dataframe(portfolio.summary(), hide_index=True, use_container_width=True,
+                         column_config={c: st.column_config.NumberColumn(format="$%.0f")
+                                        for c in ["ReceitaLiquida", "EBITDA", "LucroLiquido", "CaixaFinal"]})
+
+            consolidated = portfolio.consolidated()
+            tabs = st.tabs(["Consolidado"] + list(portfolio.fleets))
+            with tabs[0]:
+                show_tables(consolidated)
+            for tab, fleet in zip(tabs[1:], portfolio.fleets.values()):
+                with tab:
+                    st.caption(f"{fleet.path} · {fleet.n_cars:,} carros")
+                    show_tables(fleet.tables)
+
+            st.markdown("**Comparação entre frotas**")
+            pc1, pc2 = st.columns(2)
+            with pc1:
+                compare_table = st.radio("Tabela", list(TABLE_LABELS), format_func=TABLE_LABELS.get,
+                                         horizontal=True, key="portfolio_table")
+            with pc2:
+                compare_metric = st.selectbox("Métrica", list(consolidated[compare_table].columns),
+                                              index=list(consolidated[compare_table].columns).index("LucroLiquido"),
+                                              key="portfolio_metric")
+            compare_df = (portfolio.compare(compare_table, compare_metric).reset_index()
+                          .melt(id_vars="Ano", var_name="Frota", value_name="Valor"))
+            compare_chart = alt.Chart(compare_df).mark_bar().encode(
+                x="Ano:O", xOffset="Frota:N", y=alt.Y("Valor:Q", title=compare_metric), color="Frota:N",
+                tooltip=["Frota", "Ano", alt.Tooltip("Valor:Q", format=",.0f")])
+            st.altair_chart(compare_chart, use_container_width=True)
+
+if amortizing:
+    st.caption("Obs.: Juros no P&L e principal (caixa) vêm da tabela de amortização (Price) de cada carro: taxa, prazo, "
+               "entrada e balão do cadastro ou, se vazios, os globais da barra lateral. A entrada sai do caixa na compra "
+               "e o saldo devedor é quitado na venda.")
+else:
+    st.caption("Obs.: Juros no P&L usam a coluna 'Juros_%_sobre_preco'. Parcela total (caixa) usa o prazo global "
+               "selecionado e a tabela padrão de % sobre o preço do carro.")
+
+# =============================
+# Perfil de desempenho (debug)
+# =============================
+if run_profile is not None:
+    run_profile.stop()
+    if "profile_history" not in st.session_state:
+        st.session_state.profile_history = ProfileHistory()
+    history = st.session_state.profile_history
+    history.resize(int(profile_keep))
+    # Jobs em segundo plano têm perfil próprio, guardado quando o job termina
+    for slot in st.session_state.get("runners", {}).values():
+        for job_profile in slot.take_profiles():
+            history.add(job_profile)
+    history.add(run_profile)
+    with st.sidebar.expander("Perfil de desempenho", expanded=True):
+        memo_stats = shared_cache().stats()
+        st.caption(f"Último rerun: {run_profile.total_seconds * 1000:,.1f} ms · memo: {memo_stats['entradas']} entradas, "
+                   f"{memo_stats['bytes'] / 1e6:,.1f} MB, {memo_stats['acertos']} acertos / {memo_stats['faltas']} faltas")
+        last = run_profile.to_frame()
+        last["Etapa"] = ["  " * d + n for d, n in zip(last["Profundidade"], last["Etapa"])]
+        st.dataframe(last.drop(columns="Profundidade"), hide_index=True, use_container_width=True,
+                     column_config={"Segundos": st.column_config.NumberColumn(format="%.4f")})
+        totals = history.totals()
+        st.altair_chart(alt.Chart(totals).mark_bar().encode(
+            x=alt.X("Execucao:O", title="Rerun"), y=alt.Y("Segundos:Q"), tooltip=["Execucao", "Rotulo", "Segundos"]),
+            use_container_width=True)
+        st.download_button("Baixar perfil (JSON)", history.to_json().encode("utf-8"),
+                           file_name="perfil_myluxcars.json", mime="application/json")
+        st.download_button("Baixar perfil (CSV)", history.to_csv().encode("utf-8"),
+                           file_name="perfil_myluxcars.csv", mime="text/csv")
 
 # Configurações específicas para deployment
 if 'REPLIT_DEPLOYMENT' in os.environ:
@@ -0,0 +1,21 @@
+"""Núcleo de cálculo do MyLuxCars (P&L e Caixa da frota), independente do Streamlit."""
+
+from .core import (
+    YEARS,
+    GlobalParams,
+    compute_per_year_tables,
+    empty_cars_df,
+    template_yearly_inputs,
+)
+from .project import load_project, project_from_dict, project_to_dict
+
+__all__ = [
+    "YEARS",
+    "GlobalParams",
+    "compute_per_year_tables",
+    "empty_cars_df",
+    "template_yearly_inputs",
+    "load_project",
+    "project_from_dict",
+    "project_to_dict",
+]
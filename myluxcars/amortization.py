@@ -0,0 +1,129 @@
+"""Financiamento por carro com tabela de amortização (sistema Price com entrada e balão).
+
+No modo legado (padrão) a parcela anual é um % fixo do preço pelo prazo global
+(:data:`myluxcars.core.FINANCING_TERM_TO_ANNUAL_INSTALLMENT`) e o principal é a parcela
+menos o juro P&L informado; com ``GlobalParams.loan_mode = "amortizacao"``:
+
+* cada carro tem taxa, prazo, entrada e balão próprios (colunas opcionais do cadastro,
+  :data:`LOAN_COLUMNS`; vazias usam os valores de :class:`~myluxcars.core.GlobalParams`);
+* juros e principal vêm da tabela de amortização, período a período (anual ou mensal),
+  e as parcelas param ao fim do prazo;
+* a entrada sai do caixa no primeiro período do carro e o saldo devedor é quitado no
+  período da venda.
+
+As tabelas são calculadas para 1 unidade financiada e memorizadas por (taxa, prazo,
+balão, períodos por ano); a frota inteira é avaliada indexando as tabelas dos poucos
+produtos distintos e escalando pelo valor financiado de cada carro.
+"""
+
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+LOAN_MODES = ("legado", "amortizacao")
+# Colunas opcionais do cadastro: taxa anual (%), prazo (anos), entrada e balão (% do preço)
+LOAN_COLUMNS = ["TaxaFinanciamento_%", "PrazoFinanciamento", "Entrada_%", "Balao_%"]
+
+
+@lru_cache(maxsize=512)
+def unit_schedule(annual_rate: float, term_years: int, balloon_ratio: float = 0.0,
+                  periods_per_year: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Juros, amortização e saldo inicial por período de um empréstimo de 1 unidade.
+
+    Parcelas constantes (Price) com ``balloon_ratio`` do valor financiado pago junto
+    com a última parcela. Os arrays são somente leitura (compartilhados pelo cache).
+    """
+    n = int(round(term_years * periods_per_year))
+    if n <= 0:
+        empty = np.zeros(0)
+        return empty, empty, empty
+    r = (1.0 + annual_rate) ** (1.0 / periods_per_year) - 1.0
+    if abs(r) < 1e-12:
+        payment = (1.0 - balloon_ratio) / n
+    else:
+        payment = (1.0 - balloon_ratio * (1.0 + r) ** -n) * r / (1.0 - (1.0 + r) ** -n)
+    # Saldo no início de cada período: B_k = (1+r)^k − pmt·((1+r)^k − 1)/r
+    k = np.arange(n, dtype=float)
+    growth = (1.0 + r) ** k
+    balance = growth - payment * (k if abs(r) < 1e-12 else (growth - 1.0) / r)
+    interest = balance * r
+    principal = payment - interest
+    principal[-1] += balloon_ratio
+    for arr in (interest, principal, balance):
+        arr.setflags(write=False)
+    return interest, principal, balance
+
+
+def loan_terms(cars: pd.DataFrame, params) -> Dict[str, np.ndarray]:
+    """Taxa (fração a.a.), prazo (anos), entrada e balão (frações do preço) por carro do cadastro."""
+    defaults = {
+        "TaxaFinanciamento_%": params.loan_rate * 100.0,
+        "PrazoFinanciamento": params.financing_term,
+        "Entrada_%": params.down_payment_rate * 100.0,
+        "Balao_%": params.balloon_rate * 100.0,
+    }
+    values = {}
+    for col in LOAN_COLUMNS:
+        col_values = (pd.to_numeric(cars[col], errors="coerce").to_numpy(dtype=float) if col in cars.columns
+                      else np.full(len(cars), np.nan))
+        values[col] = np.where(np.isnan(col_values), defaults[col], col_values)
+    return {
+        "rate": values["TaxaFinanciamento_%"] / 100.0,
+        "term": np.maximum(np.round(values["PrazoFinanciamento"]), 0).astype(int),
+        "entrada": np.clip(values["Entrada_%"] / 100.0, 0.0, 1.0),
+        "balao": np.clip(values["Balao_%"] / 100.0, 0.0, 1.0),
+    }
+
+
+def _product_tables(rate: np.ndarray, term: np.ndarray, balloon_ratio: np.ndarray, periods_per_year: int):
+    """Códigos de produto por elemento e tabelas ``(produtos, períodos + 1)`` com zeros após o prazo."""
+    codes = np.zeros(rate.shape, dtype=np.int64)
+    for arr in (rate, term, balloon_ratio):
+        uniq, inv = np.unique(arr, return_inverse=True)
+        codes = codes * len(uniq) + inv.reshape(arr.shape)
+    products, first, product_idx = np.unique(codes.ravel(), return_index=True, return_inverse=True)
+    length = int(term.max(initial=0)) * periods_per_year + 1
+    tables = np.zeros((3, len(products), length))
+    for p, i in enumerate(first):
+        sched = unit_schedule(float(rate.flat[i]), int(term.flat[i]), float(balloon_ratio.flat[i]), periods_per_year)
+        for t, arr in enumerate(sched):
+            tables[t, p, :len(arr)] = arr
+    return product_idx.reshape(rate.shape), tables
+
+
+def loan_flows(periods_since_purchase: np.ndarray, owned: np.ndarray, sold: np.ndarray, preco: np.ndarray,
+               terms: Dict[str, np.ndarray], periods_per_year: int = 1) -> Dict[str, np.ndarray]:
+    """Juros, principal (com quitação na venda) e entrada por período.
+
+    ``periods_since_purchase`` é o índice do período desde a compra (0 = período da
+    compra); ``owned`` marca os períodos com o carro na frota e ``sold`` o período
+    da venda (sem quitação se o carro não chegou a entrar na frota). ``preco`` e os
+    arrays de ``terms`` fazem broadcast com esse formato.
+    """
+    shape = np.broadcast_shapes(np.shape(periods_since_purchase), np.shape(owned), np.shape(sold))
+    k = np.broadcast_to(periods_since_purchase, shape)
+    # Produtos e valores financiados no formato por carro; só os índices sofrem broadcast
+    entrada = np.asarray(terms["entrada"], dtype=float)
+    financed = np.asarray(preco, dtype=float) * (1.0 - entrada)
+    balloon_ratio = np.where(financed > 0, terms["balao"] * preco / np.where(financed > 0, financed, 1.0), 0.0)
+    car_shape = np.broadcast_shapes(financed.shape, np.shape(terms["rate"]), np.shape(terms["term"]),
+                                    balloon_ratio.shape)
+    product, tables = _product_tables(np.broadcast_to(terms["rate"], car_shape).astype(float),
+                                      np.broadcast_to(terms["term"], car_shape).astype(int),
+                                      np.minimum(np.broadcast_to(balloon_ratio, car_shape), 1.0),
+                                      periods_per_year)
+    product = np.broadcast_to(product, shape)
+    down = entrada * preco
+
+    valid = ~np.isnan(k) & (np.nan_to_num(k, nan=-1.0) >= 0)
+    kk = np.clip(np.nan_to_num(k, nan=0.0), 0, tables.shape[-1] - 1).astype(int)
+    interest, principal, balance = (tables[t][product, kk] for t in range(3))
+    paying = owned & valid
+    return {
+        "JurosPL": np.where(paying, interest * financed, 0.0),
+        "Principal": (np.where(paying, principal * financed, 0.0)
+                      + np.where(sold & valid & (k >= 1), balance * financed, 0.0)),
+        "Entrada": np.where(paying & (k == 0), down, 0.0),
+    }
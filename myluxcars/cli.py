@@ -0,0 +1,128 @@
+"""Linha de comando: calcula P&L e Caixa de arquivos de projeto sem iniciar o Streamlit.
+
+Exemplo::
+
+    python -m myluxcars frota_myluxcars.json outros/*.json --out-dir resultados/
+    python -m myluxcars frota_myluxcars.json --convert-to sqlite   # gera frota_myluxcars.sqlite
+    python -m myluxcars grande.json --convert-to json --sparse       # só defaults por Categoria + overrides
+    python -m myluxcars grande.json --detail parquet                 # também grava grande_detalhe.parquet
+    python -m myluxcars frotas/ --consolidate --out-dir resultados/  # cada frota do diretório + consolidado
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from .core import GlobalParams, compute_per_year_tables
+from .export import FORMATS as DETAIL_FORMATS, export_detail
+from .portfolio import evaluate_portfolio, expand_paths
+from .project import load_project, save_project
+
+
+def convert_project(path: str, out_dir: str, fmt: str, sparse: bool = False) -> List[str]:
+    """Regrava o projeto em outro formato (``json`` ou ``sqlite``) como ``<nome>.<fmt>``."""
+    cars, yearly, global_params = load_project(path, dense=False)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    out_path = os.path.join(out_dir, f"{stem}.{fmt}")
+    save_project(out_path, cars, yearly, global_params, sparse=sparse)
+    return [out_path]
+
+
+def run_project(path: str, out_dir: str, detail: Optional[str] = None) -> List[str]:
+    """Calcula um projeto e grava ``<nome>_pnl.csv`` e ``<nome>_caixa.csv``; devolve os caminhos.
+
+    Com ``detail`` (``csv``, ``parquet`` ou ``xlsx``), grava também ``<nome>_detalhe.<detail>``
+    com o detalhe carro × ano, gerado em blocos.
+    """
+    cars, yearly, global_params = load_project(path, dense=False)
+    params = GlobalParams.from_dict(global_params)
+    results = compute_per_year_tables(cars, yearly, params)
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    pnl_path = os.path.join(out_dir, f"{stem}_pnl.csv")
+    cash_path = os.path.join(out_dir, f"{stem}_caixa.csv")
+    results["PnL"].to_csv(pnl_path)
+    results["Cash"].to_csv(cash_path)
+    written = [pnl_path, cash_path]
+    if detail:
+        detail_path = os.path.join(out_dir, f"{stem}_detalhe.{detail}")
+        export_detail(detail_path, detail, cars, yearly, params)
+        written.append(detail_path)
+    return written
+
+
+def run_portfolio(paths: List[str], out_dir: str, detail: Optional[str] = None) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+    """Avalia as frotas em paralelo e grava as tabelas de cada uma, como :func:`run_project`, mais o consolidado.
+
+    O consolidado vai para ``consolidado_pnl.csv``, ``consolidado_caixa.csv`` e
+    ``consolidado_frotas.csv`` (resumo por frota). Devolve ``(arquivos por frota, erros por frota)``.
+    """
+    result = evaluate_portfolio(paths)
+    written = {}
+    for name, fleet in result.fleets.items():
+        files = [os.path.join(out_dir, f"{name}_pnl.csv"), os.path.join(out_dir, f"{name}_caixa.csv")]
+        fleet.tables["PnL"].to_csv(files[0])
+        fleet.tables["Cash"].to_csv(files[1])
+        if detail:
+            cars, yearly, global_params = load_project(fleet.path, dense=False)
+            files.append(os.path.join(out_dir, f"{name}_detalhe.{detail}"))
+            export_detail(files[-1], detail, cars, yearly, GlobalParams.from_dict(global_params))
+        written[fleet.path] = files
+
+    consolidated = result.consolidated()
+    files = [os.path.join(out_dir, f"consolidado_{n}.csv") for n in ("pnl", "caixa", "frotas")]
+    consolidated["PnL"].to_csv(files[0])
+    consolidated["Cash"].to_csv(files[1])
+    result.summary().to_csv(files[2], index=False)
+    written["consolidado"] = files
+    return written, result.errors
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="myluxcars", description="Calcula P&L e Caixa de projetos MyLuxCars.")
+    parser.add_argument("projects", nargs="+",
+                        help="Arquivos de projeto JSON (formato de 'Salvar Projeto') ou SQLite, ou diretórios com eles.")
+    parser.add_argument("--out-dir", default=".", help="Diretório de saída dos CSVs (padrão: atual).")
+    parser.add_argument("--convert-to", choices=["json", "sqlite"],
+                        help="Em vez de calcular, converte cada projeto para o formato indicado.")
+    parser.add_argument("--sparse", action="store_true",
+                        help="Com --convert-to json, grava só defaults por Categoria e overrides (yearly_layers).")
+    parser.add_argument("--detail", choices=list(DETAIL_FORMATS),
+                        help="Grava também o detalhe carro × ano (<nome>_detalhe.<formato>).")
+    parser.add_argument("--consolidate", action="store_true",
+                        help="Trata os projetos como um portfólio: avalia em paralelo e grava também o consolidado.")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    paths = expand_paths(args.projects)
+    if args.consolidate and not args.convert_to:
+        try:
+            written, errors = run_portfolio(paths, args.out_dir, args.detail)
+        except (OSError, ValueError, KeyError, ImportError, sqlite3.Error) as e:
+            print(f"portfólio: erro: {e}", file=sys.stderr)
+            return 1
+        for name, error in errors.items():
+            print(f"{name}: erro: {error}", file=sys.stderr)
+        for path, files in written.items():
+            print(f"{path}: {', '.join(files)}")
+        return 1 if errors else 0
+
+    failures = 0
+    for path in paths:
+        try:
+            if args.convert_to:
+                written = convert_project(path, args.out_dir, args.convert_to, args.sparse)
+            else:
+                written = run_project(path, args.out_dir, args.detail)
+        except (OSError, ValueError, KeyError, ImportError, sqlite3.Error) as e:
+            print(f"{path}: erro: {e}", file=sys.stderr)
+            failures += 1
+            continue
+        print(f"{path}: {', '.join(written)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""Exportação do detalhe carro × ano (CSV, Parquet ou XLSX) em blocos de carros.
+
+O detalhe é o mesmo que :func:`myluxcars.core.compute_per_year_tables` monta
+internamente (receita, custos, depreciação, juros, principal, valor contábil na
+venda) – uma linha por carro/ano. Para frotas grandes ele nunca é montado inteiro:
+os carros são processados em blocos de ``chunk_cars`` (``prepare_rows`` +
+``compute_row_values`` só das linhas do bloco) e cada bloco vai direto para o
+arquivo. A memória fica proporcional ao bloco, não à frota.
+
+As somas anuais de cada bloco são acumuladas durante a passada; no XLSX elas geram
+as abas de P&L e Caixa ao lado do detalhe, sem recalcular a frota.
+
+A exportação informa o progresso por bloco e pode ser cancelada quando roda como
+job de :class:`myluxcars.worker.BackgroundRunner` (o app continua respondendo
+enquanto o arquivo é gerado).
+
+CSV usa pandas; Parquet, pyarrow; XLSX, ``openpyxl`` (em ``requirements.txt``; sem ele, só
+XLSX falha, com erro explicando a dependência).
+"""
+
+import contextlib
+import os
+import threading
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .core import (COST_COLUMNS, ROW_SUM_COLUMNS, GlobalParams, aggregate_tables, car_blocks,
+                   compute_row_values, prepare_rows, sum_by_year)
+from .profiling import stage
+from .worker import report_progress
+
+DETAIL_COLUMNS = (
+    ["CarID", "AnoOffset", "IsActive", "IsSale", "ReceitaBruta", "Upsell", "Deducoes", "ReceitaLiquida"]
+    + [c.replace("_USD", "") for c in COST_COLUMNS]
+    + ["Depreciacao", "JurosPL", "Principal", "ParcelaTotal", "Entrada", "VendaValorContabil"]
+)
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet",
+           "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
+DEFAULT_CHUNK_CARS = 20_000
+XLSX_MAX_ROWS = 1_048_576  # limite de linhas por aba do Excel (cabeçalho incluso)
+
+
+def detail_chunks(cars: pd.DataFrame, yearly, params: GlobalParams,
+                  chunk_cars: int = DEFAULT_CHUNK_CARS) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """Pares ``(detalhe, somas_por_ano)`` de cada bloco de carros.
+
+    ``detalhe`` tem as colunas :data:`DETAIL_COLUMNS`; ``somas_por_ano`` é o
+    :func:`myluxcars.core.sum_by_year` do bloco (somado entre blocos, dá as tabelas da frota).
+    """
+    for cars_block, yearly_block in car_blocks(cars, yearly, params.horizon_years, chunk_cars):
+        with stage("export.bloco", rows=len(yearly_block)):
+            y = prepare_rows(cars_block, yearly_block, params.horizon_years)
+            if y.empty:
+                continue
+            compute_row_values(y, params)
+            # Linhas na ordem do cadastro e, dentro de cada carro, por ano
+            ordem = np.lexsort((y["AnoOffset"].to_numpy(), y["_CarIdx"].to_numpy()))
+            detail = y[DETAIL_COLUMNS].iloc[ordem].reset_index(drop=True)
+            detail["CarID"] = detail["CarID"].astype(str)
+            detail["AnoOffset"] = detail["AnoOffset"].astype(int)
+            yield detail, sum_by_year(y)
+
+
+class _CsvSink:
+    def __init__(self, path: str):
+        self._f = open(path, "w", encoding="utf-8", newline="")
+        self._header = True
+
+    def write(self, detail: pd.DataFrame):
+        detail.to_csv(self._f, header=self._header, index=False)
+        self._header = False
+
+    def close(self, tables: Dict[str, pd.DataFrame]):
+        if self._header:
+            pd.DataFrame(columns=DETAIL_COLUMNS).to_csv(self._f, index=False)
+        self._f.close()
+
+    def abort(self):
+        self._f.close()
+
+
+class _ParquetSink:
+    def __init__(self, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa, self._pq, self._path = pa, pq, path
+        self._writer = None
+
+    def write(self, detail: pd.DataFrame):
+        if self._writer is None:
+            schema = self._pa.Schema.from_pandas(detail, preserve_index=False)
+            self._writer = self._pq.ParquetWriter(self._path, schema)
+        self._writer.write_table(self._pa.Table.from_pandas(detail, schema=self._writer.schema,
+                                                            preserve_index=False))
+
+    def close(self, tables: Dict[str, pd.DataFrame]):
+        if self._writer is None:
+            pd.DataFrame(columns=DETAIL_COLUMNS).to_parquet(self._path, index=False)
+        else:
+            self._writer.close()
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class _XlsxSink:
+    """Pasta de trabalho em modo de escrita contínua.
+
+    Abas "Detalhe" (e "Detalhe 2"... além do limite de linhas do Excel), "PnL" e "Caixa".
+    """
+
+    def __init__(self, path: str):
+        try:
+            from openpyxl import Workbook
+        except ImportError as e:
+            raise ImportError("exportar XLSX requer o pacote openpyxl (pip install openpyxl)") from e
+        self._path = path
+        self._wb = Workbook(write_only=True)
+        self._sheets = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self._sheets += 1
+        self._ws = self._wb.create_sheet("Detalhe" if self._sheets == 1 else f"Detalhe {self._sheets}")
+        self._ws.append(DETAIL_COLUMNS)
+        self._rows = 1
+
+    def write(self, detail: pd.DataFrame):
+        # NaN vira célula vazia; tipos numpy viram tipos Python (openpyxl não aceita numpy.bool_)
+        values = detail.astype(object).where(detail.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if self._rows == XLSX_MAX_ROWS:
+                self._new_sheet()
+            self._ws.append([v.item() if isinstance(v, np.generic) else v for v in row])
+            self._rows += 1
+
+    def close(self, tables: Dict[str, pd.DataFrame]):
+        for title, key in (("PnL", "PnL"), ("Caixa", "Cash")):
+            ws = self._wb.create_sheet(title)
+            table = tables[key].reset_index()
+            ws.append([str(c) for c in table.columns])
+            for row in table.itertuples(index=False, name=None):
+                ws.append([None if pd.isna(v) else float(v) for v in row])
+        self._wb.save(self._path)
+
+    def abort(self):
+        self._wb.close()
+
+
+_SINKS = {"csv": _CsvSink, "parquet": _ParquetSink, "xlsx": _XlsxSink}
+
+
+def export_detail(path: str, fmt: str, cars: pd.DataFrame, yearly, params: GlobalParams,
+                  chunk_cars: int = DEFAULT_CHUNK_CARS) -> dict:
+    """Grava o detalhe carro × ano em ``path`` no formato ``fmt`` (``csv``, ``parquet`` ou ``xlsx``).
+
+    O arquivo é escrito num temporário ao lado de ``path`` e só o substitui no fim; se
+    a exportação falhar ou for cancelada (job de :mod:`myluxcars.worker`), o temporário
+    é apagado. O progresso é informado por bloco. Devolve ``{"linhas", "carros",
+    "tabelas"}`` (tabelas anuais de P&L e Caixa do detalhe).
+    """
+    if fmt not in _SINKS:
+        raise ValueError(f"formato de exportação desconhecido: {fmt!r} (use {', '.join(_SINKS)})")
+    total_cars = int(cars["CarID"].dropna().astype(str).nunique())
+    tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+    sink = _SINKS[fmt](tmp)
+    rows = done_cars = 0
+    by_year = None
+    try:
+        for detail, sums in detail_chunks(cars, yearly, params, chunk_cars):
+            with stage(f"export.{fmt}", rows=len(detail)):
+                sink.write(detail)
+            by_year = sums if by_year is None else by_year.add(sums, fill_value=0.0)
+            rows += len(detail)
+            done_cars += detail["CarID"].nunique()
+            report_progress(done_cars / max(total_cars, 1), f"{done_cars:,} de {total_cars:,} carros")
+        if by_year is None:
+            by_year = pd.DataFrame(0.0, index=pd.Index(params.years, name="Ano"), columns=ROW_SUM_COLUMNS)
+        tables = aggregate_tables(by_year.reindex(pd.Index(params.years, name="Ano"), fill_value=0.0), params)
+        sink.close(tables)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(Exception):
+            sink.abort()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+    return {"linhas": rows, "carros": done_cars, "tabelas": tables}
@@ -0,0 +1,92 @@
+"""Impressões digitais (hashes de conteúdo) de frotas, carros e parâmetros.
+
+Os hashes por linha vêm de :func:`pandas.util.hash_pandas_object`; por carro, os hashes
+das linhas são somados (módulo 2**64), o que torna o resultado independente da ordem
+das linhas – o ``data_editor`` reordena ``yearly`` a cada edição.
+"""
+
+import hashlib
+import json
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .amortization import LOAN_COLUMNS
+from .core import GlobalParams
+
+# Colunas do cadastro que entram no cálculo (as de financiamento são opcionais);
+# editar Marca/Modelo não invalida contribuições
+CAR_CALC_COLUMNS = ["CarID", "PrecoCompra"] + LOAN_COLUMNS
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def row_hashes(df: pd.DataFrame, columns: Optional[Sequence[str]] = None) -> np.ndarray:
+    """Hash ``uint64`` de cada linha (colunas em ordem alfabética, índice ignorado)."""
+    cols = sorted(columns if columns is not None else df.columns)
+    if df.empty:
+        return np.zeros(0, dtype=np.uint64)
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+
+
+def _sum_by_key(keys: pd.Series, hashes: np.ndarray, uniques: pd.Index) -> np.ndarray:
+    out = np.zeros(len(uniques), dtype=np.uint64)
+    codes = uniques.get_indexer(keys)
+    ok = codes >= 0
+    np.add.at(out, codes[ok], hashes[ok])
+    return out
+
+
+def car_fingerprints(cars: pd.DataFrame, yearly: pd.DataFrame,
+                     car_columns: Optional[Sequence[str]] = CAR_CALC_COLUMNS) -> pd.Series:
+    """Hash de conteúdo por CarID (linha de cadastro + todas as suas linhas anuais).
+
+    ``car_columns`` escolhe as colunas do cadastro consideradas (as ausentes são
+    ignoradas); ``None`` usa todas.
+    """
+    cars_use = cars.dropna(subset=["CarID"])
+    if car_columns is not None:
+        car_columns = [c for c in car_columns if c in cars_use.columns]
+    ids = pd.Index(cars_use["CarID"].astype(str).unique())
+    car_part = _sum_by_key(cars_use["CarID"].astype(str), row_hashes(cars_use, car_columns), ids)
+    if yearly.empty or "CarID" not in yearly.columns:
+        yearly_part = np.zeros(len(ids), dtype=np.uint64)
+    else:
+        yearly_part = _sum_by_key(yearly["CarID"].astype(str), row_hashes(yearly), ids)
+    with np.errstate(over="ignore"):
+        return pd.Series(car_part + yearly_part * _MIX, index=ids, name="fingerprint")
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Hash hexadecimal do conteúdo de um DataFrame (colunas e linhas; ordem das linhas importa)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(row_hashes(df, list(df.columns)).tobytes())
+    return h.hexdigest()
+
+
+def value_fingerprint(value) -> str:
+    """Hash hexadecimal de um valor serializável em JSON (dicionários com chaves ordenadas)."""
+    payload = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def params_fingerprint(params: GlobalParams) -> str:
+    """Hash hexadecimal dos parâmetros globais."""
+    return value_fingerprint(params.to_dict())
+
+
+def inputs_fingerprint(cars: pd.DataFrame, yearly: pd.DataFrame, params: GlobalParams) -> str:
+    """Hash hexadecimal das entradas completas do modelo (cadastro, grade anual e parâmetros).
+
+    Considera todas as colunas do cadastro (exportações incluem Marca/Modelo). As linhas
+    de ``yearly`` entram somadas, então reordená-las (o ``data_editor`` faz isso) não
+    muda o hash.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(frame_fingerprint(cars).encode())
+    h.update(json.dumps(sorted(str(c) for c in yearly.columns)).encode())
+    with np.errstate(over="ignore"):
+        h.update(np.array([len(yearly), row_hashes(yearly).sum(dtype=np.uint64)], dtype=np.uint64).tobytes())
+    h.update(params_fingerprint(params).encode())
+    return h.hexdigest()
@@ -0,0 +1,159 @@
+"""Representação matricial carro × ano da frota para avaliações em lote.
+
+Enquanto :func:`myluxcars.core.compute_per_year_tables` trabalha linha a linha sobre o
+DataFrame ``yearly``, as análises que avaliam muitas variantes da mesma frota
+(cenários, grades de parâmetros, calendários de compra/venda) usam matrizes densas
+``(carros, anos)``. Todos os estágios aceitam dimensões extras à esquerda, de modo
+que milhares de variantes são avaliadas numa única operação de arrays.
+"""
+
+from dataclasses import dataclass, fields, replace
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .amortization import LOAN_COLUMNS, loan_flows, loan_terms
+from .core import COST_COLUMNS, FINANCING_TERM_TO_ANNUAL_INSTALLMENT, GlobalParams, global_stage, prepare_rows
+
+STAGE_SUM_KEYS = ["ReceitaBruta", "CustosOperacionais", "Depreciacao", "JurosPL", "Principal", "VendaValorContabil",
+                  "Entrada"]
+
+
+@dataclass
+class FleetMatrix:
+    """Entradas da frota em matrizes ``(carros, anos)``; células sem linha em ``yearly`` ficam inativas."""
+
+    car_ids: np.ndarray
+    categoria: np.ndarray
+    years: np.ndarray
+    preco: np.ndarray        # (carros, 1)
+    present: np.ndarray      # (carros, anos) bool – existe linha carro/ano
+    diaria: np.ndarray
+    ocupacao: np.ndarray     # em %
+    depreciacao: np.ndarray  # taxa anual em % do preço
+    juros: np.ndarray        # juros P&L em % do preço
+    custos: np.ndarray       # soma dos custos operacionais em US$
+    ano_compra: np.ndarray
+    ano_venda: np.ndarray
+    loan: np.ndarray         # (carros, len(LOAN_COLUMNS)) financiamento por carro; NaN usa o padrão global
+
+    @property
+    def n_cars(self) -> int:
+        return len(self.car_ids)
+
+    def take(self, idx) -> "FleetMatrix":
+        """Subconjunto de carros (índices ou máscara), preservando os anos."""
+        return replace(self, **{f.name: getattr(self, f.name)[idx] for f in fields(self) if f.name != "years"})
+
+    def activity(self):
+        """Máscaras ``(ativo, venda)`` a partir de AnoCompra/AnoVenda informados."""
+        ano = self.years.astype(float)
+        sem_venda = np.isnan(self.ano_venda)
+        active = self.present & (ano >= self.ano_compra) & (sem_venda | (ano < self.ano_venda))
+        sale = self.present & ~sem_venda & (ano == self.ano_venda)
+        return active, sale
+
+
+def build_fleet_matrix(cars: pd.DataFrame, yearly: pd.DataFrame, horizon_years: int) -> FleetMatrix:
+    """Monta a :class:`FleetMatrix` da frota; linhas carro/ano duplicadas: a última prevalece.
+
+    ``yearly`` pode ser a grade densa ou uma :class:`myluxcars.layered.LayeredYearly`.
+    """
+    if hasattr(yearly, "to_dense"):
+        yearly = yearly.to_dense(cars, horizon_years)
+    cars_use = cars.dropna(subset=["CarID"])
+    years = np.arange(1, horizon_years + 1)
+    n, n_years = len(cars_use), len(years)
+
+    def blank(fill=0.0):
+        return np.full((n, n_years), fill, dtype=float)
+
+    fm = FleetMatrix(
+        car_ids=cars_use["CarID"].astype(str).to_numpy(),
+        categoria=(cars_use["Categoria"].astype(str).to_numpy() if "Categoria" in cars_use.columns
+                   else np.full(n, "", dtype=object)),
+        years=years,
+        preco=cars_use["PrecoCompra"].to_numpy(dtype=float).reshape(-1, 1),
+        present=np.zeros((n, n_years), dtype=bool),
+        diaria=blank(), ocupacao=blank(), depreciacao=blank(), juros=blank(), custos=blank(),
+        ano_compra=blank(1.0), ano_venda=blank(np.nan),
+        loan=np.column_stack([cars_use[c].to_numpy(dtype=float) if c in cars_use.columns else np.full(n, np.nan)
+                              for c in LOAN_COLUMNS]).reshape(n, len(LOAN_COLUMNS)),
+    )
+    if n == 0 or yearly.empty or "AnoOffset" not in yearly.columns:
+        return fm
+
+    y = prepare_rows(cars, yearly, horizon_years)
+    ano = y["AnoOffset"].to_numpy(dtype=float)
+    ok = (ano >= 1) & (ano == np.floor(ano))
+    y = y[ok]
+    rows, cols = y["_CarIdx"].to_numpy(), y["AnoOffset"].to_numpy(dtype=int) - 1
+
+    fm.present[rows, cols] = True
+    fm.diaria[rows, cols] = y["PrecoDiaria"].to_numpy(dtype=float)
+    fm.ocupacao[rows, cols] = y["TaxaOcupacao_%"].to_numpy(dtype=float)
+    fm.depreciacao[rows, cols] = y["TaxaDepreciacao_%"].to_numpy(dtype=float)
+    fm.juros[rows, cols] = y["Juros_%_sobre_preco"].to_numpy(dtype=float)
+    fm.custos[rows, cols] = np.nansum(y[COST_COLUMNS].to_numpy(dtype=float), axis=1)
+    if "AnoCompra" in y.columns:
+        fm.ano_compra[rows, cols] = y["AnoCompra"].to_numpy(dtype=float)
+    if "AnoVenda" in y.columns:
+        fm.ano_venda[rows, cols] = y["AnoVenda"].to_numpy(dtype=float)
+    return fm
+
+
+def car_stage(fm: FleetMatrix, params: GlobalParams, *,
+              diaria: Optional[np.ndarray] = None,
+              ocupacao: Optional[np.ndarray] = None,
+              depreciacao: Optional[np.ndarray] = None,
+              active: Optional[np.ndarray] = None,
+              sale: Optional[np.ndarray] = None,
+              financing_term: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Estágio por carro: contribuições ``(..., carros, anos)`` de cada carro em cada ano.
+
+    Qualquer entrada pode ser substituída por um array com dimensões extras à esquerda
+    (ex.: ``(cenários, carros, anos)``); o resultado segue o broadcast.
+    """
+    if active is None or sale is None:
+        base_active, base_sale = fm.activity()
+        active = base_active if active is None else active
+        sale = base_sale if sale is None else sale
+    diaria = fm.diaria if diaria is None else diaria
+    ocupacao = fm.ocupacao if ocupacao is None else ocupacao
+    depreciacao = fm.depreciacao if depreciacao is None else depreciacao
+
+    out = {}
+    out["ReceitaBruta"] = np.where(active, diaria * (ocupacao / 100.0) * 365.0, 0.0)
+    out["CustosOperacionais"] = np.where(active, fm.custos, 0.0)
+    out["Depreciacao"] = np.where(active, (depreciacao / 100.0) * fm.preco, 0.0)
+    out.update(loan_stage(fm, params, active=active, sale=sale, financing_term=financing_term))
+    # Valor contábil na venda: preço menos depreciação acumulada até o ano da venda
+    book = np.maximum(fm.preco - np.cumsum(out["Depreciacao"], axis=-1), 0.0)
+    out["VendaValorContabil"] = np.where(sale, book, 0.0)
+    return out
+
+
+def loan_stage(fm: FleetMatrix, params: GlobalParams, *, active: np.ndarray, sale: np.ndarray,
+               financing_term: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Juros P&L, principal e entrada ``(..., carros, anos)`` – a única parte que depende do prazo."""
+    term = params.financing_term if financing_term is None else financing_term
+    if params.amortizing:
+        # Períodos desde a compra = anos ativos anteriores (vale também para máscaras candidatas)
+        since_purchase = np.cumsum(active, axis=-1) - active
+        terms = loan_terms(pd.DataFrame(fm.loan, columns=LOAN_COLUMNS), replace(params, financing_term=term))
+        return loan_flows(since_purchase, active, sale, fm.preco,
+                          {k: v.reshape(-1, 1) for k, v in terms.items()})
+    juros = np.where(active, (fm.juros / 100.0) * fm.preco, 0.0)
+    parcela = np.where(active, FINANCING_TERM_TO_ANNUAL_INSTALLMENT[term] * fm.preco, 0.0)
+    return {"JurosPL": juros, "Principal": np.maximum(parcela - juros, 0.0), "Entrada": np.zeros_like(juros)}
+
+
+def year_sums(stage: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Soma as contribuições por carro: ``(..., carros, anos)`` → ``(..., anos)``."""
+    return {k: stage[k].sum(axis=-2) for k in STAGE_SUM_KEYS}
+
+
+def evaluate(fm: FleetMatrix, params: GlobalParams, **inputs) -> Dict[str, np.ndarray]:
+    """Avalia a frota (ou um lote de variantes) até LucroLiquido/CaixaFinal por ano."""
+    return global_stage(year_sums(car_stage(fm, params, **inputs)), fm.years, params)
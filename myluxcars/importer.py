@@ -0,0 +1,443 @@
+"""Importação em massa de cadastro e dados anuais a partir de CSV, XLSX ou Parquet.
+
+Os arquivos são lidos em blocos (``chunksize`` linhas): cada bloco tem as colunas
+mapeadas para o esquema (:func:`detect_mapping` reconhece nomes usuais de exportações
+de gestão de frota), é validado linha a linha e convertido para tipos compactos antes
+do próximo bloco ser lido – o arquivo bruto nunca fica inteiro na memória. Linhas
+inválidas são descartadas e relatadas em ``ImportResult.errors`` (linha, coluna, valor,
+erro, nível), limitadas a ``max_errors``.
+
+Nível ``"erro"`` descarta a linha; ``"aviso"`` só informa – valores que o modelo aceita
+não são rejeitados (ex.: AnoVenda depois do último ano do modelo = sem venda no
+horizonte). Em :func:`validate_project` (projeto salvo pelo app) também os valores
+fora das faixas viram avisos: a carga do projeto não perde linhas que o cálculo usa.
+
+Tipos compactos: CarID/Marca/Modelo/Categoria categóricos, AnoOffset em ``int8``,
+anos, meses e prazo em ``float32`` – só quando a conversão preserva todos os valores
+da coluna. Percentuais e valores em US$ continuam ``float64``: entram nas contas do
+modelo, e ``float32`` mudaria o resultado (62.3 não tem representação exata, e o
+produto com um ``float32`` sai em ``float32``).
+
+CSV e Parquet usam pandas/pyarrow; XLSX usa ``openpyxl`` (em ``requirements.txt``; sem ele, só
+XLSX falha, com erro explicando a dependência).
+"""
+
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from .amortization import LOAN_COLUMNS
+from .core import YEARLY_INPUT_COLUMNS, YEARS, yearly_defaults
+
+FORMATS = ("csv", "xlsx", "parquet")
+TABLES = ("cars", "yearly")
+DEFAULT_CHUNKSIZE = 50_000
+DEFAULT_MAX_ERRORS = 1_000
+ERROR_COLUMNS = ["Linha", "Coluna", "Valor", "Erro", "Nivel"]
+
+# Regras por coluna: (tipo, mínimo, máximo, obrigatória); tipo "texto", "inteiro" ou "numero"
+CAR_RULES = {
+    "CarID": ("texto", None, None, True),
+    "Ano": ("inteiro", 1900, 2100, False),
+    "Marca": ("texto", None, None, False),
+    "Modelo": ("texto", None, None, False),
+    "Categoria": ("texto", None, None, False),
+    "PrecoCompra": ("numero", 0.0, None, True),
+    "MesCompra": ("inteiro", 1, 12, False),
+    "MesVenda": ("inteiro", 1, 12, False),
+    "TaxaFinanciamento_%": ("numero", 0.0, 100.0, False),
+    "PrazoFinanciamento": ("inteiro", 1, 30, False),
+    "Entrada_%": ("numero", 0.0, 100.0, False),
+    "Balao_%": ("numero", 0.0, 100.0, False),
+}
+YEARLY_RULES = {
+    "CarID": ("texto", None, None, True),
+    "AnoOffset": ("inteiro", 1, len(YEARS), True),
+    "TaxaDepreciacao_%": ("numero", 0.0, 100.0, False),
+    "Juros_%_sobre_preco": ("numero", 0.0, 100.0, False),
+    "AnoCompra": ("inteiro", 1, None, False),
+    "AnoVenda": ("inteiro", 1, None, False),
+    "PrecoDiaria": ("numero", 0.0, None, False),
+    "TaxaOcupacao_%": ("numero", 0.0, 100.0, False),
+    "Seguro_USD": ("numero", 0.0, None, False),
+    "Manutencao_USD": ("numero", 0.0, None, False),
+    "Sinistro_USD": ("numero", 0.0, None, False),
+    "Combustivel_USD": ("numero", 0.0, None, False),
+    "Estacionamento_USD": ("numero", 0.0, None, False),
+}
+RULES = {"cars": CAR_RULES, "yearly": YEARLY_RULES}
+# Anos de compra/venda depois do último ano do modelo são aceitos (carro fora do horizonte), com aviso
+HORIZON_COLUMNS = ["AnoCompra", "AnoVenda"]
+KEY_COLUMNS = {"cars": ["CarID"], "yearly": ["CarID", "AnoOffset"]}
+# Cadastro: colunas sempre presentes no resultado (as opcionais só se vierem no arquivo)
+BASE_CAR_COLUMNS = ["CarID", "Ano", "Marca", "Modelo", "Categoria", "PrecoCompra"]
+OPTIONAL_IMPORT_CAR_COLUMNS = ["MesCompra", "MesVenda"] + LOAN_COLUMNS
+
+CATEGORICAL_COLUMNS = ["CarID", "Marca", "Modelo", "Categoria"]
+COMPACT_DTYPES = {
+    "Ano": "Int16",
+    "AnoOffset": "int8",
+    "MesCompra": "float32",
+    "MesVenda": "float32",
+    "PrazoFinanciamento": "float32",
+    "AnoCompra": "float32",
+    "AnoVenda": "float32",
+}
+
+# Nomes usuais (normalizados por _normalize_name) de cada coluna do esquema
+ALIASES = {
+    "CarID": ["id", "carid", "idcarro", "carro", "veiculo", "idveiculo", "vehicleid", "unitid", "unidade"],
+    "Ano": ["anomodelo", "modelyear", "year"],
+    "Marca": ["fabricante", "make", "brand", "manufacturer"],
+    "Modelo": ["model"],
+    "Categoria": ["classe", "category", "class", "segmento", "segment"],
+    "PrecoCompra": ["preco", "valorcompra", "precoaquisicao", "purchaseprice", "price", "cost"],
+    "AnoOffset": ["anohorizonte", "periodo", "yearoffset", "offset"],
+    "PrecoDiaria": ["diaria", "dailyrate", "tarifa", "adr"],
+    "TaxaOcupacao_%": ["ocupacao", "occupancy", "utilizacao", "utilization"],
+    "TaxaDepreciacao_%": ["depreciacao", "depreciation"],
+    "Juros_%_sobre_preco": ["juros", "interest"],
+    "Seguro_USD": ["seguro", "insurance"],
+    "Manutencao_USD": ["manutencao", "maintenance"],
+    "Sinistro_USD": ["sinistro", "sinistros", "claims", "damage"],
+    "Combustivel_USD": ["combustivel", "fuel"],
+    "Estacionamento_USD": ["estacionamento", "parking"],
+}
+
+
+@dataclass
+class ImportResult:
+    """Linhas válidas (tipos compactos), erros por linha e contagens da importação."""
+
+    data: pd.DataFrame
+    errors: pd.DataFrame
+    rows_read: int
+    error_count: int
+    mapping: Dict[str, str]
+    warning_count: int = 0
+
+    @property
+    def rows_imported(self) -> int:
+        return len(self.data)
+
+
+def _normalize_name(name) -> str:
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def detect_mapping(columns, table: str) -> Dict[str, str]:
+    """Mapa ``coluna do arquivo → coluna do esquema`` pelos nomes (ignora acentos, caixa e pontuação)."""
+    if table not in TABLES:
+        raise ValueError(f"tabela desconhecida {table!r}; use uma de {TABLES}")
+    lookup = {}
+    for target in RULES[table]:
+        for alias in [target] + ALIASES.get(target, []):
+            lookup.setdefault(_normalize_name(alias), target)
+    mapping = {}
+    for col in columns:
+        target = lookup.get(_normalize_name(col))
+        if target is not None and target not in mapping.values():
+            mapping[col] = target
+    return mapping
+
+
+def _source_format(source, fmt: Optional[str]) -> str:
+    if fmt is None:
+        name = source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "")
+        fmt = os.path.splitext(str(name))[1].lstrip(".").lower()
+        fmt = {"xls": "xlsx", "xlsm": "xlsx", "pq": "parquet", "txt": "csv"}.get(fmt, fmt)
+    if fmt not in FORMATS:
+        raise ValueError(f"formato não suportado {fmt!r}; use um de {FORMATS}")
+    return fmt
+
+
+def _xlsx_chunks(source, chunksize: int) -> Iterator[pd.DataFrame]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ImportError("importar XLSX requer o pacote openpyxl (pip install openpyxl)") from e
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(c) if c is not None else f"Coluna{i + 1}" for i, c in enumerate(next(rows, ()))]
+        block = []
+        for row in rows:
+            block.append(row)
+            if len(block) == chunksize:
+                yield pd.DataFrame(block, columns=header)
+                block = []
+        if block:
+            yield pd.DataFrame(block, columns=header)
+    finally:
+        wb.close()
+
+
+def iter_chunks(source, fmt: Optional[str] = None, chunksize: int = DEFAULT_CHUNKSIZE,
+                columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """Blocos de até ``chunksize`` linhas do arquivo (caminho ou objeto de arquivo, ex.: upload do Streamlit).
+
+    ``columns`` restringe a leitura a essas colunas quando o formato permite (CSV e Parquet).
+    """
+    fmt = _source_format(source, fmt)
+    if fmt == "csv":
+        # Tudo como texto: a conversão acontece na validação, que relata o valor original
+        yield from pd.read_csv(source, dtype=str, chunksize=chunksize, usecols=columns, skipinitialspace=True)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        for chunk in _xlsx_chunks(source, chunksize):
+            yield chunk if columns is None else chunk[columns]
+
+
+def read_columns(source, fmt: Optional[str] = None) -> List[str]:
+    """Nomes das colunas do arquivo (lê só o cabeçalho/esquema)."""
+    fmt = _source_format(source, fmt)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        names = pq.ParquetFile(source).schema_arrow.names
+    else:
+        names = list(next(iter_chunks(source, fmt, chunksize=1), pd.DataFrame()).columns)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return names
+
+
+def validate(df: pd.DataFrame, table: str, first_row: int = 1, seen: Optional[set] = None,
+             lenient: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Converte e valida as colunas do esquema; devolve ``(linhas válidas, erros e avisos)``.
+
+    ``first_row`` é o número (a partir de 1, sem o cabeçalho) da primeira linha de
+    ``df`` nos erros. ``seen`` acumula as chaves já importadas (CarID no cadastro,
+    CarID+AnoOffset nos anuais) para acusar duplicatas entre blocos. Com ``lenient``,
+    valores fora das faixas (e não inteiros, exceto nas chaves) são avisos e a linha fica.
+    """
+    rules = RULES[table]
+    n = len(df)
+    line = np.arange(first_row, first_row + n)
+    bad = np.zeros(n, dtype=bool)
+    errors = []
+    out = {}
+
+    def report(mask, col, raw, message, level="erro"):
+        idx = np.flatnonzero(mask)
+        if not len(idx):
+            return
+        if level == "erro":
+            bad[idx] = True
+        values = raw.iloc[idx] if raw is not None else [None] * len(idx)
+        errors.extend((int(line[i]), col, None if pd.isna(v) else str(v), message, level)
+                      for i, v in zip(idx, values))
+
+    for col, (kind, lo, hi, required) in rules.items():
+        if col not in df.columns:
+            if required:
+                report(np.ones(n, dtype=bool), col, None, "coluna obrigatória ausente")
+            continue
+        raw = df[col].reset_index(drop=True)
+        if pd.api.types.is_numeric_dtype(raw.dtype) and kind != "texto":
+            text = None
+            missing = raw.isna().to_numpy()
+        else:
+            text = (raw if isinstance(raw.dtype, pd.StringDtype) else raw.astype(str)).str.strip()
+            missing = (raw.isna() | (text == "")).to_numpy()
+        if required:
+            report(missing, col, raw, "valor obrigatório vazio")
+        if kind == "texto":
+            out[col] = text.where(~missing)
+            continue
+        numbers = raw if text is None else pd.to_numeric(text.where(~missing), errors="coerce")
+        values = numbers.to_numpy(dtype=float, na_value=np.nan)
+        report(~missing & np.isnan(values), col, raw, "não numérico")
+        ok = ~np.isnan(values)
+        level = "aviso" if lenient else "erro"
+        if kind == "inteiro":
+            report(ok & (values != np.round(values)), col, raw, "deve ser inteiro",
+                   "erro" if col in KEY_COLUMNS[table] else level)
+        if lo is not None:
+            report(ok & (values < lo), col, raw, f"menor que {lo:g}", level)
+        if hi is not None:
+            report(ok & (values > hi), col, raw, f"maior que {hi:g}", level)
+        if col in HORIZON_COLUMNS:
+            report(ok & (values > len(YEARS)), col, raw,
+                   f"depois do ano {len(YEARS)} do modelo (fora do horizonte)", "aviso")
+        out[col] = values
+
+    data = pd.DataFrame(out)
+    if seen is not None and not data.empty and "CarID" in data.columns:
+        keys = data["CarID"].astype(str)
+        if table == "yearly":
+            keys = keys + "|" + data["AnoOffset"].astype(str)
+        keys = keys.to_numpy(dtype=object)
+        dup = (pd.Series(keys).duplicated().to_numpy()
+               | np.fromiter((k in seen for k in keys), dtype=bool, count=len(keys))) & ~bad
+        what = "CarID" if table == "cars" else "CarID/AnoOffset"
+        report(dup, "CarID", data["CarID"], f"{what} duplicado")
+        seen.update(keys[~bad].tolist())
+    errors_df = pd.DataFrame(errors, columns=ERROR_COLUMNS).sort_values("Linha", kind="stable", ignore_index=True)
+    return data[~bad].reset_index(drop=True), errors_df
+
+
+def _downcast(values: pd.Series, dtype: str) -> pd.Series:
+    """``values`` em ``dtype`` se a ida e volta preserva todos os valores; senão, como está."""
+    if values.dtype == dtype:
+        return values
+    source = values.to_numpy(dtype=float, na_value=np.nan)
+    try:
+        with np.errstate(over="ignore", invalid="ignore"):
+            small = values.astype(dtype)
+    except (TypeError, ValueError, OverflowError):
+        return values
+    back = small.to_numpy(dtype=float, na_value=np.nan)
+    return small if np.array_equal(back, source, equal_nan=True) else values
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Texto de identificação em categóricos e inteiros/percentuais em tipos pequenos (se exatos)."""
+    out = {}
+    for col in df.columns:
+        if col in CATEGORICAL_COLUMNS:
+            out[col] = df[col].astype("category")
+        elif col in COMPACT_DTYPES:
+            out[col] = _downcast(df[col], COMPACT_DTYPES[col])
+        else:
+            out[col] = df[col]
+    return pd.DataFrame(out, index=df.index)
+
+
+def _concat(parts: Dict[str, List[pd.Series]], columns: List[str]) -> pd.DataFrame:
+    """Junta os blocos de cada coluna unindo as categorias (``pd.concat`` cairia para object).
+
+    ``parts`` é esvaziado coluna a coluna: os blocos de uma coluna são liberados assim
+    que ela é montada, e a memória de pico fica perto do tamanho do resultado (mais uma
+    coluna), não do dobro.
+    """
+    out = {}
+    for col in columns:
+        pieces = parts.pop(col, [])
+        if not pieces:
+            out[col] = pd.Series(dtype="category" if col in CATEGORICAL_COLUMNS else COMPACT_DTYPES.get(col, float))
+        elif col in CATEGORICAL_COLUMNS:
+            # Coluna ausente do arquivo chega como float vazio: categórico de texto vazio
+            pieces = [p if isinstance(p.dtype, pd.CategoricalDtype) else p.astype(object).astype("category")
+                      for p in pieces]
+            out[col] = pd.Series(union_categoricals([p.array for p in pieces]))
+        else:
+            # Blocos com tipos diferentes (float32 num, float64 noutro) voltam a float64 no concat
+            out[col] = pd.concat(pieces, ignore_index=True)
+            if col in COMPACT_DTYPES:
+                out[col] = _downcast(out[col], COMPACT_DTYPES[col])
+        del pieces
+    return pd.DataFrame(out, copy=False)
+
+
+def _fill_yearly_defaults(data: pd.DataFrame) -> pd.DataFrame:
+    """Colunas anuais ausentes no arquivo recebem os defaults do ano (como ``template_yearly_inputs``)."""
+    defaults = yearly_defaults(YEARS)
+    # Anos fora do modelo (aceitos com aviso) usam os defaults do ano mais próximo
+    pos = np.clip(data["AnoOffset"].to_numpy(dtype=int) - 1, 0, len(YEARS) - 1)
+    for col in YEARLY_INPUT_COLUMNS:
+        if col not in data.columns:
+            data[col] = defaults[col][pos]
+    return data[["CarID", "AnoOffset"] + YEARLY_INPUT_COLUMNS]
+
+
+def import_table(source, table: str, fmt: Optional[str] = None, mapping: Optional[Mapping[str, str]] = None,
+                 chunksize: int = DEFAULT_CHUNKSIZE, max_errors: int = DEFAULT_MAX_ERRORS) -> ImportResult:
+    """Importa cadastro (``table="cars"``) ou dados anuais (``"yearly"``) de um CSV/XLSX/Parquet.
+
+    ``mapping`` (coluna do arquivo → coluna do esquema) tem precedência sobre o mapeamento
+    detectado; colunas do arquivo fora do mapa são ignoradas. No cadastro, as colunas
+    básicas ausentes ficam vazias; nos anuais, recebem os defaults do ano.
+    """
+    if table not in TABLES:
+        raise ValueError(f"tabela desconhecida {table!r}; use uma de {TABLES}")
+    fmt = _source_format(source, fmt)
+    file_columns = read_columns(source, fmt)
+    if mapping is None:
+        mapping = detect_mapping(file_columns, table)
+    mapping = {src: dst for src, dst in mapping.items() if src in file_columns and dst in RULES[table]}
+    missing = [c for c, rule in RULES[table].items() if rule[3] and c not in mapping.values()]
+    if missing:
+        raise ValueError(f"colunas obrigatórias sem correspondência no arquivo: {missing} "
+                         f"(colunas do arquivo: {file_columns})")
+
+    present = set(mapping.values())
+    if table == "cars":
+        columns = BASE_CAR_COLUMNS + [c for c in OPTIONAL_IMPORT_CAR_COLUMNS if c in present]
+    else:
+        columns = ["CarID", "AnoOffset"] + YEARLY_INPUT_COLUMNS
+
+    parts: Dict[str, List[pd.Series]] = {col: [] for col in columns}
+    errors = []
+    seen: set = set()
+    rows_read = error_count = warning_count = kept_errors = 0
+    for chunk in iter_chunks(source, fmt, chunksize, columns=list(mapping)):
+        chunk = chunk.rename(columns=mapping)
+        valid, chunk_errors = validate(chunk, table, first_row=rows_read + 1, seen=seen)
+        rows_read += len(chunk)
+        del chunk
+        warnings = int((chunk_errors["Nivel"] == "aviso").sum())
+        error_count += len(chunk_errors) - warnings
+        warning_count += warnings
+        if kept_errors < max_errors:
+            errors.append(chunk_errors.head(max_errors - kept_errors))
+            kept_errors += len(errors[-1])
+        if table == "yearly":
+            valid = _fill_yearly_defaults(valid)
+        valid = compact_dtypes(valid.reindex(columns=columns))
+        # Cada coluna guardada com memória própria: o bloco inteiro é liberado aqui
+        for col in columns:
+            parts[col].append(valid[col].copy())
+        del valid
+
+    data = _concat(parts, columns)
+    errors_df = (pd.concat(errors, ignore_index=True) if errors
+                 else pd.DataFrame(columns=ERROR_COLUMNS))
+    return ImportResult(data=data, errors=errors_df, rows_read=rows_read, error_count=error_count,
+                        mapping=dict(mapping), warning_count=warning_count)
+
+
+def validate_project(cars: pd.DataFrame, yearly: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Valida cadastro e anuais já carregados (ex.: JSON de projeto); devolve ``(cars, yearly, erros)``.
+
+    Só linhas que o cálculo não consegue usar (chave vazia ou duplicada, valor não
+    numérico) são descartadas; valores fora das faixas ficam, relatados como avisos.
+    Os erros ganham a coluna ``Tabela``.
+    """
+    cars_ok, cars_errors = validate(cars, "cars", seen=set(), lenient=True)
+    yearly_ok, yearly_errors = validate(yearly, "yearly", seen=set(), lenient=True)
+    present = [c for c in OPTIONAL_IMPORT_CAR_COLUMNS if c in cars.columns]
+    cars_ok = compact_dtypes(cars_ok.reindex(columns=BASE_CAR_COLUMNS + present))
+    yearly_ok = compact_dtypes(_fill_yearly_defaults(yearly_ok)) if "AnoOffset" in yearly_ok.columns else yearly_ok
+    errors = pd.concat([cars_errors.assign(Tabela="cars"), yearly_errors.assign(Tabela="yearly")],
+                       ignore_index=True)[["Tabela"] + ERROR_COLUMNS]
+    return cars_ok, yearly_ok, errors
+
+
+def merge_import(cars: pd.DataFrame, yearly: pd.DataFrame, new_cars: pd.DataFrame,
+                 new_yearly: Optional[pd.DataFrame] = None, replace: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Junta a importação à frota atual.
+
+    Com ``replace`` a frota passa a ser só a importada. Senão, carros importados
+    substituem os de mesmo CarID e, se vierem dados anuais, eles substituem as linhas
+    anuais desses carros. Carros sem linhas anuais recebem os defaults no app.
+    """
+    if replace:
+        return new_cars, (new_yearly if new_yearly is not None else yearly.iloc[0:0])
+    ids = new_cars["CarID"].astype(str).tolist()
+    cars = pd.concat([cars[~cars["CarID"].astype(str).isin(ids)], new_cars], ignore_index=True)
+    if new_yearly is not None:
+        yearly_ids = new_yearly["CarID"].astype(str).unique().tolist()
+        yearly = pd.concat([yearly[~yearly["CarID"].astype(str).isin(yearly_ids)], new_yearly], ignore_index=True)
+    return cars, yearly
@@ -0,0 +1,252 @@
+"""Recalculo incremental: contribuições anuais por carro em cache.
+
+O estágio por carro (receita, custos, depreciação, juros, principal e venda) só
+depende das linhas do próprio carro e de ``horizon_years`` e do financiamento. O
+:class:`IncrementalEvaluator` guarda, por CarID, o vetor de contribuições anuais e a
+impressão digital do conteúdo que o gerou; numa nova avaliação só os carros cujo
+hash mudou são recalculados, e os totais anuais são atualizados subtraindo a
+contribuição antiga e somando a nova. O estágio global (upsell, deduções, opex,
+impostos) é barato e roda sempre sobre os totais.
+
+Para a detecção de mudanças também não custar O(frota) em hashes, o avaliador guarda
+as entradas da avaliação anterior (cópias rasas com copy-on-write, pandas 3 – não
+duplicam memória nem são afetadas por edições posteriores; cópias completas no pandas
+2, em que a edição in place passaria para a cópia rasa) e compara linha a linha, alinhando
+pelo índice (o ``data_editor`` preserva os rótulos): só os carros das linhas
+alteradas, incluídas ou removidas têm o hash recalculado. Se as linhas não podem ser
+alinhadas (índice repetido, colunas diferentes), todos os carros recebem hash, como
+na primeira avaliação.
+
+Em frotas pequenas o custo fixo do caminho incremental (comparação, recálculo de um
+bloco, tabelas) passa o do cálculo vetorizado completo; abaixo de
+:data:`MIN_INCREMENTAL_ROWS` linhas anuais o avaliador só chama
+``compute_per_year_tables``.
+"""
+
+import threading
+from typing import Dict, Optional, Sequence, Set
+
+import numpy as np
+import pandas as pd
+
+from .core import (
+    ROW_SUM_COLUMNS,
+    GlobalParams,
+    aggregate_tables,
+    car_blocks,
+    compute_per_year_tables,
+    compute_row_values,
+    prepare_rows,
+)
+from .fingerprint import CAR_CALC_COLUMNS, car_fingerprints
+from .profiling import stage
+from .project import _COPY_ON_WRITE
+from .worker import report_progress
+
+# Contribuições por carro: colunas somadas por ano + contagem de linhas (anos presentes)
+_KEYS = ROW_SUM_COLUMNS + ["_Linhas"]
+BLOCK_CARS = 20_000
+# Abaixo disto (linhas anuais, ~2 mil carros) o cálculo completo é tão rápido quanto o incremental
+MIN_INCREMENTAL_ROWS = 12_000
+
+
+def _same(x: pd.Series, y: pd.Series) -> np.ndarray:
+    """Igualdade posição a posição; vazios (NaN/None) são iguais entre si."""
+    if pd.api.types.is_numeric_dtype(x.dtype) and pd.api.types.is_numeric_dtype(y.dtype):
+        a, b = x.to_numpy(dtype=float, na_value=np.nan), y.to_numpy(dtype=float, na_value=np.nan)
+        return (a == b) | (np.isnan(a) & np.isnan(b))
+    equal = pd.array(x.array == y.array, dtype="boolean").to_numpy(dtype=bool, na_value=False)
+    return equal | (x.isna().to_numpy() & y.isna().to_numpy())
+
+
+def changed_car_ids(new: pd.DataFrame, old: Optional[pd.DataFrame],
+                    columns: Optional[Sequence[str]] = None) -> Optional[Set]:
+    """CarIDs (antigos e novos) das linhas de ``new`` alteradas, incluídas ou removidas em relação a ``old``.
+
+    As linhas são alinhadas pelo índice; só ``columns`` (padrão: todas) são comparadas.
+    Devolve ``None`` se o alinhamento não é possível: sem ``old``, índice repetido ou
+    colunas diferentes.
+    """
+    if old is None or not new.index.is_unique or not old.index.is_unique:
+        return None
+    if columns is None:
+        if list(new.columns) != list(old.columns):
+            return None
+        columns = list(new.columns)
+    elif [c for c in columns if c in new.columns] != [c for c in columns if c in old.columns]:
+        return None
+    columns = [c for c in columns if c in new.columns]
+    if "CarID" not in columns:
+        return None
+
+    if new.index.equals(old.index):
+        pos = np.arange(len(new))
+        new_part, old_part = new, old
+    else:
+        pos = old.index.get_indexer(new.index)
+        new_part, old_part = new[pos >= 0], old.take(pos[pos >= 0])
+    matched = np.flatnonzero(pos >= 0)
+    differs = np.zeros(len(matched), dtype=bool)
+    for col in columns:
+        differs |= ~_same(new_part[col], old_part[col])
+    removed = np.ones(len(old), dtype=bool)
+    removed[pos[matched]] = False
+
+    changed = np.concatenate([np.flatnonzero(pos < 0), matched[differs]])
+    ids = set(new["CarID"].iloc[changed].tolist())
+    ids.update(old["CarID"].iloc[pos[matched[differs]]].tolist())
+    ids.update(old["CarID"].iloc[np.flatnonzero(removed)].tolist())
+    return {c for c in ids if not pd.isna(c)}
+
+
+class IncrementalEvaluator:
+    """Avaliador com cache de contribuições por carro; equivalente a ``compute_per_year_tables``."""
+
+    def __init__(self, min_rows: int = MIN_INCREMENTAL_ROWS):
+        self._lock = threading.Lock()
+        self.min_rows = min_rows
+        self.reset()
+
+    def reset(self):
+        self._key = None
+        self._prev = None  # (cars, yearly) da última avaliação concluída, para a comparação por linha
+        self._slot: Dict[str, int] = {}
+        self._free = []
+        self._contrib = np.zeros((0, len(_KEYS), 0))
+        self._fp = np.zeros(0, dtype=np.uint64)
+        self._totals = None
+        self.last_dirty = 0
+
+    def _alloc(self, n_years: int, needed: int):
+        capacity = len(self._fp)
+        if len(self._slot) + needed <= capacity:
+            return
+        new_capacity = max(2 * capacity, len(self._slot) + needed, 64)
+        contrib = np.zeros((new_capacity, len(_KEYS), n_years))
+        contrib[:capacity] = self._contrib
+        fp = np.zeros(new_capacity, dtype=np.uint64)
+        fp[:capacity] = self._fp
+        self._free.extend(range(new_capacity - 1, capacity - 1, -1))
+        self._contrib, self._fp = contrib, fp
+
+    def _car_contributions(self, cars: pd.DataFrame, yearly: pd.DataFrame, ids: pd.Index,
+                           params: GlobalParams) -> np.ndarray:
+        """Contribuições ``(carros, chaves, anos)`` dos carros em ``ids`` (estágio por carro completo)."""
+        out = np.zeros((len(ids), len(_KEYS), params.horizon_years))
+        cars_sub = cars[ids.get_indexer(cars["CarID"].astype(str)) >= 0]
+        if cars_sub.empty or yearly.empty:
+            return out
+        # Em blocos de carros inteiros (car_blocks já descarta as linhas de carros fora de cars_sub):
+        # progresso e ponto de cancelamento entre blocos. Poucos carros: um bloco só, e o
+        # merge de prepare_rows descarta as linhas dos outros carros.
+        blocks = (car_blocks(cars_sub, yearly, params.horizon_years, BLOCK_CARS) if len(ids) > BLOCK_CARS
+                  else [(cars_sub, yearly)])
+        done = 0
+        for cars_block, yearly_block in blocks:
+            y = compute_row_values(prepare_rows(cars_block, yearly_block, params.horizon_years), params)
+            car = ids.get_indexer(y["CarID"].astype(str))
+            ano = y["AnoOffset"].to_numpy(dtype=int) - 1
+            values = np.nan_to_num(y[ROW_SUM_COLUMNS].to_numpy(dtype=float))
+            values = np.column_stack([values, np.ones(len(y))])
+            for k in range(len(_KEYS)):
+                np.add.at(out[:, k, :], (car, ano), values[:, k])
+            done += len(cars_block)
+            report_progress(done / len(ids), f"{done:,} de {len(ids):,} carros")
+        return out
+
+    def evaluate(self, cars: pd.DataFrame, yearly: pd.DataFrame, params: GlobalParams) -> Dict[str, pd.DataFrame]:
+        # Um job substituído ainda em andamento (worker) termina antes de o seguinte mexer no cache
+        with self._lock:
+            return self._evaluate(cars, yearly, params)
+
+    def _evaluate(self, cars: pd.DataFrame, yearly: pd.DataFrame, params: GlobalParams) -> Dict[str, pd.DataFrame]:
+        if cars.empty or yearly.empty or 'AnoOffset' not in yearly.columns or len(yearly) < self.min_rows:
+            self.reset()
+            return compute_per_year_tables(cars, yearly, params)
+
+        # Anos fora de 1..horizonte (ex.: AnoOffset 0 digitado à mão) não cabem nos vetores: cálculo completo
+        anos = yearly["AnoOffset"].to_numpy(dtype=float)
+        anos = anos[anos <= params.horizon_years]
+        if len(anos) and ((anos < 1).any() or (anos != np.floor(anos)).any()):
+            self.reset()
+            return compute_per_year_tables(cars, yearly, params)
+
+        key = (params.horizon_years, params.financing_term, params.loan_mode, params.loan_rate,
+               params.down_payment_rate, params.balloon_rate)
+        if key != self._key:
+            self.reset()
+            self._key = key
+            self._contrib = np.zeros((0, len(_KEYS), params.horizon_years))
+            self._totals = np.zeros((len(_KEYS), params.horizon_years))
+
+        # Com copy-on-write edições posteriores nos originais não alteram cópias rasas;
+        # sem ele (pandas 2) a comparação seguinte não veria a edição
+        snapshot = (cars.copy(deep=not _COPY_ON_WRITE), yearly.copy(deep=not _COPY_ON_WRITE))
+        with stage("incremental.diff", rows=len(yearly)):
+            changed = self._changed(cars, yearly)
+        if changed is None:
+            # Sem avaliação anterior comparável: hash de todos os carros
+            with stage("incremental.fingerprints", rows=len(yearly)):
+                fps = car_fingerprints(cars, yearly)
+            removed = [c for c in self._slot if c not in fps.index]
+        else:
+            # Só os carros das linhas alteradas são recalculados, sem hash: a comparação já
+            # os identificou. O hash deles fica 0 ("desconhecido"): se a próxima avaliação
+            # precisar dos hashes, eles são recalculados.
+            keys = changed | {str(c) for c in changed}
+            cars = cars[cars["CarID"].isin(keys)]
+            yearly = yearly[yearly["CarID"].isin(keys)]
+            current = pd.Index(cars["CarID"].dropna().astype(str).unique())
+            fps = pd.Series(np.zeros(len(current), dtype=np.uint64), index=current)
+            removed = [c for c in {str(c) for c in changed} if c in self._slot and c not in current]
+        ids = fps.index.tolist()
+
+        # Carros removidos: subtrai a contribuição e libera o slot
+        for car_id in removed:
+            slot = self._slot.pop(car_id)
+            self._totals -= self._contrib[slot]
+            self._contrib[slot] = 0.0
+            self._free.append(slot)
+
+        slots = np.array([self._slot.get(c, -1) for c in ids], dtype=int)
+        known = slots >= 0
+        dirty = ~known
+        dirty[known] = (self._fp[slots[known]] != fps.to_numpy()[known]) | (changed is not None)
+        self.last_dirty = int(dirty.sum())
+
+        if self.last_dirty:
+            dirty_ids = fps.index[dirty]
+            # Calculado antes de alterar o cache: um cancelamento no meio deixa o estado consistente
+            with stage("incremental.car_contributions", rows=self.last_dirty):
+                new = self._car_contributions(cars, yearly, dirty_ids, params)
+            self._alloc(params.horizon_years, int((~known).sum()))
+            for i in np.flatnonzero(~known):
+                slots[i] = self._free.pop()
+                self._slot[ids[i]] = slots[i]
+            dirty_slots = slots[dirty]
+            self._totals -= self._contrib[dirty_slots].sum(axis=0)
+            self._contrib[dirty_slots] = new
+            self._totals += new.sum(axis=0)
+            self._fp[dirty_slots] = fps.to_numpy()[dirty]
+        self._prev = snapshot
+
+        with stage("incremental.aggregate_tables"):
+            return self._tables(params)
+
+    def _changed(self, cars: pd.DataFrame, yearly: pd.DataFrame) -> Optional[Set]:
+        """CarIDs alterados desde a avaliação anterior, ou ``None`` se a comparação não é possível."""
+        prev_cars, prev_yearly = self._prev if self._prev is not None else (None, None)
+        changed_cars = changed_car_ids(cars, prev_cars, CAR_CALC_COLUMNS)
+        changed_yearly = changed_car_ids(yearly, prev_yearly) if changed_cars is not None else None
+        if changed_yearly is None:
+            return None
+        return changed_cars | changed_yearly
+
+    def _tables(self, params: GlobalParams) -> Dict[str, pd.DataFrame]:
+        linhas = self._totals[-1]
+        present = np.flatnonzero(np.round(linhas) > 0)
+        by_year = pd.DataFrame(
+            {col: self._totals[k, present] for k, col in enumerate(ROW_SUM_COLUMNS)},
+            index=pd.Index(present + 1, name="Ano"),
+        )
+        return aggregate_tables(by_year, params)
@@ -0,0 +1,245 @@
+"""Entradas anuais em camadas: defaults globais → defaults por Categoria → overrides carro/ano.
+
+A grade ``yearly`` densa repete, para cada carro × ano, os mesmos 11 valores de
+entrada; numa frota grande e pouco customizada quase tudo é default. A
+:class:`LayeredYearly` guarda só o que difere:
+
+* defaults globais: :func:`myluxcars.core.yearly_defaults` (podem variar por ano);
+* defaults por Categoria e ano: ``category_defaults`` (índice ``Categoria, AnoOffset``;
+  NaN herda o global) – depreciação, manutenção etc. mudam com o ano, e um default
+  único por Categoria faria quase toda célula virar override;
+* overrides por carro/ano em formato longo ``CarID, AnoOffset, Coluna, Valor``;
+* células ausentes ``CarID, AnoOffset``: carro/ano sem linha na grade original (o
+  cálculo ignora o carro nesses anos), que a grade densa também não deve ter.
+
+A grade densa só é montada (vetorizada) quando o cálculo precisa dela, via
+:meth:`LayeredYearly.to_dense`; ``compute_per_year_tables`` aceita a forma em camadas
+diretamente no lugar de ``yearly``.
+
+Limitação: o app (``main.py``) ainda guarda a grade densa em ``st.session_state.yearly``
+– o ``data_editor`` edita a grade densa. A forma em camadas vale para arquivos de
+projeto (``yearly_layers``), portfólio e linha de comando.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .core import YEARLY_INPUT_COLUMNS, YEARS, yearly_defaults
+
+OVERRIDE_COLUMNS = ["CarID", "AnoOffset", "Coluna", "Valor"]
+MISSING_COLUMNS = ["CarID", "AnoOffset"]
+CATEGORY_INDEX = ["Categoria", "AnoOffset"]
+
+
+def _same(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+class LayeredYearly:
+    """Representação esparsa das entradas anuais (ver docstring do módulo)."""
+
+    def __init__(self, category_defaults: Optional[pd.DataFrame] = None,
+                 overrides: Optional[pd.DataFrame] = None, missing: Optional[pd.DataFrame] = None):
+        if category_defaults is None:
+            category_defaults = _empty_category_defaults()
+        elif not isinstance(category_defaults.index, pd.MultiIndex):
+            # Índice só por Categoria: o mesmo default em todos os anos
+            category_defaults = pd.concat({y: category_defaults for y in YEARS}, names=["AnoOffset"])
+            category_defaults = category_defaults.reorder_levels(CATEGORY_INDEX).sort_index()
+        self.category_defaults = category_defaults
+        self.overrides = overrides if overrides is not None else pd.DataFrame(columns=OVERRIDE_COLUMNS)
+        self.missing = missing if missing is not None else pd.DataFrame(columns=MISSING_COLUMNS)
+
+    def __len__(self) -> int:
+        return len(self.overrides)
+
+    def __repr__(self) -> str:
+        n_cats = self.category_defaults.index.get_level_values("Categoria").nunique()
+        return (f"LayeredYearly({n_cats} categorias, "
+                f"{len(self.overrides)} overrides, {len(self.missing)} ausentes)")
+
+    # -------- densa a partir das camadas --------
+    def _grid_positions(self, frame: pd.DataFrame, ids: np.ndarray, years: np.ndarray):
+        """Posição (carro × ano) na grade densa de cada linha ``CarID, AnoOffset`` e se ela cai na grade."""
+        car_pos = pd.Index(ids).get_indexer(frame["CarID"].astype(str))
+        year_pos = frame["AnoOffset"].to_numpy(dtype=int) - int(years[0])
+        ok = (car_pos >= 0) & (year_pos >= 0) & (year_pos < len(years))
+        return car_pos * len(years) + year_pos, ok
+
+    def to_dense(self, cars: pd.DataFrame, horizon_years: Optional[int] = None) -> pd.DataFrame:
+        """Grade carro × ano no formato de ``template_yearly_inputs`` (anos até ``horizon_years``).
+
+        As células ausentes (:attr:`missing`) ficam de fora; carros que as camadas não
+        conhecem recebem todos os anos.
+        """
+        years = np.asarray([y for y in YEARS if horizon_years is None or y <= horizon_years])
+        cars_use = cars.dropna(subset=["CarID"]).drop_duplicates("CarID")
+        ids = cars_use["CarID"].astype(str).to_numpy(dtype=object)
+        n, n_years = len(ids), len(years)
+
+        data = {"CarID": np.repeat(ids, n_years), "AnoOffset": np.tile(years, n)}
+        base = yearly_defaults(years)
+        if "Categoria" in cars_use.columns and len(self.category_defaults):
+            # Linha de category_defaults de cada célula carro × ano (-1: sem default da Categoria)
+            cats = np.repeat(cars_use["Categoria"].astype(str).to_numpy(dtype=object), n_years)
+            cat_idx = self.category_defaults.index.get_indexer(
+                pd.MultiIndex.from_arrays([cats, data["AnoOffset"]], names=CATEGORY_INDEX))
+        else:
+            cat_idx = np.full(n * n_years, -1)
+        for col in YEARLY_INPUT_COLUMNS:
+            values = np.tile(base[col].astype(float), n)
+            if col in self.category_defaults.columns and (cat_idx >= 0).any():
+                per_cat = self.category_defaults[col].to_numpy(dtype=float)
+                per_cell = np.where(cat_idx >= 0, per_cat[np.maximum(cat_idx, 0)], np.nan)
+                values = np.where(np.isnan(per_cell), values, per_cell)
+            data[col] = values
+
+        if len(self.overrides) and n:
+            ov = self.overrides
+            flat, ok = self._grid_positions(ov, ids, years)
+            cols = ov["Coluna"].to_numpy()
+            vals = ov["Valor"].to_numpy(dtype=float)
+            for col in np.unique(cols[ok]):
+                sel = ok & (cols == col)
+                data[col][flat[sel]] = vals[sel]
+
+        if len(self.missing) and n:
+            flat, ok = self._grid_positions(self.missing, ids, years)
+            keep = np.ones(n * n_years, dtype=bool)
+            keep[flat[ok]] = False
+            data = {col: values[keep] for col, values in data.items()}
+
+        dense = pd.DataFrame(data)
+        if not dense["AnoCompra"].isna().any():
+            dense["AnoCompra"] = dense["AnoCompra"].astype(int)
+        return dense
+
+    # -------- camadas a partir da densa --------
+    @classmethod
+    def from_dense(cls, yearly: pd.DataFrame, cars: pd.DataFrame,
+                   infer_category_defaults: bool = True) -> "LayeredYearly":
+        """Comprime uma grade densa guardando só os valores que diferem das camadas de default.
+
+        Com ``infer_category_defaults``, o valor mais frequente de cada coluna numa
+        Categoria e ano vira default da Categoria nesse ano quando cobre mais linhas que
+        o default global. Linhas de carros fora de ``cars`` são descartadas (não entram no
+        cálculo) e, em linhas carro/ano duplicadas, a última prevalece. Carro/ano de
+        ``cars`` sem linha em ``yearly`` vira célula ausente (:attr:`missing`).
+        """
+        layers = cls()
+        if cars.empty:
+            return layers
+        cars_use = cars.dropna(subset=["CarID"]).drop_duplicates("CarID")
+        ids = pd.Index(cars_use["CarID"].astype(str))
+        n_years = len(YEARS)
+        if yearly.empty or "AnoOffset" not in yearly.columns:
+            layers.missing = pd.DataFrame({"CarID": np.repeat(ids.to_numpy(), n_years),
+                                           "AnoOffset": np.tile(YEARS, len(ids))})
+            return layers
+
+        # Posição de cada linha na grade densa (carro × ano), por códigos inteiros
+        car_pos = ids.get_indexer(yearly["CarID"].astype(str))
+        year_pos = yearly["AnoOffset"].to_numpy(dtype=float) - YEARS[0]
+        ok = (car_pos >= 0) & np.isin(year_pos, np.arange(n_years))
+        flat = car_pos * n_years + np.where(ok, year_pos, 0).astype(int)
+        rows = np.flatnonzero(ok)
+        # linhas carro/ano duplicadas: a última prevalece
+        _, last = np.unique(flat[rows][::-1], return_index=True)
+        rows = rows[::-1][last]
+        flat = flat[rows]
+
+        if infer_category_defaults and "Categoria" in cars_use.columns:
+            cat_names, cat_codes = np.unique(cars_use["Categoria"].astype(str).to_numpy(dtype=object),
+                                             return_inverse=True)
+            layers.category_defaults = _infer_category_defaults(
+                yearly.iloc[rows], cat_codes[flat // n_years], flat % n_years, cat_names)
+
+        dense = layers.to_dense(cars_use)
+        parts = []
+        for col in YEARLY_INPUT_COLUMNS:
+            actual = (yearly[col].to_numpy(dtype=float)[rows] if col in yearly.columns
+                      else np.full(len(rows), np.nan))
+            differs = ~_same(actual, dense[col].to_numpy(dtype=float)[flat])
+            if differs.any():
+                parts.append(pd.DataFrame({
+                    "CarID": ids.to_numpy()[flat[differs] // n_years],
+                    "AnoOffset": np.asarray(YEARS)[flat[differs] % n_years],
+                    "Coluna": col,
+                    "Valor": actual[differs],
+                }))
+        if parts:
+            layers.overrides = pd.concat(parts, ignore_index=True)
+
+        # Células da grade sem linha no original (só depois da comparação acima, feita na grade cheia)
+        present = np.zeros(len(ids) * n_years, dtype=bool)
+        present[flat] = True
+        absent = np.flatnonzero(~present)
+        if len(absent):
+            layers.missing = pd.DataFrame({"CarID": ids.to_numpy()[absent // n_years],
+                                           "AnoOffset": np.asarray(YEARS)[absent % n_years]})
+        return layers
+
+    # -------- serialização (bloco "yearly_layers" do JSON de projeto) --------
+    def to_dict(self) -> dict:
+        cats = self.category_defaults.dropna(how="all").reset_index()
+        cats["AnoOffset"] = cats["AnoOffset"].astype(int)
+        return {
+            "category_defaults": [{k: v for k, v in r.items() if not (isinstance(v, float) and np.isnan(v))}
+                                  for r in cats.to_dict('records')],
+            "overrides": self.overrides.to_dict('records'),
+            "missing": self.missing.to_dict('records'),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LayeredYearly":
+        cats = pd.DataFrame(data.get("category_defaults", []))
+        if cats.empty:
+            cats = None
+        else:
+            if "AnoOffset" not in cats.columns:
+                # Formato anterior: um default por Categoria, o mesmo em todos os anos
+                cats = cats.merge(pd.DataFrame({"AnoOffset": YEARS}), how="cross")
+            cats = cats.set_index(CATEGORY_INDEX).reindex(columns=YEARLY_INPUT_COLUMNS).astype(float)
+        overrides = pd.DataFrame(data.get("overrides", []), columns=OVERRIDE_COLUMNS)
+        missing = pd.DataFrame(data.get("missing", []), columns=MISSING_COLUMNS)
+        return cls(cats, overrides, missing)
+
+
+def _empty_category_defaults() -> pd.DataFrame:
+    index = pd.MultiIndex.from_arrays([[], []], names=CATEGORY_INDEX)
+    return pd.DataFrame(index=index, columns=YEARLY_INPUT_COLUMNS, dtype=float)
+
+
+def _infer_category_defaults(y: pd.DataFrame, cat_codes: np.ndarray, year_pos: np.ndarray,
+                             cat_names: np.ndarray) -> pd.DataFrame:
+    """Por Categoria, ano e coluna, o valor mais frequente vira default se cobre mais linhas que o global."""
+    base = yearly_defaults(YEARS)
+    n_years = len(YEARS)
+    # Grupos Categoria × ano
+    group = cat_codes * n_years + year_pos
+    n_groups = len(cat_names) * n_years
+    out = {}
+    for col in YEARLY_INPUT_COLUMNS:
+        if col not in y.columns:
+            continue
+        values = y[col].to_numpy(dtype=float)
+        global_hits = np.bincount(group, weights=_same(values, base[col].astype(float)[year_pos]),
+                                  minlength=n_groups)
+        valid = ~np.isnan(values)
+        val_codes, val_uniques = pd.factorize(values[valid])
+        if not len(val_uniques):
+            continue
+        counts = np.zeros((n_groups, len(val_uniques)))
+        np.add.at(counts, (group[valid], val_codes), 1)
+        best = counts.argmax(axis=1)
+        best_count = counts[np.arange(n_groups), best]
+        chosen = np.flatnonzero(best_count > global_hits)
+        if len(chosen):
+            index = pd.MultiIndex.from_arrays([cat_names[chosen // n_years], np.asarray(YEARS)[chosen % n_years]],
+                                              names=CATEGORY_INDEX)
+            out[col] = pd.Series(np.asarray(val_uniques)[best[chosen]], index=index)
+    if not out:
+        return _empty_category_defaults()
+    return pd.DataFrame(out, columns=YEARLY_INPUT_COLUMNS, dtype=float).sort_index()
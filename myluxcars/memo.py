@@ -0,0 +1,126 @@
+"""Memoização de resultados compartilhada entre reruns e sessões (LRU limitado).
+
+O Streamlit reexecuta o script inteiro a cada interação – abrir um expander, trocar
+o filtro de CarID ou clicar num download. Com :func:`memoize`, resultados derivados
+das entradas (tabelas, dados de gráficos, bytes de exportação) ficam num
+:class:`MemoCache` do processo, indexado por impressões digitais de conteúdo
+(:func:`myluxcars.fingerprint.inputs_fingerprint`); interações só de interface
+encontram tudo pronto.
+
+Os valores guardados são compartilhados entre sessões e não devem ser alterados no
+lugar – nem guardar objetos com estado de renderização, como ``Styler`` (monte um por
+rerun a partir da tabela memoizada). O cálculo acontece fora do lock: duas sessões pedindo a mesma chave ao mesmo
+tempo podem calcular em paralelo, e a última gravação vale (o resultado é o mesmo).
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .profiling import stage
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 512 * 2**20
+
+
+def estimate_size(value: Any) -> int:
+    """Tamanho aproximado em bytes (DataFrames, arrays, bytes/str e contêineres destes)."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True, index=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values()) + sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value) + sys.getsizeof(value)
+    return sys.getsizeof(value)
+
+
+class MemoCache:
+    """Cache LRU seguro entre threads, limitado por número de entradas e bytes estimados."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: Optional[int] = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+
+    def put(self, key: Hashable, value: Any):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._data:
+                self.bytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self.bytes += size
+            # Remove as menos usadas; a entrada recém-gravada fica mesmo se sozinha passar do limite
+            while len(self._data) > 1 and (
+                    len(self._data) > self.max_entries
+                    or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.bytes -= evicted
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key][0]
+            self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entradas": len(self._data), "bytes": self.bytes, "acertos": self.hits, "faltas": self.misses}
+
+
+_shared = MemoCache()
+
+
+def shared_cache() -> MemoCache:
+    """Cache do processo (compartilhado por todas as sessões do app)."""
+    return _shared
+
+
+def memoize(namespace: str, key: Hashable, compute: Callable[[], Any],
+            cache: Optional[MemoCache] = None) -> Any:
+    """``compute()`` memoizado sob ``(namespace, key)``; a etapa ``memo.<namespace>`` é perfilada nas faltas."""
+    cache = _shared if cache is None else cache
+
+    def timed():
+        with stage(f"memo.{namespace}"):
+            return compute()
+
+    return cache.get_or_compute((namespace, key), timed)
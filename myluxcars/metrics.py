@@ -0,0 +1,97 @@
+"""Métricas por carro: VPL, TIR e ano de payback a partir do fluxo de caixa de cada carro.
+
+Fluxo do carro no ano *t* (fim de ano): receita líquida (receita bruta + upsell −
+deduções) − custos operacionais − parcela (juros + principal) + valor de venda. É
+um fluxo antes de impostos e dos custos fixos da empresa, que não são atribuíveis a
+um carro. A TIR de todos os carros é resolvida de uma vez por Newton com
+salvaguarda de bisseção, vetorizado sobre a frota.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .core import GlobalParams, year_rates
+from .fleet import FleetMatrix, car_stage
+
+IRR_LOWER, IRR_UPPER = -0.99, 10.0
+IRR_TOL = 1e-10
+IRR_MAX_ITER = 100
+
+METRICS_COLUMNS = ["CarID", "Categoria", "PrecoCompra", "FluxoTotal", "VPL", "TIR", "PaybackAno"]
+
+
+def car_cash_flows(fm: FleetMatrix, params: GlobalParams,
+                   stage: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+    """Fluxo de caixa ``(..., carros, anos)`` de cada carro (antes de impostos e custos fixos)."""
+    stage = car_stage(fm, params) if stage is None else stage
+    rates = year_rates(params, fm.years)
+    receita_liquida = stage["ReceitaBruta"] * (1.0 + params.upsell_rate) * (1.0 - rates["deductions_rate"])
+    return (receita_liquida - stage["CustosOperacionais"] - stage["JurosPL"] - stage["Principal"]
+            + stage["VendaValorContabil"] - stage["Entrada"])
+
+
+def npv(flows: np.ndarray, years: np.ndarray, rate) -> np.ndarray:
+    """VPL na data 0 de fluxos de fim de ano ``(..., anos)``; ``rate`` faz broadcast em ``(...)``."""
+    rate = np.asarray(rate, dtype=float)[..., None]
+    return (flows / (1.0 + rate) ** years).sum(axis=-1)
+
+
+def irr(flows: np.ndarray, years: np.ndarray) -> np.ndarray:
+    """TIR de cada linha de ``flows`` ``(..., anos)``; NaN quando não há troca de sinal no intervalo.
+
+    Newton vetorizado com salvaguarda: cada linha mantém um intervalo ``[lo, hi]`` com
+    troca de sinal do VPL, e passos de Newton que saem do intervalo viram bisseção.
+    """
+    flows = np.asarray(flows, dtype=float)
+    t = np.asarray(years, dtype=float)
+    lo = np.full(flows.shape[:-1], IRR_LOWER)
+    hi = np.full(flows.shape[:-1], IRR_UPPER)
+    f_lo, f_hi = npv(flows, t, lo), npv(flows, t, hi)
+    valid = np.sign(f_lo) * np.sign(f_hi) < 0
+    x = np.where(valid, 0.1, np.nan)
+    x = np.where(valid & ((x <= lo) | (x >= hi)), (lo + hi) / 2, x)
+
+    for _ in range(IRR_MAX_ITER):
+        disc = (1.0 + x[..., None]) ** -t
+        f = (flows * disc).sum(axis=-1)
+        df = (-t * flows * disc / (1.0 + x[..., None])).sum(axis=-1)
+        # mantém o intervalo com troca de sinal
+        same_as_lo = np.sign(f) == np.sign(f_lo)
+        lo = np.where(valid & same_as_lo, x, lo)
+        f_lo = np.where(valid & same_as_lo, f, f_lo)
+        hi = np.where(valid & ~same_as_lo, x, hi)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = x - f / df
+        bad = ~np.isfinite(step) | (step <= lo) | (step >= hi)
+        new_x = np.where(bad, (lo + hi) / 2, step)
+        done = ~valid | (np.abs(new_x - x) < IRR_TOL) | (f == 0)
+        x = np.where(valid, new_x, np.nan)
+        if done.all():
+            break
+    return x
+
+
+def payback_year(flows: np.ndarray, years: np.ndarray, active: np.ndarray) -> np.ndarray:
+    """Primeiro ano, a partir do início da operação, em que o fluxo acumulado fica ≥ 0 (NaN se nunca)."""
+    started = np.cumsum(active, axis=-1) > 0
+    hit = started & (np.cumsum(flows, axis=-1) >= 0)
+    first = hit.argmax(axis=-1)
+    return np.where(hit.any(axis=-1), np.asarray(years)[first], np.nan)
+
+
+def car_metrics(fm: FleetMatrix, params: GlobalParams, discount_rate: float) -> pd.DataFrame:
+    """Tabela por carro com fluxo total, VPL à ``discount_rate``, TIR e ano de payback."""
+    stage = car_stage(fm, params)
+    flows = car_cash_flows(fm, params, stage)
+    active, _ = fm.activity()
+    return pd.DataFrame({
+        "CarID": fm.car_ids,
+        "Categoria": fm.categoria,
+        "PrecoCompra": fm.preco[:, 0],
+        "FluxoTotal": flows.sum(axis=-1),
+        "VPL": npv(flows, fm.years, discount_rate),
+        "TIR": irr(flows, fm.years),
+        "PaybackAno": payback_year(flows, fm.years, active),
+    }, columns=METRICS_COLUMNS)
@@ -0,0 +1,111 @@
+"""Modo estocástico: cenários Monte Carlo sobre ocupação, diária e depreciação.
+
+Cada cenário multiplica as colunas ``TaxaOcupacao_%``, ``PrecoDiaria`` e
+``TaxaDepreciacao_%`` da frota por fatores sorteados por Categoria (um fator por
+cenário × categoria, mantido em todos os anos). Todos os cenários de um lote são
+avaliados juntos em arrays ``(cenários, carros, anos)``; lotes grandes podem ser
+distribuídos num pool de processos.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .core import GlobalParams
+from .fleet import FleetMatrix, evaluate
+from .worker import progress_map
+
+# Distribuição default: fator multiplicativo normal (média, desvio relativo)
+DEFAULT_DISTRIBUTIONS = {
+    "*": {
+        "TaxaOcupacao_%": (1.0, 0.15),
+        "PrecoDiaria": (1.0, 0.10),
+        "TaxaDepreciacao_%": (1.0, 0.20),
+    }
+}
+DEFAULT_PERCENTILES = (5, 50, 95)
+OUTPUT_KEYS = ("LucroLiquido", "CaixaFinal")
+# Elementos por array (cenários × carros × anos) em cada lote – limita a memória por lote
+MAX_BATCH_ELEMENTS = 4_000_000
+# Acima deste volume de trabalho o pool de processos compensa o custo de inicialização
+PARALLEL_THRESHOLD = 20_000_000
+
+_FIELDS = {"TaxaOcupacao_%": "ocupacao", "PrecoDiaria": "diaria", "TaxaDepreciacao_%": "depreciacao"}
+
+
+def _category_params(fm: FleetMatrix, distributions: Mapping) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Índice de categoria por carro e arrays (média, desvio) por categoria para cada coluna."""
+    categorias, cat_idx = np.unique(fm.categoria.astype(str), return_inverse=True)
+    default = {**DEFAULT_DISTRIBUTIONS["*"], **distributions.get("*", {})}
+    params = {}
+    for col in _FIELDS:
+        spec = [distributions.get(cat, {}).get(col, default[col]) for cat in categorias]
+        params[col] = np.asarray(spec, dtype=float).reshape(len(categorias), 2)
+    return cat_idx, params
+
+
+def _simulate_batch(fm: FleetMatrix, params: GlobalParams, distributions: Mapping,
+                    n_scenarios: int, seed) -> Dict[str, np.ndarray]:
+    """Sorteia e avalia ``n_scenarios`` cenários; devolve arrays ``(cenários, anos)``."""
+    rng = np.random.default_rng(seed)
+    cat_idx, dist = _category_params(fm, distributions)
+    inputs = {}
+    for col, attr in _FIELDS.items():
+        media, desvio = dist[col][:, 0], dist[col][:, 1]
+        fatores = np.maximum(rng.normal(media, desvio, size=(n_scenarios, len(media))), 0.0)
+        # fator por cenário × carro, em broadcast sobre os anos
+        inputs[attr] = getattr(fm, attr) * fatores[:, cat_idx, None]
+    inputs["ocupacao"] = np.minimum(inputs["ocupacao"], 100.0)
+    result = evaluate(fm, params, **inputs)
+    return {k: result[k] for k in OUTPUT_KEYS}
+
+
+def simulate(fm: FleetMatrix, params: GlobalParams, n_scenarios: int,
+             distributions: Optional[Mapping] = None, seed: int = 0,
+             processes: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Simula ``n_scenarios`` cenários e devolve LucroLiquido/CaixaFinal ``(cenários, anos)``.
+
+    Os cenários são divididos em lotes com sementes derivadas de ``seed``, então o
+    resultado não depende do número de processos. ``processes=None`` usa o pool só
+    quando o volume justifica; ``processes=1`` força execução no processo atual.
+    """
+    distributions = distributions or DEFAULT_DISTRIBUTIONS
+    cells = max(fm.n_cars * len(fm.years), 1)
+    batch = max(1, MAX_BATCH_ELEMENTS // cells)
+    sizes = [min(batch, n_scenarios - start) for start in range(0, n_scenarios, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if processes is None:
+        processes = os.cpu_count() if n_scenarios * cells >= PARALLEL_THRESHOLD else 1
+    if processes > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(processes, len(sizes))) as pool:
+            parts = progress_map(_simulate_batch, [fm] * len(sizes), [params] * len(sizes),
+                                 [distributions] * len(sizes), sizes, seeds, executor=pool,
+                                 message="Simulando cenários")
+    else:
+        parts = progress_map(_simulate_batch, [fm] * len(sizes), [params] * len(sizes),
+                             [distributions] * len(sizes), sizes, seeds, message="Simulando cenários")
+    return {k: np.concatenate([p[k] for p in parts]) for k in OUTPUT_KEYS}
+
+
+def percentile_bands(samples: Dict[str, np.ndarray], years: Sequence[int],
+                     percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, pd.DataFrame]:
+    """Bandas de percentis por ano (colunas ``P5``, ``P50``, ``P95``) para cada saída."""
+    bands = {}
+    for key, values in samples.items():
+        q = np.percentile(values, percentiles, axis=0)
+        bands[key] = pd.DataFrame({f"P{p:g}": q[i] for i, p in enumerate(percentiles)},
+                                  index=pd.Index(years, name="Ano"))
+    return bands
+
+
+def run_monte_carlo(fm: FleetMatrix, params: GlobalParams, n_scenarios: int = 10_000,
+                    distributions: Optional[Mapping] = None, seed: int = 0,
+                    processes: Optional[int] = None,
+                    percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, pd.DataFrame]:
+    """Simula e resume em bandas de percentis de LucroLiquido e CaixaFinal por ano."""
+    samples = simulate(fm, params, n_scenarios, distributions, seed, processes)
+    return percentile_bands(samples, fm.years, percentiles)
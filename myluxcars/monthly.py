@@ -0,0 +1,173 @@
+"""Modelo mensal da frota: 12 períodos por ano, sazonalidade e compra/venda no meio do ano.
+
+Cada linha carro/ano vira 12 meses em arrays ``(linhas, 12)``:
+
+* receita = diária × ocupação × dias do mês, multiplicadas pelas curvas mensais da
+  categoria (fatores; média 1 preserva o nível anual);
+* custos operacionais, depreciação e juros P&L = valor anual / 12 por mês ativo;
+* parcela mensal = % anual do prazo / 12 sobre o preço; principal = parcela − juros
+  (no modo de amortização, tabela mensal de cada carro, com entrada e quitação na venda);
+* o carro opera de ``MesCompra`` do AnoCompra até o mês anterior a ``MesVenda`` do
+  AnoVenda, quando é vendido pelo valor contábil.
+
+``MesCompra``/``MesVenda`` são colunas opcionais do cadastro (padrão 1 = janeiro);
+com os padrões e curvas planas o resultado anual é igual ao de
+:func:`myluxcars.core.compute_per_year_tables`. As somas mensais são agregadas por
+ano e passam pelo mesmo estágio global (:func:`myluxcars.core.aggregate_tables`).
+O cálculo é vetorizado e feito em blocos de carros para limitar a memória.
+"""
+
+from typing import Dict, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .amortization import loan_flows, loan_terms
+from .core import (COST_COLUMNS, FINANCING_TERM_TO_ANNUAL_INSTALLMENT, ROW_SUM_COLUMNS, GlobalParams,
+                   aggregate_tables, grouped_cumsum, prepare_rows, zero_tables)
+from .profiling import stage
+from .worker import report_progress
+
+MONTHS = np.arange(1, 13)
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=float)
+CURVE_COLUMNS = ["TaxaOcupacao_%", "PrecoDiaria"]
+# Curvas por categoria ("*" vale para as demais): fatores mensais sobre ocupação e diária
+DEFAULT_SEASONALITY = {"*": {col: [1.0] * 12 for col in CURVE_COLUMNS}}
+MONTHLY_COLUMNS = ["ReceitaBruta", "CustosOperacionais", "Depreciacao", "JurosPL", "Principal",
+                   "VendaValorContabil", "Entrada", "CarrosAtivos"]
+# Linhas carro/ano por bloco (cada coluna mensal ocupa linhas × 12 floats)
+MAX_BLOCK_ROWS = 100_000
+
+
+def _curve(values: Sequence[float], name: str) -> np.ndarray:
+    curve = np.asarray(values, dtype=float)
+    if curve.shape != (12,):
+        raise ValueError(f"curva mensal {name!r} deve ter 12 valores, recebeu {curve.shape}")
+    return curve
+
+
+def _curves(categorias: np.ndarray, seasonality: Mapping[str, Mapping[str, Sequence[float]]]):
+    """Curvas ``(linhas, 12)`` de ocupação e diária para cada linha, pela categoria do carro."""
+    fallback = seasonality.get("*", {})
+    codes, uniques = pd.factorize(pd.Series(categorias, dtype=object).fillna(""), sort=False)
+    out = []
+    for col in CURVE_COLUMNS:
+        table = np.ones((len(uniques) + 1, 12))  # última linha: categoria ausente
+        for i, cat in enumerate(uniques):
+            spec = seasonality.get(cat, {}).get(col, fallback.get(col))
+            if spec is not None:
+                table[i] = _curve(spec, f"{cat}/{col}")
+        if fallback.get(col) is not None:
+            table[-1] = _curve(fallback[col], f"*/{col}")
+        out.append(table[codes])
+    return out
+
+
+def _month_values(y: pd.DataFrame, params: GlobalParams, occ_curve: np.ndarray,
+                  rate_curve: np.ndarray, mes_compra: np.ndarray, mes_venda: np.ndarray) -> Dict[str, np.ndarray]:
+    """Valores ``(linhas, 12)`` das linhas carro/ano de um bloco de carros."""
+    ano = y["AnoOffset"].to_numpy(dtype=float)[:, None]
+    ano_compra = (y["AnoCompra"].to_numpy(dtype=float) if "AnoCompra" in y.columns
+                  else np.ones(len(y)))[:, None]
+    ano_venda = (y["AnoVenda"].to_numpy(dtype=float) if "AnoVenda" in y.columns
+                 else np.full(len(y), np.nan))[:, None]
+    # Índice global do mês (0 = janeiro do ano 1)
+    t = (ano - 1) * 12 + (MONTHS - 1)
+    t_compra = (ano_compra - 1) * 12 + (mes_compra[:, None] - 1)
+    t_venda = (ano_venda - 1) * 12 + (mes_venda[:, None] - 1)
+    sem_venda = np.isnan(t_venda)
+    active = (t >= t_compra) & (sem_venda | (t < t_venda))
+    sale = ~sem_venda & (t == t_venda)
+
+    preco = y["PrecoCompra"].to_numpy(dtype=float)[:, None]
+
+    def col(name):
+        return y[name].to_numpy(dtype=float)[:, None]
+
+    out = {}
+    out["ReceitaBruta"] = np.where(
+        active, col("PrecoDiaria") * rate_curve * (col("TaxaOcupacao_%") / 100.0) * occ_curve * DAYS_IN_MONTH, 0.0)
+    for c in COST_COLUMNS:
+        out[c.replace("_USD", "")] = np.where(active, np.nan_to_num(col(c)) / 12.0, 0.0)
+    out["Depreciacao"] = np.where(active, (col("TaxaDepreciacao_%") / 100.0) * preco / 12.0, 0.0)
+    if params.amortizing:
+        terms = {k: v[:, None] for k, v in loan_terms(y, params).items()}
+        out.update(loan_flows(t - t_compra, active, sale, preco, terms, periods_per_year=12))
+    else:
+        out["JurosPL"] = np.where(active, (col("Juros_%_sobre_preco") / 100.0) * preco / 12.0, 0.0)
+        parcela = np.where(active, FINANCING_TERM_TO_ANNUAL_INSTALLMENT[params.financing_term] / 12.0 * preco, 0.0)
+        out["Principal"] = np.maximum(parcela - out["JurosPL"], 0.0)
+        out["Entrada"] = np.zeros_like(parcela)
+
+    # Valor contábil no mês da venda: depreciação acumulada por carro, em ordem de mês
+    car_idx = np.repeat(y["_CarIdx"].to_numpy(), 12)
+    deprec_acc = grouped_cumsum(out["Depreciacao"].ravel(), car_idx, t.ravel()).reshape(t.shape)
+    out["VendaValorContabil"] = np.where(sale, np.maximum(preco - deprec_acc, 0.0), 0.0)
+    out["CarrosAtivos"] = active.astype(float)
+    return out
+
+
+def monthly_sums(cars: pd.DataFrame, yearly: pd.DataFrame, params: GlobalParams,
+                 seasonality: Optional[Mapping[str, Mapping[str, Sequence[float]]]] = None) -> pd.DataFrame:
+    """Somas da frota por mês, índice ``(Ano, Mes)`` com ``horizon_years × 12`` períodos.
+
+    Colunas: :data:`ROW_SUM_COLUMNS` mais ``CustosOperacionais`` e ``CarrosAtivos``.
+    """
+    seasonality = DEFAULT_SEASONALITY if seasonality is None else seasonality
+    years = np.asarray(params.years)
+    columns = ROW_SUM_COLUMNS + ["CarrosAtivos"]
+    totals = {c: np.zeros(len(years) * 12) for c in columns}
+    index = pd.MultiIndex.from_product([years, MONTHS], names=["Ano", "Mes"])
+
+    if not (cars.empty or yearly.empty or "AnoOffset" not in yearly.columns):
+        y = prepare_rows(cars, yearly, params.horizon_years)
+        ano = y["AnoOffset"].to_numpy(dtype=float)
+        y = y[(ano >= 1) & (ano == np.floor(ano))]
+        cars_use = cars.dropna(subset=["CarID"])
+
+        def per_car(name):
+            values = (cars_use[name].to_numpy(dtype=float) if name in cars_use.columns
+                      else np.ones(len(cars_use)))
+            return np.clip(np.nan_to_num(values, nan=1.0), 1, 12).round()
+
+        categorias = (cars_use["Categoria"].astype(object).to_numpy() if "Categoria" in cars_use.columns
+                      else np.full(len(cars_use), "", dtype=object))
+        mes_compra, mes_venda = per_car("MesCompra"), per_car("MesVenda")
+
+        # Blocos de carros inteiros (a depreciação acumulada é por carro)
+        y = y.sort_values(["_CarIdx", "AnoOffset"], kind="stable")
+        car_idx = y["_CarIdx"].to_numpy()
+        cuts = np.searchsorted(car_idx, np.unique(car_idx[::MAX_BLOCK_ROWS]))
+        for start, stop in zip(cuts, np.r_[cuts[1:], len(y)]):
+            block = y.iloc[start:stop]
+            idx = block["_CarIdx"].to_numpy()
+            occ_curve, rate_curve = _curves(categorias[idx], seasonality)
+            with stage("monthly.block", rows=len(block)):
+                values = _month_values(block, params, occ_curve, rate_curve, mes_compra[idx], mes_venda[idx])
+            period = ((block["AnoOffset"].to_numpy(dtype=int) - 1)[:, None] * 12 + (MONTHS - 1)).ravel()
+            for c in columns:
+                totals[c] += np.bincount(period, weights=values[c].ravel(), minlength=len(years) * 12)
+            report_progress(stop / len(y), "Modelo mensal")
+
+    out = pd.DataFrame(totals, index=index)
+    out["CustosOperacionais"] = out[[c.replace("_USD", "") for c in COST_COLUMNS]].sum(axis=1)
+    return out
+
+
+def compute_monthly_tables(cars: pd.DataFrame, yearly, params: GlobalParams,
+                           seasonality: Optional[Mapping[str, Mapping[str, Sequence[float]]]] = None
+                           ) -> Dict[str, pd.DataFrame]:
+    """P&L e Caixa anuais a partir do modelo mensal, mais a tabela ``Mensal`` (72 períodos).
+
+    ``yearly`` é a grade densa carro/ano ou uma :class:`myluxcars.layered.LayeredYearly`.
+    """
+    if hasattr(yearly, "to_dense"):
+        yearly = yearly.to_dense(cars, params.horizon_years)
+    months = monthly_sums(cars, yearly, params, seasonality)
+    if cars.empty or yearly.empty or "AnoOffset" not in yearly.columns:
+        tables = zero_tables(params)
+    else:
+        by_year = months[ROW_SUM_COLUMNS].groupby(level="Ano").sum()
+        tables = aggregate_tables(by_year, params)
+    tables["Mensal"] = months[MONTHLY_COLUMNS]
+    return tables
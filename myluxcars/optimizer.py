@@ -0,0 +1,254 @@
+"""Otimizador do calendário de compra/venda (AnoCompra/AnoVenda) por carro.
+
+Para cada carro são avaliadas todas as combinações (compra, venda) dentro do
+horizonte – venda em qualquer ano posterior à compra ou nenhuma venda – e, com
+restrição, também a opção de não comprar. As contribuições por carro são
+separáveis (o fluxo de um carro não depende dos outros), então:
+
+* sem restrição, cada carro fica com a melhor combinação, independentemente;
+* com restrição de frota (capital imobilizado máximo ou caixa mínimo por ano), o
+  problema é relaxado por multiplicadores de Lagrange por ano, ajustados por
+  subgradiente; cada iteração volta a ser uma escolha independente por carro. A
+  escolha viável da relaxação passa por uma melhoria local (trocas de candidato que
+  aumentam o objetivo sem violar a restrição) – em frotas pequenas a relaxação
+  deixa folga na restrição.
+
+O objetivo usa o fluxo por carro de :mod:`myluxcars.metrics` (antes de impostos,
+que são não lineares na frota). A avaliação dos candidatos é feita em blocos de
+carros, opcionalmente num pool de processos.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .core import GlobalParams, year_rates
+from .fleet import FleetMatrix, car_stage
+from .metrics import car_cash_flows, npv
+from .worker import progress_map
+
+OBJECTIVES = ("vpl", "caixa")
+CONSTRAINTS = ("capital", "caixa_minimo")
+# Elementos por array (candidatos × carros × anos) em cada bloco
+MAX_BLOCK_ELEMENTS = 2_000_000
+PARALLEL_THRESHOLD = 50_000
+LAGRANGE_ITERATIONS = 300
+IMPROVE_ROUNDS = 50
+
+
+@dataclass
+class OptimizationResult:
+    """Calendário recomendado por carro e resumo da otimização."""
+
+    schedule: pd.DataFrame   # CarID, AnoCompra, AnoVenda, Objetivo, ObjetivoAtual, Ganho
+    objective: float         # soma do objetivo na frota com o calendário recomendado
+    current_objective: float
+    feasible: bool
+    usage: Optional[pd.Series] = None  # uso da restrição por ano (se houver)
+
+
+def candidate_schedules(horizon_years: int, allow_skip: bool = False):
+    """Arrays ``(compra, venda)`` de todos os candidatos; NaN em venda = sem venda, em compra = não comprar."""
+    compra, venda = [], []
+    for c in range(1, horizon_years + 1):
+        for v in list(range(c + 1, horizon_years + 1)) + [np.nan]:
+            compra.append(c)
+            venda.append(v)
+    if allow_skip:
+        compra.append(np.nan)
+        venda.append(np.nan)
+    return np.asarray(compra, dtype=float), np.asarray(venda, dtype=float)
+
+
+def _candidate_masks(fm: FleetMatrix, compra: np.ndarray, venda: np.ndarray):
+    ano = fm.years.astype(float)
+    sem_venda = np.isnan(venda)[:, None]
+    active = (ano >= compra[:, None]) & (sem_venda | (ano < venda[:, None]))
+    sale = ~sem_venda & (ano == venda[:, None])
+    return active[:, None, :] & fm.present, sale[:, None, :] & fm.present
+
+
+def _evaluate_block(fm: FleetMatrix, params: GlobalParams, compra: np.ndarray, venda: np.ndarray,
+                    objective: str, discount_rate: float, constraint: Optional[str]):
+    """Objetivo ``(candidatos, carros)`` e uso da restrição ``(candidatos, carros, anos)`` de um bloco."""
+    active, sale = _candidate_masks(fm, compra, venda)
+    flows = car_cash_flows(fm, params, car_stage(fm, params, active=active, sale=sale))
+    values = npv(flows, fm.years, discount_rate) if objective == "vpl" else flows.sum(axis=-1)
+    if constraint == "capital":
+        usage = np.where(active, fm.preco, 0.0).astype(np.float32)
+    elif constraint == "caixa_minimo":
+        usage = (-flows).astype(np.float32)
+    else:
+        usage = None
+    return values, usage
+
+
+def _solve_lagrangian(values: np.ndarray, usage: np.ndarray, limit: np.ndarray):
+    """Escolha por carro que maximiza ``values`` sujeito a ``Σ usage ≤ limit`` em cada ano."""
+    n = values.shape[1]
+    cars = np.arange(n)
+    lam = np.zeros(usage.shape[-1])
+    value_scale = max(np.abs(values).mean(), 1.0)
+    usage_scale = max(float(np.abs(usage).sum(axis=1).max()), float(np.abs(limit).max()), 1.0) / max(n, 1)
+    best, best_obj = None, -np.inf
+    least_bad, least_viol = None, np.inf
+    for it in range(LAGRANGE_ITERATIONS):
+        score = values - np.einsum("kny,y->kn", usage, lam)
+        choice = score.argmax(axis=0)
+        used = usage[choice, cars].sum(axis=0)
+        viol = used - limit
+        obj = values[choice, cars].sum()
+        worst = viol.max()
+        if worst <= 1e-6 * max(np.abs(limit).max(), 1.0):
+            if obj > best_obj:
+                best, best_obj = choice, obj
+        elif worst < least_viol:
+            least_bad, least_viol = choice, worst
+        step = value_scale / usage_scale / np.sqrt(it + 1)
+        lam = np.maximum(lam + step * viol / max(np.abs(viol).max(), 1e-12), 0.0)
+    if best is not None:
+        return best, True
+    return _repair(values, usage, limit, least_bad)
+
+
+def _repair(values: np.ndarray, usage: np.ndarray, limit: np.ndarray, choice: np.ndarray):
+    """Troca gulosa de candidatos até respeitar a restrição (menor perda por unidade liberada)."""
+    n = values.shape[1]
+    cars = np.arange(n)
+    choice = choice.copy()
+    tol = 1e-6 * max(np.abs(limit).max(), 1.0)
+    for _ in range(n + 1):
+        viol = usage[choice, cars].sum(axis=0) - limit
+        over = viol > tol
+        if not over.any():
+            return choice, True
+        delta = usage[choice, cars] - usage                               # (K, n, anos)
+        freed = delta[..., over].sum(axis=-1)
+        # só candidatos que não aumentam o uso em nenhum ano (garante convergência)
+        ok = (freed > 0) & (delta >= 0).all(axis=-1)
+        loss = values[choice, cars] - values
+        ratio = np.where(ok, np.maximum(loss, 0.0) / np.where(ok, freed, 1.0), np.inf)
+        cand = ratio.argmin(axis=0)
+        best_ratio = ratio[cand, cars]
+        order = np.argsort(best_ratio, kind="stable")
+        order = order[np.isfinite(best_ratio[order])]
+        if not len(order):
+            return choice, False
+        # troca de uma vez os carros mais baratos até cobrir a pior violação
+        cover = np.cumsum(freed[cand[order], order])
+        take = order[: int(np.searchsorted(cover, viol[over].sum())) + 1]
+        choice[take] = cand[take]
+    return choice, False
+
+
+def _improve(values: np.ndarray, usage: np.ndarray, limit: np.ndarray, choice: np.ndarray) -> np.ndarray:
+    """Melhoria local de uma escolha viável: trocas que aumentam o objetivo sem violar a restrição.
+
+    A cada rodada cada carro propõe a melhor troca viável sozinha; as trocas entram em
+    ordem de ganho enquanto o uso acumulado respeita o limite em todos os anos.
+    """
+    n = values.shape[1]
+    cars = np.arange(n)
+    tol = 1e-6 * max(np.abs(limit).max(), 1.0)
+    min_gain = 1e-9 * max(np.abs(values).max(), 1.0)
+    choice = choice.copy()
+    for _ in range(IMPROVE_ROUNDS):
+        current = usage[choice, cars]                                      # (n, anos)
+        used = current.sum(axis=0)
+        delta = usage - current                                            # (K, n, anos)
+        ok = (used + delta <= limit + tol).all(axis=-1)
+        gain = np.where(ok, values - values[choice, cars], -np.inf)
+        cand = gain.argmax(axis=0)
+        best_gain = gain[cand, cars]
+        order = np.argsort(-best_gain, kind="stable")
+        order = order[best_gain[order] > min_gain]
+        if not len(order):
+            break
+        fits = (used + np.cumsum(delta[cand[order], order], axis=0) <= limit + tol).all(axis=-1)
+        # a primeira troca sempre cabe (viável sozinha); as seguintes até a primeira que estoura
+        take = order[:len(fits) if fits.all() else max(int(np.argmin(fits)), 1)]
+        choice[take] = cand[take]
+    return choice
+
+
+def optimize_schedule(fm: FleetMatrix, params: GlobalParams, objective: str = "vpl",
+                      discount_rate: float = 0.10, constraint: Optional[str] = None,
+                      limit: float = 0.0, processes: Optional[int] = None) -> OptimizationResult:
+    """Busca a melhor combinação (AnoCompra, AnoVenda) de cada carro.
+
+    ``constraint="capital"``: soma de PrecoCompra dos carros em operação em cada ano
+    ≤ ``limit``. ``constraint="caixa_minimo"``: fluxo da frota menos custos fixos
+    (equipe, plataforma, outros) ≥ ``limit`` em cada ano.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objetivo inválido: {objective!r} (use {OBJECTIVES})")
+    if constraint is not None and constraint not in CONSTRAINTS:
+        raise ValueError(f"restrição inválida: {constraint!r} (use {CONSTRAINTS})")
+
+    compra, venda = candidate_schedules(len(fm.years), allow_skip=constraint is not None)
+    block = max(1, MAX_BLOCK_ELEMENTS // max(len(compra) * len(fm.years), 1))
+    starts = list(range(0, fm.n_cars, block))
+    blocks = [fm.take(slice(s, s + block)) for s in starts]
+    args = (params, compra, venda, objective, discount_rate, constraint)
+
+    if processes is None:
+        processes = os.cpu_count() if fm.n_cars >= PARALLEL_THRESHOLD else 1
+    if processes > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=min(processes, len(blocks))) as pool:
+            parts = progress_map(_evaluate_block, blocks, *[[a] * len(blocks) for a in args], executor=pool,
+                                 message="Avaliando calendários")
+    else:
+        parts = progress_map(_evaluate_block, blocks, *[[a] * len(blocks) for a in args],
+                             message="Avaliando calendários")
+    values = np.concatenate([p[0] for p in parts], axis=1) if parts else np.zeros((len(compra), 0))
+
+    usage_by_year = None
+    if constraint is None:
+        choice, feasible = values.argmax(axis=0), True
+    else:
+        usage = np.concatenate([p[1] for p in parts], axis=1)
+        if constraint == "capital":
+            bound = np.full(len(fm.years), float(limit))
+        else:
+            rates = year_rates(params, fm.years)
+            fixed = rates["team_cost"] + rates["platform_cost"] + rates["other_fixed"]
+            bound = -(float(limit) + np.nan_to_num(fixed))
+        choice, feasible = _solve_lagrangian(values, usage, bound)
+        if feasible:
+            choice = _improve(values, usage, bound, choice)
+        used = usage[choice, np.arange(fm.n_cars)].sum(axis=0)
+        usage_by_year = pd.Series(used if constraint == "capital" else -used,
+                                  index=pd.Index(fm.years, name="Ano"), name=constraint)
+
+    # Objetivo com o calendário informado hoje, para comparação
+    current_flows = car_cash_flows(fm, params)
+    current = (npv(current_flows, fm.years, discount_rate) if objective == "vpl"
+               else current_flows.sum(axis=-1))
+    cars = np.arange(fm.n_cars)
+    chosen = values[choice, cars]
+    schedule = pd.DataFrame({
+        "CarID": fm.car_ids,
+        "AnoCompra": compra[choice],
+        "AnoVenda": venda[choice],
+        "Objetivo": chosen,
+        "ObjetivoAtual": current,
+        "Ganho": chosen - current,
+    })
+    return OptimizationResult(schedule, float(chosen.sum()), float(current.sum()), feasible, usage_by_year)
+
+
+def apply_schedule(yearly: pd.DataFrame, schedule: pd.DataFrame) -> pd.DataFrame:
+    """Grava AnoCompra/AnoVenda recomendados em todas as linhas anuais de cada carro."""
+    out = yearly.copy()
+    plan = schedule.set_index(schedule["CarID"].astype(str))
+    ids = out["CarID"].astype(str)
+    hit = ids.isin(plan.index)
+    for col in ("AnoCompra", "AnoVenda"):
+        new = ids[hit].map(plan[col])
+        out[col] = out[col].astype(float)
+        out.loc[hit, col] = new.to_numpy(dtype=float)
+    return out
@@ -0,0 +1,183 @@
+"""Portfólio de frotas: vários projetos (um por cidade ou entidade) avaliados e consolidados.
+
+Cada arquivo de projeto do diretório (JSON de "Salvar Projeto" ou SQLite) é avaliado
+com os próprios ``global_params``. O resultado de cada frota fica no memo do processo
+(:mod:`myluxcars.memo`) indexado pelo caminho e por ``(mtime_ns, tamanho)`` do
+arquivo: ao alterar uma frota, só ela é relida e recalculada.
+
+As frotas ainda não calculadas são lidas e avaliadas em paralelo – num pool de
+processos quando o volume de arquivos justifica abrir processos (cada processo devolve
+só as tabelas anuais, pequenas), senão num pool de threads do processo atual (leitura
+de arquivo, SQLite e numpy liberam o GIL; diretórios típicos, de poucos MB, ficam aqui).
+
+O consolidado é a soma das tabelas das frotas, ano a ano: cada frota é uma entidade
+com seus próprios impostos (sem compensação de prejuízo entre frotas).
+"""
+
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from .core import AMORTIZATION_CASH_COLUMNS, PNL_COLUMNS, GlobalParams, compute_per_year_tables
+from .memo import MemoCache, shared_cache
+from .profiling import stage
+from .project import SQLITE_SUFFIXES, _file_signature, load_project
+from .worker import progress_map
+
+PROJECT_SUFFIXES = (".json",) + SQLITE_SUFFIXES
+PARALLEL_BYTES = 20 * 2**20  # volume (soma dos arquivos a ler) a partir do qual vale abrir o pool de processos
+MAX_THREADS = 8  # threads de leitura abaixo de PARALLEL_BYTES
+SUMMARY_COLUMNS = [("PnL", "ReceitaLiquida"), ("PnL", "EBITDA"), ("PnL", "LucroLiquido"), ("Cash", "CaixaFinal")]
+
+
+@dataclass
+class FleetResult:
+    """Tabelas anuais de uma frota do portfólio."""
+
+    name: str
+    path: str
+    global_params: dict
+    n_cars: int
+    tables: Dict[str, pd.DataFrame]
+
+
+@dataclass
+class PortfolioResult:
+    """Frotas avaliadas (na ordem dos arquivos) e erros de leitura/cálculo por arquivo."""
+
+    fleets: Dict[str, FleetResult] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    def consolidated(self) -> Dict[str, pd.DataFrame]:
+        """P&L e Caixa somados entre as frotas (anos de todos os horizontes; ausentes contam zero)."""
+        out = {}
+        for key, order in (("PnL", PNL_COLUMNS), ("Cash", AMORTIZATION_CASH_COLUMNS)):
+            frames = [f.tables[key] for f in self.fleets.values()]
+            if not frames:
+                out[key] = pd.DataFrame(columns=order, index=pd.Index([], name="Ano"), dtype=float)
+                continue
+            total = pd.concat(frames).groupby(level=0).sum()
+            out[key] = total[[c for c in order if c in total.columns]].rename_axis("Ano")
+        return out
+
+    def compare(self, table: str, column: str) -> pd.DataFrame:
+        """``column`` da tabela ``table`` (``PnL`` ou ``Cash``) por ano, uma coluna por frota."""
+        return pd.DataFrame({
+            name: f.tables[table][column] for name, f in self.fleets.items() if column in f.tables[table].columns
+        }).rename_axis("Ano")
+
+    def summary(self) -> pd.DataFrame:
+        """Uma linha por frota: carros, horizonte e totais do horizonte dos principais resultados."""
+        rows = []
+        for name, f in self.fleets.items():
+            row = {"Frota": name, "Carros": f.n_cars,
+                   "Horizonte": int(f.global_params.get("horizon_years", len(f.tables["PnL"])))}
+            for table, column in SUMMARY_COLUMNS:
+                row[column] = float(f.tables[table][column].sum())
+            rows.append(row)
+        return pd.DataFrame(rows, columns=["Frota", "Carros", "Horizonte"] + [c for _, c in SUMMARY_COLUMNS])
+
+
+def list_projects(directory: str) -> List[str]:
+    """Arquivos de projeto (JSON/SQLite) de ``directory``, em ordem alfabética (sem subdiretórios)."""
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(PROJECT_SUFFIXES) and not name.startswith(".")
+        and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def expand_paths(paths: Iterable[str]) -> List[str]:
+    """Caminhos de projeto com diretórios trocados pelos projetos que contêm."""
+    out = []
+    for path in paths:
+        out.extend(list_projects(path) if os.path.isdir(path) else [path])
+    return out
+
+
+def fleet_names(paths: List[str]) -> List[str]:
+    """Nome de cada frota: o nome do arquivo sem extensão (com extensão, se repetir)."""
+    stems = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    return [s if stems.count(s) == 1 else os.path.basename(p) for s, p in zip(stems, paths)]
+
+
+def portfolio_key(paths: List[str]) -> tuple:
+    """Assinatura do conjunto de arquivos (muda quando algum arquivo é alterado, criado ou removido)."""
+    return tuple((os.path.abspath(p), _file_signature(p)) for p in paths)
+
+
+def evaluate_fleet(path: str, name: Optional[str] = None) -> FleetResult:
+    """Lê um projeto e calcula P&L e Caixa com os parâmetros globais dele."""
+    cars, yearly, global_params = load_project(path, dense=False)
+    with stage("portfolio.frota", rows=len(cars)):
+        tables = compute_per_year_tables(cars, yearly, GlobalParams.from_dict(global_params))
+    name = name or fleet_names([path])[0]
+    return FleetResult(name, path, global_params, int(cars["CarID"].dropna().nunique()), tables)
+
+
+def _evaluate_safe(path: str, name: str) -> Tuple[Optional[FleetResult], Optional[str]]:
+    try:
+        return evaluate_fleet(path, name), None
+    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def evaluate_portfolio(paths: Union[str, Iterable[str]], processes: Optional[int] = None,
+                       cache: Optional[MemoCache] = None) -> PortfolioResult:
+    """Avalia as frotas de um diretório (ou de uma lista de arquivos/diretórios).
+
+    Frotas já calculadas com o arquivo inalterado vêm do memo. ``processes=None`` usa o
+    pool de processos quando os arquivos a ler somam :data:`PARALLEL_BYTES` ou mais, e um
+    pool de threads abaixo disso; ``processes=1`` força execução sequencial no processo atual.
+    """
+    cache = shared_cache() if cache is None else cache
+    paths = expand_paths([paths] if isinstance(paths, str) else paths)
+    names = fleet_names(paths)
+
+    keys, results, missing = {}, {}, []
+    for path, name in zip(paths, names):
+        try:
+            keys[path] = ("portfolio", (os.path.abspath(path), name, _file_signature(path)))
+        except OSError as e:
+            results[path] = (None, f"{type(e).__name__}: {e}")
+            continue
+        hit = cache.get(keys[path])
+        if hit is not None:
+            results[path] = (hit, None)
+        else:
+            missing.append((path, name))
+
+    if missing:
+        threads = 1
+        if processes is None:
+            volume = sum(os.path.getsize(p) for p, _ in missing)
+            processes = os.cpu_count() if len(missing) > 1 and volume >= PARALLEL_BYTES else 1
+            threads = min(MAX_THREADS, len(missing))
+        args = ([p for p, _ in missing], [n for _, n in missing])
+        with stage("portfolio.avaliar", rows=len(missing)):
+            if processes > 1 and len(missing) > 1:
+                with ProcessPoolExecutor(max_workers=min(processes, len(missing))) as pool:
+                    evaluated = progress_map(_evaluate_safe, *args, executor=pool, message="Avaliando frotas")
+            elif threads > 1:
+                # Pool próprio: a avaliação pode já estar rodando no pool compartilhado dos jobs
+                with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="myluxcars-frota") as pool:
+                    evaluated = progress_map(_evaluate_safe, *args, executor=pool, message="Avaliando frotas")
+            else:
+                evaluated = progress_map(_evaluate_safe, *args, message="Avaliando frotas")
+        for (path, _), (fleet, error) in zip(missing, evaluated):
+            results[path] = (fleet, error)
+            if fleet is not None:
+                cache.put(keys[path], fleet)
+
+    out = PortfolioResult()
+    for path, name in zip(paths, names):
+        fleet, error = results[path]
+        if fleet is None:
+            out.errors[name] = error
+        else:
+            out.fleets[name] = fleet
+    return out
@@ -0,0 +1,145 @@
+"""Instrumentação opcional por etapa: tempo e linhas processadas.
+
+O código marca etapas com ``with stage("nome", rows=len(df)):``. Sem um
+:class:`Profile` ativo (o padrão), :func:`stage` devolve um contexto nulo
+compartilhado – custo de uma leitura de ``ContextVar`` por etapa. Com um perfil
+ativo (:func:`profile_run` ou :meth:`Profile.start`), cada etapa registra duração,
+linhas e profundidade de aninhamento. O perfil ativo vive numa ``ContextVar``, então
+sessões do Streamlit (uma thread por sessão) não se misturam.
+"""
+
+import contextlib
+import json
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+_current: ContextVar[Optional["Profile"]] = ContextVar("myluxcars_profile", default=None)
+_NULL = contextlib.nullcontext()
+
+HISTORY_COLUMNS = ["Execucao", "Rotulo", "Inicio", "Etapa", "Profundidade", "Segundos", "Linhas"]
+
+
+@dataclass
+class StageTiming:
+    name: str
+    seconds: float
+    rows: Optional[int]
+    depth: int
+
+
+@dataclass
+class Profile:
+    """Tempos das etapas de uma execução (ex.: um rerun do app)."""
+
+    label: str = ""
+    started: float = field(default_factory=time.time)
+    stages: List[StageTiming] = field(default_factory=list)
+    total_seconds: float = 0.0
+
+    def __post_init__(self):
+        self._depth = 0
+        self._t0 = time.perf_counter()
+        self._token = None
+
+    def start(self) -> "Profile":
+        """Ativa o perfil no contexto atual (até :meth:`stop`)."""
+        self._t0 = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def stop(self) -> "Profile":
+        self.total_seconds = time.perf_counter() - self._t0
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        return self
+
+    @contextlib.contextmanager
+    def _timed(self, name: str, rows: Optional[int]) -> Iterator[None]:
+        depth = self._depth
+        self._depth += 1
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth = depth
+            self.stages.append(StageTiming(name, time.perf_counter() - t0, rows, depth))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Uma linha por etapa, na ordem em que terminaram."""
+        return pd.DataFrame(
+            [(s.name, s.depth, s.seconds, s.rows) for s in self.stages],
+            columns=["Etapa", "Profundidade", "Segundos", "Linhas"],
+        ).astype({"Linhas": "Int64"})
+
+
+def stage(name: str, rows: Optional[int] = None):
+    """Contexto que cronometra a etapa ``name`` no perfil ativo; nulo se não houver perfil."""
+    profile = _current.get()
+    if profile is None:
+        return _NULL
+    return profile._timed(name, rows)
+
+
+def enabled() -> bool:
+    return _current.get() is not None
+
+
+def disable():
+    """Desativa qualquer perfil do contexto atual (ex.: rerun interrompido antes do ``stop``)."""
+    _current.set(None)
+
+
+@contextlib.contextmanager
+def profile_run(label: str = "") -> Iterator[Profile]:
+    """Ativa um :class:`Profile` novo durante o bloco (linha de comando, benchmarks)."""
+    profile = Profile(label).start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
+
+
+class ProfileHistory:
+    """Últimos ``maxlen`` perfis, com exportação em DataFrame, JSON e CSV."""
+
+    def __init__(self, maxlen: int = 20):
+        self.runs = deque(maxlen=maxlen)
+        self._count = 0
+
+    def resize(self, maxlen: int):
+        if maxlen != self.runs.maxlen:
+            self.runs = deque(self.runs, maxlen=maxlen)
+
+    def add(self, profile: Profile):
+        self._count += 1
+        self.runs.append((self._count, profile))
+
+    def to_frame(self) -> pd.DataFrame:
+        rows = [
+            (n, p.label, pd.Timestamp(p.started, unit="s"), s.name, s.depth, s.seconds, s.rows)
+            for n, p in self.runs for s in p.stages
+        ]
+        return pd.DataFrame(rows, columns=HISTORY_COLUMNS).astype({"Linhas": "Int64"})
+
+    def totals(self) -> pd.DataFrame:
+        """Duração total de cada execução."""
+        return pd.DataFrame(
+            [(n, p.label, p.total_seconds) for n, p in self.runs],
+            columns=["Execucao", "Rotulo", "Segundos"],
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(
+            [{"execucao": n, "rotulo": p.label, "inicio": p.started, "total_segundos": p.total_seconds,
+              "etapas": [asdict(s) for s in p.stages]} for n, p in self.runs],
+            indent=2, ensure_ascii=False,
+        )
+
+    def to_csv(self) -> str:
+        return self.to_frame().to_csv(index=False)
@@ -0,0 +1,191 @@
+"""Leitura e escrita de arquivos de projeto (frota + dados anuais + parâmetros globais)."""
+
+import contextlib
+import copy
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+import pandas as pd
+
+from .core import GlobalParams, empty_cars_df, template_yearly_inputs
+from .layered import LayeredYearly
+from .profiling import stage
+
+
+@contextlib.contextmanager
+def atomic_open(path: str, encoding: str = "utf-8"):
+    """Abre um temporário ao lado de ``path`` para escrita; ao final ele substitui ``path`` (``os.replace``).
+
+    Uma queda no meio da gravação nunca deixa ``path`` pela metade.
+    """
+    tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+    try:
+        with open(tmp, "w", encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+
+
+def _params_dict(params: Union[GlobalParams, dict]) -> dict:
+    return params.to_dict() if isinstance(params, GlobalParams) else dict(params)
+
+
+def project_from_dict(data: dict, dense: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame, dict]:
+    """Converte o dicionário do JSON de projeto em ``(cars, yearly, global_params)``.
+
+    Projetos esparsos (bloco ``yearly_layers``) voltam como grade densa, ou como
+    :class:`LayeredYearly` com ``dense=False`` para o cálculo montá-la só quando precisar.
+    """
+    # Carregar dados da frota
+    cars_data = pd.DataFrame(data['cars']) if 'cars' in data else empty_cars_df()
+
+    # Carregar dados anuais
+    if 'yearly_layers' in data:
+        yearly_data = LayeredYearly.from_dict(data['yearly_layers'])
+        if dense:
+            yearly_data = yearly_data.to_dense(cars_data)
+    else:
+        yearly_data = pd.DataFrame(data['yearly']) if 'yearly' in data else template_yearly_inputs([])
+
+    # Carregar parâmetros globais
+    global_params = data.get('global_params', {})
+
+    return cars_data, yearly_data, global_params
+
+
+def project_to_dict(cars: pd.DataFrame, yearly, params: Union[GlobalParams, dict],
+                    timestamp: Optional[str] = None, sparse: bool = False) -> dict:
+    """Monta o dicionário salvo em JSON (mesmo formato de ``prepare_data_for_export``).
+
+    Com ``sparse=True`` (ou se ``yearly`` já for uma :class:`LayeredYearly`) grava
+    ``yearly_layers`` – só defaults por Categoria e overrides – no lugar de ``yearly``.
+    """
+    data = {"cars": cars.to_dict('records')}
+    if sparse or isinstance(yearly, LayeredYearly):
+        layers = yearly if isinstance(yearly, LayeredYearly) else LayeredYearly.from_dense(yearly, cars)
+        data["yearly_layers"] = layers.to_dict()
+    else:
+        data["yearly"] = yearly.to_dict('records')
+    data["global_params"] = _params_dict(params)
+    data["timestamp"] = timestamp or pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+    return data
+
+
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+
+
+def load_project(path: str, dense: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame, dict]:
+    """Lê um arquivo de projeto (JSON ou SQLite, pela extensão) e devolve ``(cars, yearly, global_params)``."""
+    with stage("project.load"):
+        if path.lower().endswith(SQLITE_SUFFIXES):
+            from .storage import load_project_sqlite
+            return load_project_sqlite(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return project_from_dict(data, dense=dense)
+
+
+def save_project(path: str, cars: pd.DataFrame, yearly,
+                 params: Union[GlobalParams, dict], sparse: bool = False) -> None:
+    """Grava o projeto em JSON ou SQLite (pela extensão); SQLite regrava só os carros alterados."""
+    with stage("project.save"):
+        if path.lower().endswith(SQLITE_SUFFIXES):
+            from .storage import save_project_sqlite
+            if isinstance(yearly, LayeredYearly):
+                yearly = yearly.to_dense(cars)
+            save_project_sqlite(path, cars, yearly, _params_dict(params))
+            return
+        data = project_to_dict(cars, yearly, params, sparse=sparse)
+        with atomic_open(path) as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+# pandas >= 3 sempre usa copy-on-write: cópias rasas são visões baratas e seguras
+_COPY_ON_WRITE = int(pd.__version__.split(".")[0]) >= 3
+
+
+def _file_signature(path: str) -> tuple:
+    """``(mtime_ns, tamanho)`` do arquivo e, no SQLite em modo WAL, também do ``-wal``."""
+    sig = []
+    for p in (path, path + "-wal"):
+        try:
+            st = os.stat(p)
+        except FileNotFoundError:
+            if p == path:
+                raise
+            continue
+        sig.append((st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+
+def _project_view(project: Tuple[pd.DataFrame, pd.DataFrame, dict]) -> Tuple[pd.DataFrame, pd.DataFrame, dict]:
+    cars, yearly, global_params = project
+    if isinstance(yearly, pd.DataFrame):
+        yearly = yearly.copy(deep=not _COPY_ON_WRITE)
+    else:
+        yearly = copy.deepcopy(yearly)
+    return cars.copy(deep=not _COPY_ON_WRITE), yearly, copy.deepcopy(global_params)
+
+
+class ProjectFileCache:
+    """Projetos lidos do disco e compartilhados entre sessões (ex.: o projeto padrão do app).
+
+    A entrada de cada arquivo vale enquanto ``(mtime_ns, tamanho)`` não mudar; cada
+    chamada de :meth:`load` devolve cópias próprias (rasas com copy-on-write), então
+    uma sessão que edita a frota não afeta as demais. :meth:`save` grava e recarrega
+    a entrada na hora, para todas as sessões.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[tuple, tuple] = {}
+        self.reads = 0
+
+    def load(self, path: str, dense: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame, dict]:
+        key = (os.path.abspath(path), dense)
+        sig = _file_signature(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[0] != sig:
+            # Lido fora do lock; se o arquivo mudar durante a leitura, a assinatura
+            # antiga guardada força nova leitura na próxima chamada
+            entry = (sig, load_project(path, dense=dense))
+            with self._lock:
+                self._entries[key] = entry
+                self.reads += 1
+        return _project_view(entry[1])
+
+    def save(self, path: str, cars: pd.DataFrame, yearly, params: Union[GlobalParams, dict],
+             sparse: bool = False) -> None:
+        save_project(path, cars, yearly, params, sparse=sparse)
+        self.refresh(path)
+
+    def refresh(self, path: str, dense: bool = True):
+        """Relê ``path`` na hora (ex.: após gravá-lo por outro caminho)."""
+        self.invalidate(path)
+        self.load(path, dense=dense)
+
+    def invalidate(self, path: Optional[str] = None):
+        """Descarta as entradas de ``path`` (todas, se ``None``)."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            target = os.path.abspath(path)
+            for key in [k for k in self._entries if k[0] == target]:
+                del self._entries[key]
+
+
+_default_cache = ProjectFileCache()
+
+
+def shared_project_cache() -> ProjectFileCache:
+    """Cache de projetos do processo (compartilhado por todas as sessões do app)."""
+    return _default_cache
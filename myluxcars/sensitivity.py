@@ -0,0 +1,112 @@
+"""Análise de sensibilidade dos parâmetros globais (grades, tornado e mapas de calor).
+
+O estágio por carro (receita, custos, depreciação, juros) não depende de upsell,
+impostos, deduções ou marketing; o prazo de financiamento só altera o financiamento
+(principal; no modo de amortização também juros e entrada). Por isso o estágio por
+carro é calculado uma única vez (com o financiamento de cada prazo) e a grade inteira
+é avaliada num único :func:`myluxcars.core.global_stage` com broadcast – um eixo do
+array por parâmetro varrido.
+"""
+
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .core import FINANCING_TERM_TO_ANNUAL_INSTALLMENT, GlobalParams, global_stage
+from .fleet import FleetMatrix, car_stage, loan_stage, year_sums
+
+# Parâmetros que podem ser varridos e seus rótulos na interface.
+# deductions_rate/marketing_rate varridos são aplicados igualmente a todos os anos.
+SENSITIVITY_PARAMS = {
+    "upsell_rate": "Upsell (%)",
+    "tax_rate": "Impostos (%)",
+    "financing_term": "Prazo de financiamento (anos)",
+    "deductions_rate": "Deduções (%)",
+    "marketing_rate": "Marketing (%)",
+}
+OUTPUT_METRICS = ["LucroLiquido", "CaixaFinal"]
+
+
+def stage_sums_by_term(fm: FleetMatrix, params: GlobalParams) -> Dict[int, Dict[str, np.ndarray]]:
+    """Somas anuais do estágio por carro para cada prazo de financiamento (só o financiamento muda)."""
+    sums = year_sums(car_stage(fm, params))
+    active, sale = fm.activity()
+    out = {}
+    for term in FINANCING_TERM_TO_ANNUAL_INSTALLMENT:
+        loan = loan_stage(fm, params, active=active, sale=sale, financing_term=term)
+        out[term] = dict(sums, **{k: v.sum(axis=-2) for k, v in loan.items()})
+    return out
+
+
+def sweep(sums_by_term: Mapping[int, Mapping[str, np.ndarray]], years, params: GlobalParams,
+          axes: Mapping[str, Sequence]) -> pd.DataFrame:
+    """Avalia o produto cartesiano de ``axes`` (parâmetro → valores).
+
+    Retorna uma linha por ponto da grade com os valores dos parâmetros e
+    ``LucroLiquidoAcumulado`` / ``CaixaFinalAcumulado`` no horizonte.
+    """
+    names = list(axes)
+    unknown = [n for n in names if n not in SENSITIVITY_PARAMS]
+    if unknown:
+        raise ValueError(f"parâmetros sem suporte na sensibilidade: {unknown}")
+    shape = tuple(len(axes[n]) for n in names)
+
+    def along(i, values):
+        # Eixo i da grade, com o eixo dos anos à direita para broadcast
+        dims = [1] * len(names) + [1]
+        dims[i] = len(values)
+        return np.asarray(values, dtype=float).reshape(dims)
+
+    sums = dict(sums_by_term[params.financing_term])
+    overrides = {}
+    for i, name in enumerate(names):
+        if name == "financing_term":
+            terms = [int(t) for t in axes[name]]
+            dims = [1] * len(names) + [-1]
+            dims[i] = len(terms)
+            sums = {k: np.stack([sums_by_term[t][k] for t in terms]).reshape(dims) for k in sums}
+        else:
+            overrides[name] = along(i, axes[name])
+
+    out = global_stage(sums, years, params, **overrides)
+    grid = pd.MultiIndex.from_product([list(axes[n]) for n in names], names=names).to_frame(index=False)
+    for metric in OUTPUT_METRICS:
+        grid[metric + "Acumulado"] = np.broadcast_to(out[metric].sum(axis=-1), shape).ravel()
+    return grid
+
+
+def default_ranges(params: GlobalParams) -> Dict[str, Tuple[float, float]]:
+    """Faixas (baixo, alto) padrão do tornado em torno dos parâmetros atuais."""
+    years = params.years
+    deducoes = float(np.mean([params.deductions_rate_by_year[y] for y in years]))
+    marketing = float(np.mean([params.marketing_rate_by_year[y] for y in years]))
+    terms = sorted(FINANCING_TERM_TO_ANNUAL_INSTALLMENT)
+    return {
+        "upsell_rate": (params.upsell_rate * 0.5, params.upsell_rate * 1.5),
+        "tax_rate": (max(params.tax_rate - 0.10, 0.0), min(params.tax_rate + 0.10, 1.0)),
+        "financing_term": (terms[0], terms[-1]),
+        "deductions_rate": (max(deducoes - 0.05, 0.0), deducoes + 0.05),
+        "marketing_rate": (max(marketing - 0.05, 0.0), marketing + 0.05),
+    }
+
+
+def tornado(sums_by_term: Mapping[int, Mapping[str, np.ndarray]], years, params: GlobalParams,
+            ranges: Optional[Mapping[str, Tuple[float, float]]] = None,
+            metric: str = "LucroLiquido") -> pd.DataFrame:
+    """Variação do ``metric`` acumulado ao mover cada parâmetro, um de cada vez, entre baixo e alto."""
+    ranges = default_ranges(params) if ranges is None else ranges
+    base = float(global_stage(sums_by_term[params.financing_term], years, params)[metric].sum())
+    rows = []
+    for name, (low, high) in ranges.items():
+        res = sweep(sums_by_term, years, params, {name: [low, high]})[metric + "Acumulado"].to_numpy()
+        rows.append({
+            "Parametro": SENSITIVITY_PARAMS[name],
+            "ValorBaixo": low,
+            "ValorAlto": high,
+            "ResultadoBaixo": res[0],
+            "ResultadoAlto": res[1],
+            "Base": base,
+            "Amplitude": abs(res[1] - res[0]),
+        })
+    return pd.DataFrame(rows).sort_values("Amplitude", ascending=False, ignore_index=True)
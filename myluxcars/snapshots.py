@@ -0,0 +1,281 @@
+"""Histórico de versões do projeto padrão: gravação atômica, com trava, e snapshots em delta.
+
+Cada :meth:`SnapshotStore.save` grava o projeto (JSON atômico via arquivo temporário +
+``os.replace``, ou SQLite transacional) sob uma trava de arquivo (``<projeto>.lock``,
+``fcntl.flock``), então duas sessões salvando ao mesmo tempo são serializadas. Em
+seguida acrescenta uma versão ao histórico em ``<projeto>.history/``:
+
+* ``log.jsonl`` – só acréscimos; cada linha guarda os carros novos/alterados (cadastro
+  e todas as linhas anuais do carro), os CarIDs removidos e os parâmetros globais. A
+  cada ``checkpoint_every`` versões a linha é um checkpoint com o estado completo;
+* ``index.jsonl`` – resumo de cada versão com a posição da linha no log, para listar
+  sem ler os deltas e restaurar lendo só o checkpoint anterior e os deltas seguintes;
+* ``head.json`` – hash por carro da última versão, para detectar alterações sem
+  reconstruir o estado.
+
+O conteúdo é normalizado pelos esquemas de :mod:`myluxcars.storage` (números em float,
+texto em str), como no SQLite: o hash de um carro não depende de como a frota foi lida.
+Uma queda no meio da gravação deixa no máximo uma linha incompleta no fim do log ou do
+índice, que é ignorada.
+"""
+
+import contextlib
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from .core import GlobalParams
+from .fingerprint import car_fingerprints
+from .project import atomic_open, load_project, save_project
+from .storage import _READ_DTYPES, CARS_SCHEMA, OPTIONAL_CAR_COLUMNS, YEARLY_SCHEMA, _normalize, _records
+
+try:
+    import fcntl
+except ImportError:  # Windows: só a trava entre threads do processo
+    fcntl = None
+
+DEFAULT_CHECKPOINT_EVERY = 20
+INDEX_COLUMNS = ["Versao", "Data", "Descricao", "Checkpoint", "Carros", "Alterados", "Removidos"]
+DIFF_COLUMNS = ["CarID", "Mudanca", "Colunas"]
+_CARS_COLS = list(CARS_SCHEMA)
+_YEARLY_COLS = list(YEARLY_SCHEMA)
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextlib.contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Trava exclusiva sobre ``path`` (arquivo ``<path>.lock``), entre processos e threads."""
+    lock_path = os.path.abspath(path) + ".lock"
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(lock_path, threading.Lock())
+    with thread_lock, open(lock_path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _append_line(path: str, line: str) -> Tuple[int, int]:
+    """Acrescenta ``line`` (uma linha JSON) e devolve ``(offset, tamanho)`` em bytes."""
+    data = (line + "\n").encode("utf-8")
+    with open(path, "ab+") as f:
+        offset = f.seek(0, os.SEEK_END)
+        if offset:
+            # Linha incompleta de uma queda anterior: começa numa linha nova
+            f.seek(offset - 1)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+                offset += 1
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return offset, len(data)
+
+
+def _read_lines(path: str) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                out.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # linha incompleta (queda no meio da gravação)
+    return out
+
+
+def _params_dict(params: Union[GlobalParams, dict]) -> dict:
+    return params.to_dict() if isinstance(params, GlobalParams) else dict(params or {})
+
+
+class SnapshotStore:
+    """Projeto em ``path`` com histórico de versões em delta ao lado (``<path>.history/``)."""
+
+    def __init__(self, path: str, checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.history_dir = path + ".history"
+        self._log = os.path.join(self.history_dir, "log.jsonl")
+        self._index = os.path.join(self.history_dir, "index.jsonl")
+        self._head = os.path.join(self.history_dir, "head.json")
+
+    # ---------- gravação ----------
+
+    def save(self, cars: pd.DataFrame, yearly: pd.DataFrame, params: Union[GlobalParams, dict],
+             description: str = "") -> dict:
+        """Grava o projeto e acrescenta uma versão ao histórico; devolve o resumo da versão."""
+        with file_lock(self.path):
+            os.makedirs(self.history_dir, exist_ok=True)
+            if not self._index_entries() and os.path.exists(self.path):
+                # Primeira gravação com histórico: o arquivo atual vira a versão 1
+                self._append(*load_project(self.path), description="estado inicial")
+            save_project(self.path, cars, yearly, params)
+            return self._append(cars, yearly, params, description)
+
+    def _append(self, cars: pd.DataFrame, yearly: pd.DataFrame, params, description: str) -> dict:
+        entries = self._index_entries()
+        version = entries[-1]["versao"] + 1 if entries else 1
+        cars_n, yearly_n, fps = self._normalized(cars, yearly)
+        prev = self._head_fingerprints(entries)
+        checkpoint = prev is None or (version - 1) % self.checkpoint_every == 0
+
+        if prev is None:
+            changed, removed = list(fps.index), []
+        else:
+            changed = [cid for cid, fp in fps.items() if prev.get(cid) != fp]
+            removed = [cid for cid in prev if cid not in fps.index]
+        # Checkpoint: estado completo (os removidos já não estão nele)
+        stored = set(fps.index) if checkpoint else set(changed)
+        record = {
+            "versao": version,
+            "checkpoint": checkpoint,
+            "cars_cols": _CARS_COLS,
+            "yearly_cols": _YEARLY_COLS,
+            "cars": _records(cars_n[cars_n["CarID"].isin(stored)], CARS_SCHEMA),
+            "yearly": _records(yearly_n[yearly_n["CarID"].isin(stored)], YEARLY_SCHEMA),
+            "removidos": [] if checkpoint else removed,
+            "global_params": _params_dict(params),
+        }
+        offset, size = _append_line(self._log, json.dumps(record, default=str, ensure_ascii=False))
+        entry = {
+            "versao": version,
+            "data": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "descricao": description,
+            "checkpoint": checkpoint,
+            "carros": len(fps),
+            "alterados": len(changed),
+            "removidos": len(removed),
+            "offset": offset,
+            "tamanho": size,
+        }
+        _append_line(self._index, json.dumps(entry, ensure_ascii=False))
+        with atomic_open(self._head) as f:
+            json.dump({"versao": version, "fingerprints": fps.to_dict()}, f)
+        return entry
+
+    @staticmethod
+    def _normalized(cars: pd.DataFrame, yearly: pd.DataFrame):
+        cars_n = _normalize(cars.dropna(subset=["CarID"]), CARS_SCHEMA)
+        if yearly.empty or "CarID" not in yearly.columns:
+            yearly_n = _normalize(pd.DataFrame(columns=_YEARLY_COLS), YEARLY_SCHEMA)
+        else:
+            yearly_n = _normalize(yearly.dropna(subset=["CarID"]), YEARLY_SCHEMA)
+        fps = car_fingerprints(cars_n, yearly_n, car_columns=None).astype(str)
+        return cars_n, yearly_n, fps
+
+    def _head_fingerprints(self, entries: List[dict]) -> Optional[Dict[str, str]]:
+        """Hashes por carro da última versão (``None`` se não houver versões)."""
+        if not entries:
+            return None
+        try:
+            with open(self._head, encoding="utf-8") as f:
+                head = json.load(f)
+            if head.get("versao") == entries[-1]["versao"]:
+                return head["fingerprints"]
+        except (OSError, json.JSONDecodeError):
+            pass
+        # head.json ausente ou atrasado (queda entre o log e o head): reconstrói
+        cars, yearly, _ = self.load(entries[-1]["versao"])
+        return self._normalized(cars, yearly)[2].to_dict()
+
+    # ---------- leitura ----------
+
+    def _index_entries(self) -> List[dict]:
+        return _read_lines(self._index)
+
+    def list(self) -> pd.DataFrame:
+        """Versões gravadas, da mais recente para a mais antiga."""
+        entries = self._index_entries()
+        df = pd.DataFrame(
+            [(e["versao"], e["data"], e["descricao"], e["checkpoint"], e["carros"], e["alterados"], e["removidos"])
+             for e in entries],
+            columns=INDEX_COLUMNS,
+        )
+        return df.iloc[::-1].reset_index(drop=True)
+
+    def _record(self, entry: dict) -> dict:
+        with open(self._log, "rb") as f:
+            f.seek(entry["offset"])
+            return json.loads(f.read(entry["tamanho"]))
+
+    def _state(self, version: int):
+        """Estado da versão: ``({CarID: linha do cadastro}, {CarID: linhas anuais}, parâmetros)``."""
+        entries = self._index_entries()
+        pos = next((i for i, e in enumerate(entries) if e["versao"] == version), None)
+        if pos is None:
+            raise KeyError(f"versão {version} não encontrada em {self.history_dir}")
+        start = max(i for i in range(pos + 1) if entries[i]["checkpoint"])
+        cars: Dict[str, list] = {}
+        yearly: Dict[str, list] = {}
+        params: dict = {}
+        for entry in entries[start:pos + 1]:
+            rec = self._record(entry)
+            if rec["checkpoint"]:
+                cars, yearly = {}, {}
+            car_pos = rec["cars_cols"].index("CarID")
+            year_pos = rec["yearly_cols"].index("CarID")
+            changed: Dict[str, list] = {}
+            for row in rec["yearly"]:
+                changed.setdefault(row[year_pos], []).append(dict(zip(rec["yearly_cols"], row)))
+            for row in rec["cars"]:
+                cid = row[car_pos]
+                cars[cid] = dict(zip(rec["cars_cols"], row))
+                yearly[cid] = changed.get(cid, [])
+            for cid in rec["removidos"]:
+                cars.pop(cid, None)
+                yearly.pop(cid, None)
+            params = rec["global_params"]
+        return cars, yearly, params
+
+    def load(self, version: int) -> Tuple[pd.DataFrame, pd.DataFrame, dict]:
+        """``(cars, yearly, global_params)`` da versão, com os tipos da leitura do SQLite."""
+        cars_map, yearly_map, params = self._state(version)
+        cars = pd.DataFrame(list(cars_map.values()), columns=_CARS_COLS)
+        cars = cars.drop(columns=[c for c in OPTIONAL_CAR_COLUMNS if cars[c].isna().all()])
+        yearly = pd.DataFrame([r for rows in yearly_map.values() for r in rows], columns=_YEARLY_COLS)
+        cars = cars.astype({c: t for c, t in _READ_DTYPES.items() if c in cars.columns})
+        yearly = yearly.astype({c: t for c, t in _READ_DTYPES.items() if c in yearly.columns})
+        return cars, yearly, params
+
+    def diff(self, old: int, new: int) -> pd.DataFrame:
+        """Carros adicionados, removidos e alterados (com as colunas alteradas) entre duas versões.
+
+        Parâmetros globais alterados aparecem com ``CarID`` vazio e ``Mudanca`` = ``parametro``.
+        """
+        cars_a, yearly_a, params_a = self._state(old)
+        cars_b, yearly_b, params_b = self._state(new)
+
+        def same(x, y):
+            return x == y or (x is None and y is None)
+
+        rows = []
+        for cid in cars_b:
+            if cid not in cars_a:
+                rows.append((cid, "adicionado", ""))
+                continue
+            cols = {c for c in _CARS_COLS if not same(cars_a[cid].get(c), cars_b[cid].get(c))}
+            by_year_a = {r["AnoOffset"]: r for r in yearly_a.get(cid, [])}
+            by_year_b = {r["AnoOffset"]: r for r in yearly_b.get(cid, [])}
+            if by_year_a.keys() != by_year_b.keys():
+                cols.add("AnoOffset")
+            for ano in by_year_a.keys() & by_year_b.keys():
+                cols.update(c for c in _YEARLY_COLS if not same(by_year_a[ano].get(c), by_year_b[ano].get(c)))
+            if cols:
+                rows.append((cid, "alterado", ", ".join(c for c in _CARS_COLS + _YEARLY_COLS if c in cols)))
+        rows.extend((cid, "removido", "") for cid in cars_a if cid not in cars_b)
+        rows.extend(("", "parametro", key) for key in sorted(params_a.keys() | params_b.keys())
+                    if params_a.get(key) != params_b.get(key))
+        return pd.DataFrame(rows, columns=DIFF_COLUMNS)
+
+    def restore(self, version: int) -> dict:
+        """Regrava o projeto com o conteúdo da versão, como uma nova versão do histórico."""
+        cars, yearly, params = self.load(version)
+        return self.save(cars, yearly, params, description=f"restaurado da versão {version}")
@@ -0,0 +1,191 @@
+"""Armazenamento colunar de projetos num único arquivo SQLite.
+
+O JSON de projeto (lista de dicionários por linha) continua sendo o formato de
+importação/exportação; para frotas grandes o projeto pode ser gravado num arquivo
+SQLite com esquema tipado e três tabelas (``cars``, ``yearly`` e ``global_params``):
+
+* leitura preguiçosa por carro (``load_project_sqlite(path, car_ids=[...])``);
+* gravação parcial: só carros cujo conteúdo mudou (hash por carro guardado em
+  ``cars._fingerprint``) têm suas linhas regravadas.
+
+Linhas carro/ano duplicadas não são representáveis (chave primária
+``(CarID, AnoOffset)``): a última prevalece.
+"""
+
+import json
+import sqlite3
+from contextlib import closing
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .fingerprint import car_fingerprints
+
+SCHEMA_VERSION = 3
+
+CARS_SCHEMA = {
+    "CarID": "TEXT PRIMARY KEY",
+    "Ano": "INTEGER",
+    "Marca": "TEXT",
+    "Modelo": "TEXT",
+    "Categoria": "TEXT",
+    "PrecoCompra": "REAL",
+    "MesCompra": "INTEGER",
+    "MesVenda": "INTEGER",
+    "TaxaFinanciamento_%": "REAL",
+    "PrazoFinanciamento": "INTEGER",
+    "Entrada_%": "REAL",
+    "Balao_%": "REAL",
+}
+# Colunas opcionais do cadastro (modelo mensal e financiamento por carro); omitidas na leitura quando vazias
+OPTIONAL_CAR_COLUMNS = ["MesCompra", "MesVenda", "TaxaFinanciamento_%", "PrazoFinanciamento", "Entrada_%", "Balao_%"]
+YEARLY_SCHEMA = {
+    "CarID": "TEXT NOT NULL",
+    "AnoOffset": "INTEGER NOT NULL",
+    "TaxaDepreciacao_%": "REAL",
+    "Juros_%_sobre_preco": "REAL",
+    "AnoCompra": "INTEGER",
+    "AnoVenda": "INTEGER",
+    "PrecoDiaria": "REAL",
+    "TaxaOcupacao_%": "REAL",
+    "Seguro_USD": "REAL",
+    "Manutencao_USD": "REAL",
+    "Sinistro_USD": "REAL",
+    "Combustivel_USD": "REAL",
+    "Estacionamento_USD": "REAL",
+}
+# Tipos pandas na leitura (inteiros que podem ser nulos viram float, como no JSON)
+_READ_DTYPES = {"CarID": str, "Ano": "Int64", "AnoOffset": "int64", "AnoCompra": float, "AnoVenda": float,
+                "MesCompra": float, "MesVenda": float, "PrazoFinanciamento": float}
+# Limite de parâmetros por consulta do SQLite
+_IN_CHUNK = 900
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS cars ("
+                 + ", ".join(f"{_q(c)} {t}" for c, t in CARS_SCHEMA.items())
+                 + ", _fingerprint TEXT)")
+    # Arquivos de versões anteriores não têm todas as colunas opcionais do cadastro
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(cars)")}
+    for col in OPTIONAL_CAR_COLUMNS:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE cars ADD COLUMN {_q(col)} {CARS_SCHEMA[col]}")
+    conn.execute("CREATE TABLE IF NOT EXISTS yearly ("
+                 + ", ".join(f"{_q(c)} {t}" for c, t in YEARLY_SCHEMA.items())
+                 + ", PRIMARY KEY (CarID, AnoOffset)) WITHOUT ROWID")
+    conn.execute("CREATE TABLE IF NOT EXISTS global_params (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+    return conn
+
+
+def _records(df: pd.DataFrame, schema: Dict[str, str]) -> List[tuple]:
+    """Linhas do DataFrame nas colunas do esquema, com NaN → NULL e tipos nativos do Python."""
+    data = df.reindex(columns=list(schema))
+    columns = []
+    for col in schema:
+        values = data[col].to_numpy(dtype=object)
+        values[pd.isna(values)] = None
+        columns.append(values.tolist())
+    return list(zip(*columns))
+
+
+def _normalize(df: pd.DataFrame, schema: Dict[str, str]) -> pd.DataFrame:
+    """Colunas do esquema com tipos canônicos (números em float64, texto em str), para o hash por carro
+    não depender de como o DataFrame foi lido (JSON, SQLite, editor)."""
+    data = df.reindex(columns=list(schema))
+    return pd.DataFrame({
+        c: (data[c].astype(str).where(data[c].notna(), None) if t.startswith("TEXT")
+            else pd.to_numeric(data[c], errors="coerce").astype(float))
+        for c, t in schema.items()
+    }, index=data.index)
+
+
+def _chunks(values: List[str]) -> Iterable[List[str]]:
+    for start in range(0, len(values), _IN_CHUNK):
+        yield values[start:start + _IN_CHUNK]
+
+
+def save_project_sqlite(path: str, cars: pd.DataFrame, yearly: pd.DataFrame, global_params: dict,
+                        timestamp: Optional[str] = None) -> Dict[str, int]:
+    """Grava o projeto, regravando só os carros novos/alterados e apagando os removidos.
+
+    Devolve contagens ``{"changed": ..., "removed": ..., "rows_written": ...}``.
+    """
+    cars_use = _normalize(cars.dropna(subset=["CarID"]), CARS_SCHEMA)
+    yearly_use = (_normalize(yearly.dropna(subset=["CarID"]), YEARLY_SCHEMA)
+                  if not yearly.empty and "CarID" in yearly.columns
+                  else _normalize(pd.DataFrame(columns=list(YEARLY_SCHEMA)), YEARLY_SCHEMA))
+    fps = car_fingerprints(cars_use, yearly_use, car_columns=None).astype(str)
+
+    with closing(_connect(path)) as conn, conn:
+        stored = dict(conn.execute("SELECT CarID, _fingerprint FROM cars").fetchall())
+        changed = [cid for cid, fp in fps.items() if stored.get(cid) != fp]
+        removed = [cid for cid in stored if cid not in fps.index]
+
+        for group in _chunks(changed + removed):
+            marks = ",".join("?" * len(group))
+            conn.execute(f"DELETE FROM yearly WHERE CarID IN ({marks})", group)
+            conn.execute(f"DELETE FROM cars WHERE CarID IN ({marks})", group)
+
+        changed_set = set(changed)
+        car_rows = cars_use[cars_use["CarID"].isin(changed_set)].assign(_fingerprint=lambda d: d["CarID"].map(fps))
+        yearly_rows = yearly_use[yearly_use["CarID"].isin(changed_set)]
+        cols = list(CARS_SCHEMA) + ["_fingerprint"]
+        conn.executemany(f"INSERT OR REPLACE INTO cars ({', '.join(map(_q, cols))}) VALUES ({','.join('?' * len(cols))})",
+                         _records(car_rows, {**CARS_SCHEMA, "_fingerprint": "TEXT"}))
+        conn.executemany(f"INSERT OR REPLACE INTO yearly ({', '.join(map(_q, YEARLY_SCHEMA))}) "
+                         f"VALUES ({','.join('?' * len(YEARLY_SCHEMA))})",
+                         _records(yearly_rows, YEARLY_SCHEMA))
+
+        # Parâmetros: substitui o conjunto inteiro (chave removida não volta na leitura)
+        conn.execute("DELETE FROM global_params")
+        conn.executemany("INSERT INTO global_params VALUES (?, ?)",
+                         [(k, json.dumps(v, default=str)) for k, v in (global_params or {}).items()])
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('timestamp', ?)",
+                     (timestamp or pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),))
+    return {"changed": len(changed), "removed": len(removed), "rows_written": len(yearly_rows)}
+
+
+def _read(conn: sqlite3.Connection, table: str, schema: Dict[str, str],
+          car_ids: Optional[List[str]]) -> pd.DataFrame:
+    cols = ", ".join(map(_q, schema))
+    order = " ORDER BY CarID, AnoOffset" if table == "yearly" else ""
+    if car_ids is None:
+        frames = [pd.read_sql_query(f"SELECT {cols} FROM {table}{order}", conn)]
+    else:
+        frames = [pd.read_sql_query(f"SELECT {cols} FROM {table} WHERE CarID IN ({','.join('?' * len(g))}){order}",
+                                    conn, params=g)
+                  for g in _chunks(list(car_ids))] or [pd.DataFrame(columns=list(schema))]
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    return df.astype({c: t for c, t in _READ_DTYPES.items() if c in df.columns})
+
+
+def load_project_sqlite(path: str, car_ids: Optional[Iterable[str]] = None) -> Tuple[pd.DataFrame, pd.DataFrame, dict]:
+    """Lê ``(cars, yearly, global_params)``; com ``car_ids`` carrega só esses carros."""
+    ids = None if car_ids is None else [str(c) for c in car_ids]
+    with closing(_connect(path)) as conn:
+        cars = _read(conn, "cars", CARS_SCHEMA, ids)
+        cars = cars.drop(columns=[c for c in OPTIONAL_CAR_COLUMNS if cars[c].isna().all()])
+        yearly = _read(conn, "yearly", YEARLY_SCHEMA, ids)
+        global_params = {k: json.loads(v) for k, v in conn.execute("SELECT key, value FROM global_params")}
+    return cars, yearly, global_params
+
+
+def list_car_ids(path: str) -> List[str]:
+    """CarIDs gravados, sem carregar as linhas anuais."""
+    with closing(_connect(path)) as conn:
+        return [r[0] for r in conn.execute("SELECT CarID FROM cars ORDER BY CarID")]
+
+
+def load_car(path: str, car_id: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Cadastro e linhas anuais de um único carro."""
+    cars, yearly, _ = load_project_sqlite(path, [car_id])
+    return cars, yearly
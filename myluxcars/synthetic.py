@@ -0,0 +1,68 @@
+"""Gerador determinístico de frotas sintéticas no formato de ``frota_myluxcars.json``.
+
+Usado pelos benchmarks (``benchmarks/``) para medir o custo de cada etapa com frotas
+de 10 a 100 mil carros. A mesma ``(n_cars, seed)`` gera sempre a mesma frota.
+"""
+
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from .core import YEARS, template_yearly_inputs
+
+# (Marca, Modelo, Categoria, preço de referência em US$) – inspirado na frota padrão
+CATALOG = [
+    ("Ford", "F-150 Raptor", "Pickup", 89_764),
+    ("Toyota", "Camry Hybrid SE", "Sedan", 35_000),
+    ("Toyota", "Grand Highlander Hybrid", "SUV Médio", 55_348),
+    ("Toyota", "Rav4 XLE", "SUV Médio", 36_684),
+    ("GMC", "Yukon XL Elevation", "SUV Premium", 89_764),
+    ("Chevrolet", "Suburban", "SUV Premium", 65_500),
+    ("Toyota", "Sienna XLE", "Van", 51_114),
+    ("Ford", "Mustang", "Esportivo/Conversivel", 33_946),
+]
+# Diária média por categoria (US$)
+DAILY_RATE = {"Pickup": 190.0, "Sedan": 110.0, "SUV Médio": 150.0, "SUV Premium": 230.0,
+              "Van": 170.0, "Esportivo/Conversivel": 160.0}
+
+
+def synthetic_fleet(n_cars: int, seed: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """``(cars, yearly)`` com ``n_cars`` carros e 6 linhas anuais por carro.
+
+    AnoCompra varia de 1 a 3 e AnoVenda de 2 anos após a compra até o fim do
+    horizonte (ou sem venda), de modo que máscaras de atividade e vendas sejam
+    exercitadas.
+    """
+    rng = np.random.default_rng(seed)
+    ids = [f"{i:06d}" for i in range(n_cars)]
+    model = rng.integers(0, len(CATALOG), n_cars)
+    marca, modelo, categoria, preco = (np.array([c[i] for c in CATALOG], dtype=object) for i in range(4))
+    cars = pd.DataFrame({
+        "CarID": ids,
+        "Ano": rng.integers(2023, 2027, n_cars),
+        "Marca": marca[model].astype(str),
+        "Modelo": modelo[model].astype(str),
+        "Categoria": categoria[model].astype(str),
+        "PrecoCompra": np.round(preco[model].astype(float) * rng.uniform(0.9, 1.1, n_cars)),
+    })
+
+    yearly = template_yearly_inputs(ids)
+    n_years = len(YEARS)
+    car_pos = np.repeat(np.arange(n_cars), n_years)
+    ano_compra = rng.choice([1, 2, 3], n_cars, p=[0.6, 0.25, 0.15])
+    ano_venda = np.minimum(ano_compra + rng.integers(2, 6, n_cars), n_years + 1).astype(float)
+    ano_venda[ano_venda > n_years] = np.nan  # sem venda dentro do horizonte
+    yearly["AnoCompra"] = ano_compra[car_pos]
+    yearly["AnoVenda"] = ano_venda[car_pos]
+
+    rows = len(yearly)
+    base_rate = np.array([DAILY_RATE[c] for c in cars["Categoria"]])
+    yearly["PrecoDiaria"] = np.round(base_rate[car_pos] * rng.uniform(0.85, 1.15, rows), 2)
+    yearly["TaxaOcupacao_%"] = np.round(rng.uniform(45, 80, rows), 1)
+    yearly["TaxaDepreciacao_%"] = np.round(yearly["TaxaDepreciacao_%"] * rng.uniform(0.8, 1.2, rows), 2)
+    price = cars["PrecoCompra"].to_numpy()[car_pos]
+    yearly["Seguro_USD"] = np.round(price * rng.uniform(0.02, 0.035, rows))
+    yearly["Manutencao_USD"] = np.round(rng.uniform(800, 2500, rows))
+    yearly["Sinistro_USD"] = np.round(rng.uniform(500, 2500, rows))
+    return cars, yearly
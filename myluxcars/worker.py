@@ -0,0 +1,224 @@
+"""Execução em segundo plano com progresso e cancelamento (jobs fora da thread do script).
+
+O Streamlit roda o script na thread da sessão: um cálculo pesado congela a página e
+uma edição nova não interrompe o cálculo já obsoleto. Com :class:`BackgroundRunner`
+o cálculo vira um :class:`Job` num pool de threads compartilhado pelo processo; o
+script só consulta o estado do job a cada rerun.
+
+- **Progresso**: o código de cálculo chama :func:`report_progress` entre blocos
+  (como ``stage`` do perfil, lê uma ``ContextVar``; fora de um job não faz nada).
+- **Cancelamento**: é cooperativo. :meth:`Job.cancel` marca o job e o próximo
+  :func:`report_progress` (ou :func:`check_cancelled`) levanta :class:`Cancelled`.
+  :meth:`BackgroundRunner.submit` com outra chave cancela o job anterior.
+- **Último resultado**: o runner guarda o resultado do último job concluído, para a
+  página continuar mostrando algo até o novo ficar pronto.
+- **Perfil**: se quem submete tem um :class:`~myluxcars.profiling.Profile` ativo, o job
+  cronometra as etapas num perfil próprio (``Job.profile``), entregue por
+  :meth:`BackgroundRunner.take_profiles` quando o job termina – um job que dura mais
+  que o rerun não escreve no perfil do rerun, já encerrado.
+
+O pool é de threads: o numpy libera o GIL nas operações pesadas, e resultados
+(DataFrames) e progresso não precisam atravessar processos. Simulações que já usam
+``ProcessPoolExecutor`` (Monte Carlo, otimizador) continuam usando dentro do job.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+from . import profiling
+
+_current: ContextVar[Optional["Job"]] = ContextVar("myluxcars_job", default=None)
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class Cancelled(Exception):
+    """O job foi cancelado (ex.: substituído por outro com entradas novas)."""
+
+
+def shared_executor() -> ThreadPoolExecutor:
+    """Pool de threads do processo (compartilhado por todas as sessões do app)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                                           thread_name_prefix="myluxcars-job")
+        return _executor
+
+
+def report_progress(fraction: float, message: Optional[str] = None):
+    """Informa o progresso (0 a 1) do job atual; levanta :class:`Cancelled` se ele foi cancelado."""
+    job = _current.get()
+    if job is None:
+        return
+    job.progress = min(max(float(fraction), 0.0), 1.0)
+    if message is not None:
+        job.message = message
+    if job._cancel.is_set():
+        raise Cancelled(job.key)
+
+
+def check_cancelled():
+    """Levanta :class:`Cancelled` se o job atual foi cancelado (nada fora de um job)."""
+    job = _current.get()
+    if job is not None and job._cancel.is_set():
+        raise Cancelled(job.key)
+
+
+def progress_map(fn: Callable, *iterables, executor: Optional[Executor] = None,
+                 message: Optional[str] = None) -> list:
+    """``list(map(fn, *iterables))`` informando o progresso a cada item concluído.
+
+    Com ``executor`` (ex.: ``ProcessPoolExecutor``) os itens rodam em paralelo; se o job
+    for cancelado, os itens ainda não iniciados são descartados.
+    """
+    items = list(zip(*iterables))
+    if executor is None:
+        out = []
+        for i, item in enumerate(items):
+            check_cancelled()
+            out.append(fn(*item))
+            report_progress((i + 1) / len(items), message)
+        return out
+    futures = [executor.submit(fn, *item) for item in items]
+    try:
+        out = []
+        for i, future in enumerate(futures):
+            out.append(future.result())
+            report_progress((i + 1) / len(items), message)
+        return out
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+class Job:
+    """Um cálculo submetido ao pool: estado, progresso e resultado."""
+
+    def __init__(self, key: Hashable, label: str = ""):
+        self.key = key
+        self.label = label
+        self.progress = 0.0
+        self.message = ""
+        self.submitted = time.time()
+        self.finished: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.profile: Optional[profiling.Profile] = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def running(self) -> bool:
+        return not self._done.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.done and isinstance(self.error, Cancelled)
+
+    @property
+    def ok(self) -> bool:
+        return self.done and self.error is None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera o job terminar (até ``timeout`` segundos); devolve se terminou."""
+        return self._done.wait(timeout)
+
+    def __repr__(self) -> str:
+        state = "rodando" if self.running else ("cancelado" if self.cancelled else
+                                                "erro" if self.error is not None else "ok")
+        return f"Job({self.label or self.key!r}, {state}, {self.progress:.0%})"
+
+
+class BackgroundRunner:
+    """Um "slot" de cálculo em segundo plano: no máximo um job vigente e o último resultado.
+
+    Use um runner por cálculo independente (ex.: tabelas, Monte Carlo, exportação) e
+    guarde-o no ``st.session_state`` da sessão.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None):
+        self._executor = executor
+        self._lock = threading.Lock()
+        self.job: Optional[Job] = None
+        self._last: Optional[Job] = None
+        self._profiles: List[profiling.Profile] = []
+
+    def submit(self, key: Hashable, fn: Callable, *args, label: str = "", restart: bool = False,
+               **kwargs) -> Job:
+        """Agenda ``fn(*args, **kwargs)`` sob ``key``.
+
+        Se o job vigente já é da mesma ``key`` (rodando, concluído sem erro ou cancelado
+        pelo usuário), ele é devolvido sem recalcular – a não ser com ``restart=True``;
+        senão o vigente é cancelado e um novo é agendado.
+        """
+        with self._lock:
+            job = self.job
+            if not restart and job is not None and job.key == key and (job.running or job.ok or job.cancelled):
+                return job
+            if job is not None and job.running:
+                job.cancel()
+            job = self.job = Job(key, label)
+        # O job roda numa cópia do contexto de quem submete; ``_run`` troca o perfil ativo
+        # (se houver) por um perfil só do job
+        (self._executor or shared_executor()).submit(copy_context().run, self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn: Callable, args: tuple, kwargs: dict):
+        token = _current.set(job)
+        if profiling.enabled():
+            job.profile = profiling.Profile(label=job.label or str(job.key)).start()
+        try:
+            check_cancelled()
+            job.result = fn(*args, **kwargs)
+            job.progress = 1.0
+            with self._lock:
+                # Um job substituído que termine depois do seguinte não sobrescreve o resultado mais novo
+                if self._last is None or job.submitted >= self._last.submitted:
+                    self._last = job
+        except BaseException as e:
+            job.error = e
+        finally:
+            if job.profile is not None:
+                job.profile.stop()
+                if isinstance(job.error, Cancelled):
+                    job.profile.label += " (cancelado)"
+                with self._lock:
+                    self._profiles.append(job.profile)
+            _current.reset(token)
+            job.finished = time.time()
+            job._done.set()
+
+    def cancel(self):
+        """Cancela o job vigente (se estiver rodando)."""
+        with self._lock:
+            if self.job is not None and self.job.running:
+                self.job.cancel()
+
+    def take_profiles(self) -> List[profiling.Profile]:
+        """Perfis dos jobs terminados desde a última chamada (cada perfil é entregue uma vez)."""
+        with self._lock:
+            profiles, self._profiles = self._profiles, []
+        return profiles
+
+    def last(self) -> Optional[Tuple[Hashable, Any]]:
+        """``(key, resultado)`` do último job concluído com sucesso, ou ``None``."""
+        with self._lock:
+            return None if self._last is None else (self._last.key, self._last.result)
+
+    def result_for(self, key: Hashable, default: Any = None) -> Any:
+        """Resultado do último job concluído se ele for da ``key`` pedida."""
+        last = self.last()
+        return last[1] if last is not None and last[0] == key else default
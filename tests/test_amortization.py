@@ -0,0 +1,70 @@
+"""Tabela de amortização (Price com entrada e balão) e o modo ``amortizacao`` do motor."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from myluxcars.amortization import loan_flows, loan_terms, unit_schedule
+from myluxcars.core import GlobalParams, compute_per_year_tables
+from myluxcars.synthetic import synthetic_fleet
+
+
+@pytest.mark.parametrize("rate", [0.0, 0.08])
+@pytest.mark.parametrize("balloon", [0.0, 0.3])
+@pytest.mark.parametrize("periods_per_year", [1, 12])
+def test_unit_schedule_repays_the_loan(rate, balloon, periods_per_year):
+    interest, principal, balance = unit_schedule(rate, 4, balloon, periods_per_year)
+    assert len(principal) == 4 * periods_per_year
+    assert principal.sum() == pytest.approx(1.0, rel=1e-12)
+    assert balance[0] == pytest.approx(1.0)
+    np.testing.assert_allclose(balance[1:], balance[:-1] - principal[:-1], atol=1e-12)
+    # Parcela constante (fora o balão na última)
+    payment = interest + principal
+    payment[-1] -= balloon
+    np.testing.assert_allclose(payment, payment[0], rtol=1e-12)
+
+
+def test_unit_schedule_is_read_only_and_empty_without_term():
+    interest, _, _ = unit_schedule(0.08, 3)
+    with pytest.raises(ValueError):
+        interest[0] = 1.0
+    assert all(len(arr) == 0 for arr in unit_schedule(0.08, 0))
+
+
+def test_loan_terms_fall_back_to_global_params():
+    cars = pd.DataFrame({"TaxaFinanciamento_%": [12.0, np.nan], "PrazoFinanciamento": [np.nan, 3],
+                         "Entrada_%": [20.0, np.nan]})
+    terms = loan_terms(cars, GlobalParams(loan_rate=0.07, financing_term=5, balloon_rate=0.1))
+    np.testing.assert_allclose(terms["rate"], [0.12, 0.07])
+    np.testing.assert_array_equal(terms["term"], [5, 3])
+    np.testing.assert_allclose(terms["entrada"], [0.2, 0.0])
+    np.testing.assert_allclose(terms["balao"], [0.1, 0.1])
+
+
+def test_loan_flows_down_payment_and_payoff_on_sale():
+    terms = {"rate": np.array(0.08), "term": np.array(5), "entrada": np.array(0.2), "balao": np.array(0.0)}
+    k = np.arange(4, dtype=float)
+    owned = np.array([True, True, True, False])
+    sold = np.array([False, False, False, True])
+    flows = loan_flows(k, owned, sold, np.array(100_000.0), terms)
+    assert flows["Entrada"].tolist() == [20_000.0, 0.0, 0.0, 0.0]
+    # Juros só enquanto o carro está na frota; o saldo é quitado no ano da venda
+    assert flows["JurosPL"][3] == 0.0
+    assert flows["Principal"].sum() == pytest.approx(80_000.0)
+
+
+def test_engine_pays_off_every_sold_car():
+    cars, yearly = synthetic_fleet(300, seed=5)
+    sold = yearly.groupby("CarID")["AnoVenda"].first().dropna().index
+    cars = cars[cars["CarID"].isin(sold)]
+    cars["PrazoFinanciamento"] = np.where(np.arange(len(cars)) % 2 == 0, 2, np.nan)
+    params = GlobalParams(loan_mode="amortizacao", loan_rate=0.09, financing_term=5,
+                          down_payment_rate=0.15, balloon_rate=0.2)
+    cash = compute_per_year_tables(cars, yearly, params)["Cash"]
+    assert (cash["Principal"].sum() + cash["Entrada"].sum()) == pytest.approx(cars["PrecoCompra"].sum(), rel=1e-9)
+
+
+def test_legacy_mode_has_no_down_payment():
+    cars, yearly = synthetic_fleet(50, seed=2)
+    cash = compute_per_year_tables(cars, yearly, GlobalParams())["Cash"]
+    assert "Entrada" not in cash.columns or (cash["Entrada"] == 0).all()
@@ -0,0 +1,139 @@
+"""Paridade do motor vetorizado com o cálculo original (``apply``/``iterrows``) do ``main.py``."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from myluxcars.core import (CASH_COLUMNS, FINANCING_TERM_TO_ANNUAL_INSTALLMENT, PNL_COLUMNS, YEARS,
+                            GlobalParams, compute_per_year_tables)
+from myluxcars.project import load_project
+from myluxcars.synthetic import synthetic_fleet
+
+BUNDLED_PROJECT = os.path.join(os.path.dirname(__file__), os.pardir, "frota_myluxcars.json")
+
+
+def legacy_tables(cars: pd.DataFrame, yearly: pd.DataFrame, params: GlobalParams):
+    """``compute_per_year_tables`` anterior à vetorização, com os globais da barra lateral em ``params``."""
+    horizon_years = params.horizon_years
+    y = yearly[yearly["AnoOffset"] <= horizon_years]
+    cars_use = cars.dropna(subset=["CarID"]).copy()
+    y = y.merge(cars_use, on="CarID", how="inner", suffixes=("_Y", "_C"))
+
+    def active_in_year(row):
+        ano = row["AnoOffset"]
+        ano_compra = row.get("AnoCompra", 1)
+        ano_venda = row.get("AnoVenda", np.nan)
+        if pd.isna(ano_venda):
+            return ano >= ano_compra
+        return (ano >= ano_compra) and (ano < ano_venda)
+
+    y["IsActive"] = y.apply(active_in_year, axis=1)
+    y["ReceitaBruta"] = np.where(y["IsActive"], y["PrecoDiaria"] * (y["TaxaOcupacao_%"] / 100.0) * 365.0, 0.0)
+    y["Upsell"] = y["ReceitaBruta"] * params.upsell_rate
+    y["Deducoes"] = (y["ReceitaBruta"] + y["Upsell"]) * y["AnoOffset"].map(params.deductions_rate_by_year)
+    y["ReceitaLiquida"] = (y["ReceitaBruta"] + y["Upsell"]) - y["Deducoes"]
+    for col in ["Seguro_USD", "Manutencao_USD", "Sinistro_USD", "Combustivel_USD", "Estacionamento_USD"]:
+        y[col.replace("_USD", "")] = np.where(y["IsActive"], y[col], 0.0)
+    y["Depreciacao"] = np.where(y["IsActive"], (y["TaxaDepreciacao_%"] / 100.0) * y["PrecoCompra"], 0.0)
+
+    grouped = y.groupby("AnoOffset").agg({
+        "ReceitaBruta": "sum", "Upsell": "sum", "Deducoes": "sum", "ReceitaLiquida": "sum",
+        "Seguro": "sum", "Manutencao": "sum", "Sinistro": "sum", "Combustivel": "sum", "Estacionamento": "sum",
+        "Depreciacao": "sum"
+    }).rename_axis("Ano")
+    grouped["CustoFrotaTotal"] = grouped[["Seguro", "Manutencao", "Sinistro", "Combustivel", "Estacionamento",
+                                          "Depreciacao"]].sum(axis=1)
+    grouped["LucroBruto"] = grouped["ReceitaLiquida"] - grouped["CustoFrotaTotal"]
+    grouped["Equipe"] = grouped.index.map(params.team_cost_by_year).astype(float)
+    grouped["Marketing"] = grouped["ReceitaLiquida"] * grouped.index.map(params.marketing_rate_by_year).astype(float)
+    grouped["Plataforma"] = grouped.index.map(params.platform_cost_by_year).astype(float)
+    grouped["OutrosFixos"] = grouped.index.map(params.other_fixed_by_year).astype(float)
+    grouped["EBITDA"] = grouped["LucroBruto"] - (grouped["Equipe"] + grouped["Marketing"] + grouped["Plataforma"]
+                                                 + grouped["OutrosFixos"])
+    y["JurosPL"] = np.where(y["IsActive"], (y["Juros_%_sobre_preco"] / 100.0) * y["PrecoCompra"], 0.0)
+    grouped["Juros"] = y.groupby("AnoOffset")["JurosPL"].sum()
+    grouped["EBT"] = grouped["EBITDA"] - grouped["Juros"]
+    grouped["Impostos"] = np.where(grouped["EBT"] > 0, grouped["EBT"] * params.tax_rate, 0.0)
+    grouped["LucroLiquido"] = grouped["EBT"] - grouped["Impostos"]
+    pnl_table = grouped.copy()
+
+    cash = pnl_table[["LucroLiquido"]].copy()
+    cash["Depreciacao_add"] = pnl_table["Depreciacao"]
+    annual_install_pct = FINANCING_TERM_TO_ANNUAL_INSTALLMENT[params.financing_term]
+    y["ParcelaTotal"] = np.where(y["IsActive"], annual_install_pct * y["PrecoCompra"], 0.0)
+    y["Principal"] = np.maximum(y["ParcelaTotal"] - y["JurosPL"], 0.0)
+    cash["Principal"] = y.groupby("AnoOffset")["Principal"].sum()
+
+    book_vals = []
+    for _, sub in y.sort_values(["AnoOffset"]).groupby("CarID"):
+        preco = sub["PrecoCompra"].iloc[0]
+        deprec_acc = 0.0
+        for _, r in sub.iterrows():
+            deprec_acc += (r["TaxaDepreciacao_%"] / 100.0) * preco if r["IsActive"] else 0.0
+            if not pd.isna(r.get("AnoVenda")) and r["AnoOffset"] == r["AnoVenda"]:
+                book_vals.append((r.name, max(preco - deprec_acc, 0.0)))
+    y["VendaValorContabil"] = y.index.map(pd.Series(dict(book_vals), dtype=float))
+    cash["VendaFrota"] = y.groupby("AnoOffset")["VendaValorContabil"].sum(min_count=1).fillna(0.0)
+    cash["CaixaFinal"] = cash["LucroLiquido"] + cash["Depreciacao_add"] - cash["Principal"] + cash["VendaFrota"]
+
+    return {"PnL": pnl_table.loc[pnl_table.index <= horizon_years],
+            "Cash": cash.loc[cash.index <= horizon_years]}
+
+
+def assert_parity(cars, yearly, params):
+    expected = legacy_tables(cars, yearly, params)
+    result = compute_per_year_tables(cars, yearly, params)
+    for key, columns in (("PnL", PNL_COLUMNS), ("Cash", CASH_COLUMNS)):
+        pd.testing.assert_frame_equal(result[key][columns], expected[key][columns],
+                                      rtol=1e-9, check_dtype=False, check_index_type=False)
+
+
+def random_fleet(seed: int):
+    """Frota sintética com AnoCompra/AnoVenda variando por linha, vendas ausentes e linhas faltando."""
+    rng = np.random.default_rng(seed)
+    cars, yearly = synthetic_fleet(80, seed=seed)
+    rows = len(yearly)
+    yearly["AnoCompra"] = np.where(rng.random(rows) < 0.2, rng.integers(1, 5, rows), yearly["AnoCompra"])
+    venda = yearly["AnoCompra"] + rng.integers(0, 5, rows)
+    yearly["AnoVenda"] = np.where(rng.random(rows) < 0.3, np.nan, venda.astype(float))
+    yearly["Juros_%_sobre_preco"] = np.round(rng.uniform(0, 8, rows), 2)
+    yearly["Combustivel_USD"] = np.round(rng.uniform(0, 1500, rows))
+    yearly = yearly[rng.random(rows) > 0.15].reset_index(drop=True)
+    # Carros no cadastro sem linhas anuais e linhas de carros fora do cadastro não entram
+    cars = pd.concat([cars, pd.DataFrame({"CarID": ["sem-linhas"], "PrecoCompra": [50_000.0]})], ignore_index=True)
+    yearly.loc[yearly.index[:6], "CarID"] = "fora-do-cadastro"
+    return cars, yearly
+
+
+def random_params(seed: int, horizon_years: int, financing_term: int) -> GlobalParams:
+    rng = np.random.default_rng(seed)
+    return GlobalParams(
+        horizon_years=horizon_years,
+        financing_term=financing_term,
+        upsell_rate=float(rng.uniform(0, 0.1)),
+        tax_rate=float(rng.uniform(0.1, 0.35)),
+        deductions_rate_by_year={y: float(rng.uniform(0.05, 0.15)) for y in YEARS},
+        marketing_rate_by_year={y: float(rng.uniform(0.02, 0.1)) for y in YEARS},
+        team_cost_by_year={y: float(rng.uniform(0, 200_000)) for y in YEARS},
+        platform_cost_by_year={y: float(rng.uniform(0, 30_000)) for y in YEARS},
+        other_fixed_by_year={y: float(rng.uniform(0, 50_000)) for y in YEARS},
+    )
+
+
+@pytest.mark.parametrize("financing_term", [3, 4, 5])
+@pytest.mark.parametrize("horizon_years", [3, 4, 5, 6])
+def test_bundled_project(horizon_years, financing_term):
+    cars, yearly, global_params = load_project(BUNDLED_PROJECT)
+    params = GlobalParams.from_dict(global_params)
+    params.horizon_years, params.financing_term = horizon_years, financing_term
+    assert_parity(cars, yearly, params)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("financing_term", [3, 4, 5])
+@pytest.mark.parametrize("horizon_years", [3, 4, 5, 6])
+def test_random_fleets(seed, horizon_years, financing_term):
+    cars, yearly = random_fleet(seed)
+    assert_parity(cars, yearly, random_params(seed, horizon_years, financing_term))
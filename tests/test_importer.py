@@ -0,0 +1,133 @@
+"""Importação em massa: validação por linha, erros x avisos, tipos compactos e paridade do cálculo."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from myluxcars.core import GlobalParams, compute_per_year_tables
+from myluxcars.importer import (detect_mapping, import_table, merge_import, validate, validate_project)
+from myluxcars.synthetic import synthetic_fleet
+
+
+@pytest.fixture
+def fleet():
+    return synthetic_fleet(120, seed=4)
+
+
+def write(df: pd.DataFrame, path, fmt: str):
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        pytest.importorskip("openpyxl")
+        df.to_excel(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "xlsx"])
+def test_imported_fleet_gives_the_same_tables(tmp_path, fleet, fmt):
+    cars, yearly = fleet
+    cars_result = import_table(write(cars, tmp_path / f"cars.{fmt}", fmt), "cars", chunksize=50)
+    yearly_result = import_table(write(yearly, tmp_path / f"yearly.{fmt}", fmt), "yearly", chunksize=100)
+    assert cars_result.error_count == yearly_result.error_count == 0
+    assert cars_result.rows_imported == len(cars) and yearly_result.rows_imported == len(yearly)
+    for horizon in (3, 6):
+        params = GlobalParams(horizon_years=horizon)
+        expected = compute_per_year_tables(cars, yearly, params)
+        result = compute_per_year_tables(cars_result.data, yearly_result.data, params)
+        for key in ("PnL", "Cash"):
+            pd.testing.assert_frame_equal(result[key], expected[key], rtol=1e-12, check_dtype=False,
+                                          check_index_type=False)
+
+
+def test_compact_dtypes_keep_rates_and_money_exact(tmp_path, fleet):
+    _, yearly = fleet
+    data = import_table(write(yearly, tmp_path / "yearly.csv", "csv"), "yearly").data
+    assert isinstance(data["CarID"].dtype, pd.CategoricalDtype)
+    assert data["AnoOffset"].dtype == "int8"
+    assert data["AnoCompra"].dtype == "float32"
+    for col in ("TaxaOcupacao_%", "TaxaDepreciacao_%", "PrecoDiaria", "Seguro_USD"):
+        assert data[col].dtype == "float64"
+        np.testing.assert_array_equal(data[col].to_numpy(), yearly[col].to_numpy(dtype=float))
+
+
+def test_errors_drop_rows_and_warnings_keep_them(tmp_path):
+    csv = tmp_path / "yearly.csv"
+    csv.write_text(
+        "Veiculo,Periodo,Diaria,Ocupacao,AnoVenda\n"
+        "a,1,100,50,7\n"        # venda depois do horizonte: aviso
+        "a,2,abc,50,\n"         # não numérico: erro
+        "b,1,-5,50,\n"          # negativo: erro
+        "b,1.5,100,50,\n"       # AnoOffset não inteiro: erro
+        "a,1,100,50,\n"         # CarID/AnoOffset duplicado: erro
+        "c,3,120,150,\n",       # ocupação acima de 100%: erro
+        encoding="utf-8",
+    )
+    result = import_table(str(csv), "yearly", chunksize=2)
+    assert result.mapping == {"Veiculo": "CarID", "Periodo": "AnoOffset", "Diaria": "PrecoDiaria",
+                              "Ocupacao": "TaxaOcupacao_%", "AnoVenda": "AnoVenda"}
+    assert result.rows_read == 6
+    assert result.data["CarID"].astype(str).tolist() == ["a"]
+    assert result.data["AnoVenda"].tolist() == [7.0]
+    assert (result.error_count, result.warning_count) == (5, 1)
+    levels = result.errors.set_index("Linha")["Nivel"]
+    assert levels[1] == "aviso" and (levels.drop(1) == "erro").all()
+
+
+def test_error_report_is_capped(tmp_path):
+    csv = tmp_path / "cars.csv"
+    csv.write_text("CarID,PrecoCompra\n" + "".join(f"c{i},-1\n" for i in range(30)), encoding="utf-8")
+    result = import_table(str(csv), "cars", chunksize=7, max_errors=10)
+    assert result.error_count == 30
+    assert len(result.errors) == 10
+    assert result.rows_imported == 0
+
+
+def test_missing_required_column_is_rejected(tmp_path):
+    csv = tmp_path / "cars.csv"
+    csv.write_text("Marca,Modelo\nFord,Ka\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="obrigatórias"):
+        import_table(str(csv), "cars")
+
+
+def test_detect_mapping_ignores_accents_and_case():
+    mapping = detect_mapping(["Código", "ID Veículo", "Preço de compra", "SEGURO"], "cars")
+    assert mapping == {"ID Veículo": "CarID"}
+    assert detect_mapping(["Ocupação", "Manutenção"], "yearly") == {"Ocupação": "TaxaOcupacao_%",
+                                                                    "Manutenção": "Manutencao_USD"}
+
+
+def test_validate_project_keeps_values_the_model_accepts(fleet):
+    cars, yearly = fleet
+    yearly = yearly.copy()
+    yearly.loc[0, "AnoVenda"] = 9
+    yearly.loc[1, "TaxaOcupacao_%"] = 120.0
+    yearly.loc[2, "CarID"] = None
+    cars_ok, yearly_ok, errors = validate_project(cars, yearly)
+    assert len(cars_ok) == len(cars)
+    assert len(yearly_ok) == len(yearly) - 1
+    assert errors["Nivel"].value_counts().to_dict() == {"aviso": 2, "erro": 1}
+    assert (errors["Tabela"] == "yearly").all()
+
+
+def test_validate_counts_duplicates_across_chunks():
+    seen = set()
+    first = pd.DataFrame({"CarID": ["a", "b"], "PrecoCompra": [1.0, 2.0]})
+    validate(first, "cars", seen=seen)
+    ok, errors = validate(pd.DataFrame({"CarID": ["b", "c"], "PrecoCompra": [3.0, 4.0]}), "cars",
+                          first_row=3, seen=seen)
+    assert ok["CarID"].tolist() == ["c"]
+    assert errors[["Linha", "Erro"]].values.tolist() == [[3, "CarID duplicado"]]
+
+
+def test_merge_import_replaces_matching_cars(fleet):
+    cars, yearly = fleet
+    new_cars = cars.iloc[:2].assign(PrecoCompra=1.0)
+    new_yearly = yearly[yearly["CarID"] == cars["CarID"].iloc[0]].iloc[:3]
+    merged_cars, merged_yearly = merge_import(cars, yearly, new_cars, new_yearly)
+    assert len(merged_cars) == len(cars)
+    assert (merged_cars.set_index("CarID").loc[new_cars["CarID"], "PrecoCompra"] == 1.0).all()
+    assert len(merged_yearly) == len(yearly) - 3
+    replaced_cars, replaced_yearly = merge_import(cars, yearly, new_cars, replace=True)
+    assert len(replaced_cars) == 2 and replaced_yearly.empty
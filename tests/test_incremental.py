@@ -0,0 +1,112 @@
+"""Avaliador incremental: mesmo resultado que o cálculo completo após cada edição."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from myluxcars.core import GlobalParams, compute_per_year_tables
+from myluxcars.incremental import IncrementalEvaluator, changed_car_ids
+from myluxcars.synthetic import synthetic_fleet
+
+
+def assert_matches_full(evaluator, cars, yearly, params):
+    result = evaluator.evaluate(cars, yearly, params)
+    expected = compute_per_year_tables(cars, yearly, params)
+    for key in ("PnL", "Cash"):
+        pd.testing.assert_frame_equal(result[key], expected[key], rtol=1e-9, check_dtype=False)
+
+
+@pytest.fixture
+def fleet():
+    return synthetic_fleet(200, seed=11)
+
+
+@pytest.fixture
+def evaluator():
+    # min_rows=0: o caminho incremental também para a frota pequena do teste
+    return IncrementalEvaluator(min_rows=0)
+
+
+def test_single_cell_edit_recomputes_one_car(fleet, evaluator):
+    cars, yearly = fleet
+    params = GlobalParams()
+    assert_matches_full(evaluator, cars, yearly, params)
+    assert evaluator.last_dirty == len(cars)
+
+    edited = yearly.copy()
+    edited.loc[edited.index[7], "PrecoDiaria"] += 25.0
+    assert_matches_full(evaluator, cars, edited, params)
+    assert evaluator.last_dirty == 1
+
+    assert_matches_full(evaluator, cars, edited, params)
+    assert evaluator.last_dirty == 0
+
+
+def test_reordered_rows_are_aligned_by_index(fleet, evaluator):
+    cars, yearly = fleet
+    params = GlobalParams()
+    evaluator.evaluate(cars, yearly, params)
+    # Como o app com filtro por CarID: linhas do carro filtrado primeiro, depois o resto
+    view = yearly[yearly["CarID"] == cars["CarID"].iloc[5]].copy()
+    view["TaxaOcupacao_%"] = 90.0
+    edited = pd.concat([view, yearly[~yearly.index.isin(view.index)]])
+    assert_matches_full(evaluator, cars, edited, params)
+    assert evaluator.last_dirty == 1
+
+
+def test_add_remove_and_rename_cars(fleet, evaluator):
+    cars, yearly = fleet
+    params = GlobalParams(horizon_years=5)
+    assert_matches_full(evaluator, cars, yearly, params)
+
+    removed = cars.iloc[1:]
+    assert_matches_full(evaluator, removed, yearly, params)
+
+    renamed = removed.copy()
+    renamed.loc[renamed.index[0], "CarID"] = "novo"
+    assert_matches_full(evaluator, renamed, yearly, params)
+
+    fewer_rows = yearly[yearly["AnoOffset"] != 3]
+    assert_matches_full(evaluator, renamed, fewer_rows, params)
+
+    price = renamed.copy()
+    price.loc[price.index[10], "PrecoCompra"] *= 1.5
+    assert_matches_full(evaluator, price, fewer_rows, params)
+
+    # Índice renumerado: as linhas não se alinham mais, e o avaliador cai nos hashes
+    assert_matches_full(evaluator, price, fewer_rows.reset_index(drop=True).iloc[::-1], params)
+
+
+def test_in_place_edit_after_evaluate_is_detected(fleet, evaluator):
+    cars, yearly = fleet
+    params = GlobalParams()
+    yearly = yearly.copy()
+    evaluator.evaluate(cars, yearly, params)
+    yearly.loc[yearly.index[3], "Seguro_USD"] = 99_999.0
+    assert_matches_full(evaluator, cars, yearly, params)
+    assert evaluator.last_dirty == 1
+
+
+def test_financing_change_resets_cache(fleet, evaluator):
+    cars, yearly = fleet
+    assert_matches_full(evaluator, cars, yearly, GlobalParams())
+    assert_matches_full(evaluator, cars, yearly, GlobalParams(loan_mode="amortizacao", loan_rate=0.07))
+    assert evaluator.last_dirty == len(cars)
+
+
+def test_small_fleet_uses_full_computation(fleet):
+    cars, yearly = fleet
+    evaluator = IncrementalEvaluator()
+    assert_matches_full(evaluator, cars, yearly, GlobalParams())
+    assert evaluator.last_dirty == 0
+
+
+def test_changed_car_ids():
+    old = pd.DataFrame({"CarID": ["a", "b", "c"], "x": [1.0, np.nan, 3.0]})
+    assert changed_car_ids(old.copy(), old) == set()
+    new = old.assign(x=[1.0, np.nan, 4.0])
+    assert changed_car_ids(new, old) == {"c"}
+    assert changed_car_ids(new.iloc[[2, 0]], old) == {"b", "c"}
+    assert changed_car_ids(old.assign(CarID=["a", "z", "c"]), old) == {"b", "z"}
+    assert changed_car_ids(old.set_index(pd.Index([0, 0, 1])), old) is None
+    assert changed_car_ids(old, None) is None
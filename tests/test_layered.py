@@ -0,0 +1,84 @@
+"""Entradas anuais em camadas: ida e volta densa → camadas → densa."""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from myluxcars.core import GlobalParams, compute_per_year_tables
+from myluxcars.layered import LayeredYearly
+from myluxcars.synthetic import synthetic_fleet
+
+
+def _sorted(yearly: pd.DataFrame) -> pd.DataFrame:
+    out = yearly.assign(CarID=yearly["CarID"].astype(str)).sort_values(["CarID", "AnoOffset"])
+    return out.reset_index(drop=True)
+
+
+@pytest.fixture
+def fleet_with_gaps():
+    """Frota sintética com anos faltando em alguns carros e um carro sem nenhuma linha anual."""
+    cars, yearly = synthetic_fleet(60, seed=3)
+    rng = np.random.default_rng(3)
+    drop = rng.random(len(yearly)) < 0.15
+    drop |= (yearly["CarID"] == cars["CarID"].iloc[0]).to_numpy()
+    return cars, yearly[~drop].reset_index(drop=True)
+
+
+def test_round_trip_keeps_only_original_rows(fleet_with_gaps):
+    cars, yearly = fleet_with_gaps
+    layers = LayeredYearly.from_dense(yearly, cars)
+    assert len(layers.missing) == len(cars) * 6 - len(yearly)
+
+    dense = layers.to_dense(cars)
+    expected = _sorted(yearly)
+    pd.testing.assert_frame_equal(_sorted(dense)[expected.columns], expected, check_dtype=False)
+
+
+def test_round_trip_through_json(fleet_with_gaps):
+    cars, yearly = fleet_with_gaps
+    layers = LayeredYearly.from_dict(json.loads(json.dumps(LayeredYearly.from_dense(yearly, cars).to_dict())))
+    assert len(layers.to_dense(cars)) == len(yearly)
+
+
+def test_layers_give_same_tables_as_dense(fleet_with_gaps):
+    cars, yearly = fleet_with_gaps
+    params = GlobalParams(horizon_years=5)
+    expected = compute_per_year_tables(cars, yearly, params)
+    result = compute_per_year_tables(cars, LayeredYearly.from_dense(yearly, cars), params)
+    for key in ("PnL", "Cash"):
+        pd.testing.assert_frame_equal(result[key], expected[key], rtol=1e-9)
+
+
+def test_unknown_car_gets_every_year(fleet_with_gaps):
+    cars, yearly = fleet_with_gaps
+    layers = LayeredYearly.from_dense(yearly, cars)
+    new_car = pd.DataFrame({"CarID": ["novo"], "Categoria": [cars["Categoria"].iloc[1]], "PrecoCompra": [50_000.0]})
+    dense = layers.to_dense(new_car, horizon_years=4)
+    assert dense["AnoOffset"].tolist() == [1, 2, 3, 4]
+
+
+def test_category_defaults_follow_the_year():
+    """Curvas por Categoria que mudam ano a ano viram defaults, não overrides."""
+    cars, yearly = synthetic_fleet(200, seed=8)
+    curve = {"Pickup": [20.0, 15.0, 12.0, 10.0, 9.0, 8.0], "Sedan": [25.0, 18.0, 14.0, 11.0, 9.0, 7.0]}
+    categoria = yearly["CarID"].map(cars.set_index("CarID")["Categoria"])
+    for cat, rates in curve.items():
+        sel = categoria == cat
+        yearly.loc[sel, "TaxaDepreciacao_%"] = yearly.loc[sel, "AnoOffset"].map(dict(zip(range(1, 7), rates)))
+        yearly.loc[sel, "Manutencao_USD"] = yearly.loc[sel, "AnoOffset"] * 500.0
+    layers = LayeredYearly.from_dense(yearly, cars)
+    ov = layers.overrides[layers.overrides["Coluna"].isin(["TaxaDepreciacao_%", "Manutencao_USD"])]
+    assert not ov["CarID"].map(cars.set_index("CarID")["Categoria"]).isin(list(curve)).any()
+    assert layers.category_defaults.loc[("Sedan", 2), "TaxaDepreciacao_%"] == 18.0
+    pd.testing.assert_frame_equal(_sorted(layers.to_dense(cars))[yearly.columns], _sorted(yearly), check_dtype=False)
+
+
+def test_category_defaults_without_year_apply_to_every_year():
+    cars, yearly = synthetic_fleet(10, seed=2)
+    old_format = {"category_defaults": [{"Categoria": "Sedan", "TaxaOcupacao_%": 99.0}]}
+    for layers in (LayeredYearly.from_dict(old_format),
+                   LayeredYearly(pd.DataFrame({"TaxaOcupacao_%": [99.0]}, index=pd.Index(["Sedan"], name="Categoria")))):
+        dense = layers.to_dense(cars.assign(Categoria="Sedan"))
+        assert (dense["TaxaOcupacao_%"] == 99.0).all() and len(dense) == 60
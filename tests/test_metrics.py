@@ -0,0 +1,99 @@
+"""Métricas por carro: VPL, TIR e payback contra referências fechadas e laços escalares."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from myluxcars.core import COST_COLUMNS, GlobalParams, compute_row_values, prepare_rows
+from myluxcars.fleet import build_fleet_matrix
+from myluxcars.metrics import car_cash_flows, car_metrics, irr, npv, payback_year
+from myluxcars.synthetic import synthetic_fleet
+
+YEARS = np.arange(1, 7)
+
+
+def scalar_irr(flows, years, lo=-0.99, hi=10.0):
+    """Bisseção escalar do VPL (referência)."""
+    def f(r):
+        return sum(c / (1.0 + r) ** t for c, t in zip(flows, years))
+    if np.sign(f(lo)) * np.sign(f(hi)) >= 0:
+        return np.nan
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        if np.sign(f(mid)) == np.sign(f(lo)):
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def test_npv_closed_form():
+    flows = np.array([[-100.0, 60.0, 60.0], [10.0, 0.0, 0.0]])
+    years = np.arange(1, 4)
+    expected = [-100 / 1.1 + 60 / 1.1 ** 2 + 60 / 1.1 ** 3, 10 / 1.1]
+    np.testing.assert_allclose(npv(flows, years, 0.1), expected, rtol=1e-12)
+    # Taxa por linha (broadcast)
+    np.testing.assert_allclose(npv(flows, years, [0.0, 0.5]), [20.0, 10 / 1.5], rtol=1e-12)
+
+
+def test_irr_known_values():
+    years = np.arange(1, 4)
+    flows = np.array([
+        [-100.0, 110.0, 0.0],          # 10%
+        [-100.0, 0.0, 121.0],          # 10%
+        [-1000.0, 500.0, 600.0],       # raiz de 1000x² − 500x − 600 = 0, x = 1 + r
+        [100.0, 50.0, 10.0],           # sem troca de sinal
+        [-100.0, -50.0, -10.0],
+    ])
+    x = (500 + np.sqrt(500 ** 2 + 4 * 1000 * 600)) / 2000
+    np.testing.assert_allclose(irr(flows, years)[:3], [0.1, 0.1, x - 1], rtol=1e-9)
+    assert np.isnan(irr(flows, years)[3:]).all()
+
+
+def test_irr_matches_scalar_bisection_on_random_flows():
+    rng = np.random.default_rng(0)
+    flows = rng.normal(20, 40, (300, 6))
+    flows[:, 0] -= rng.uniform(50, 300, 300)
+    result = irr(flows, YEARS)
+    expected = np.array([scalar_irr(row, YEARS) for row in flows])
+    np.testing.assert_array_equal(np.isnan(result), np.isnan(expected))
+    ok = ~np.isnan(expected)
+    np.testing.assert_allclose(result[ok], expected[ok], rtol=1e-7, atol=1e-9)
+    # Na TIR o VPL é zero (relativo à escala dos fluxos descontados, enorme perto de −99%)
+    scale = npv(np.abs(flows[ok]), YEARS, result[ok])
+    assert (np.abs(npv(flows[ok], YEARS, result[ok])) <= 1e-9 * scale).all()
+
+
+def test_payback_year():
+    flows = np.array([
+        [-100.0, 30.0, 40.0, 50.0, 0.0, 0.0],
+        [0.0, 0.0, -50.0, 20.0, 20.0, 20.0],
+        [-100.0, 10.0, 10.0, 10.0, 10.0, 10.0],
+    ])
+    active = np.array([
+        [True] * 6,
+        [False, False, True, True, True, True],
+        [True] * 6,
+    ])
+    result = payback_year(flows, YEARS, active)
+    assert result[:2].tolist() == [4.0, 6.0]
+    assert np.isnan(result[2])
+
+
+@pytest.mark.parametrize("loan_mode", ["legado", "amortizacao"])
+def test_car_cash_flows_match_row_engine(loan_mode):
+    cars, yearly = synthetic_fleet(40, seed=9)
+    params = GlobalParams(loan_mode=loan_mode, down_payment_rate=0.1)
+    fm = build_fleet_matrix(cars, yearly, params.horizon_years)
+    flows = car_cash_flows(fm, params)
+
+    y = compute_row_values(prepare_rows(cars, yearly, params.horizon_years), params)
+    costs = y[[c.replace("_USD", "") for c in COST_COLUMNS]].sum(axis=1)
+    row_flow = (y["ReceitaLiquida"] - costs - y["JurosPL"] - y["Principal"]
+                + y["VendaValorContabil"].fillna(0.0) - y["Entrada"])
+    expected = (pd.DataFrame({"CarID": y["CarID"], "Ano": y["AnoOffset"], "Fluxo": row_flow})
+                .pivot(index="CarID", columns="Ano", values="Fluxo").reindex(fm.car_ids))
+    np.testing.assert_allclose(flows, expected.to_numpy(), rtol=1e-9, atol=1e-6)
+
+    metrics = car_metrics(fm, params, 0.08)
+    np.testing.assert_allclose(metrics["VPL"], npv(expected.to_numpy(), YEARS, 0.08), rtol=1e-9)
@@ -0,0 +1,67 @@
+"""Modelo mensal: reduz-se ao anual com compra e venda em janeiro e curvas planas."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from myluxcars.core import GlobalParams, compute_per_year_tables
+from myluxcars.monthly import compute_monthly_tables, monthly_sums
+from myluxcars.synthetic import synthetic_fleet
+
+
+@pytest.fixture
+def fleet():
+    return synthetic_fleet(150, seed=21)
+
+
+@pytest.mark.parametrize("horizon_years", [3, 6])
+@pytest.mark.parametrize("financing_term", [3, 5])
+@pytest.mark.parametrize("explicit_months", [False, True])
+def test_reduces_to_annual_engine(fleet, horizon_years, financing_term, explicit_months):
+    # MesCompra = MesVenda = 1: opera de janeiro do AnoCompra a dezembro do ano anterior ao
+    # AnoVenda e é vendido em janeiro do AnoVenda – os mesmos anos cheios do modelo anual
+    cars, yearly = fleet
+    if explicit_months:
+        cars = cars.assign(MesCompra=1, MesVenda=1)
+    params = GlobalParams(horizon_years=horizon_years, financing_term=financing_term)
+    expected = compute_per_year_tables(cars, yearly, params)
+    result = compute_monthly_tables(cars, yearly, params)
+    for key in ("PnL", "Cash"):
+        pd.testing.assert_frame_equal(result[key], expected[key], rtol=1e-9, check_dtype=False)
+    assert len(result["Mensal"]) == horizon_years * 12
+
+
+def test_flat_seasonality_factors_change_nothing(fleet):
+    cars, yearly = fleet
+    params = GlobalParams()
+    flat = {"*": {"TaxaOcupacao_%": [1.0] * 12, "PrecoDiaria": [1.0] * 12}}
+    pd.testing.assert_frame_equal(compute_monthly_tables(cars, yearly, params, flat)["PnL"],
+                                  compute_per_year_tables(cars, yearly, params)["PnL"], rtol=1e-9, check_dtype=False)
+
+
+def test_mid_year_purchase_and_sale_months():
+    cars, yearly = synthetic_fleet(1, seed=0)
+    yearly = yearly.assign(AnoCompra=2, AnoVenda=4.0)
+    cars = cars.assign(MesCompra=7, MesVenda=4)
+    months = monthly_sums(cars, yearly, GlobalParams())
+    active = months["CarrosAtivos"].unstack("Mes")
+    # julho do ano 2 a março do ano 4
+    assert active.sum(axis=1).tolist() == [0, 6, 12, 3, 0, 0]
+    assert months["VendaValorContabil"].gt(0).sum() == 1
+    assert months.loc[(4, 4), "VendaValorContabil"] > 0
+    # depreciação só nos meses ativos: 21 meses a 1/12 da taxa anual de cada ano
+    preco = cars["PrecoCompra"].iloc[0]
+    taxa = yearly.set_index("AnoOffset")["TaxaDepreciacao_%"] / 100.0
+    expected = preco * (taxa[2] * 6 + taxa[3] * 12 + taxa[4] * 3) / 12
+    assert months["Depreciacao"].sum() == pytest.approx(expected, rel=1e-12)
+    assert months.loc[(4, 4), "VendaValorContabil"] == pytest.approx(max(preco - expected, 0.0), rel=1e-12)
+    np.testing.assert_allclose(months["ReceitaBruta"].to_numpy()[active.to_numpy().ravel() == 0], 0.0)
+
+
+def test_december_sale_keeps_the_car_through_november():
+    # Venda no mês MesVenda do AnoVenda: com MesVenda=12 o carro ainda opera 11 meses no ano da venda
+    cars, yearly = synthetic_fleet(1, seed=0)
+    yearly = yearly.assign(AnoCompra=1, AnoVenda=3.0)
+    months = monthly_sums(cars.assign(MesCompra=1, MesVenda=12), yearly, GlobalParams())
+    assert months["CarrosAtivos"].groupby(level="Ano").sum().tolist() == [12, 12, 11, 0, 0, 0]
+    assert months.loc[(3, 12), "VendaValorContabil"] > 0
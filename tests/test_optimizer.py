@@ -0,0 +1,95 @@
+"""Otimizador de calendário: escolha por carro contra busca exaustiva."""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from myluxcars.core import GlobalParams
+from myluxcars.fleet import build_fleet_matrix
+from myluxcars.metrics import car_cash_flows, npv
+from myluxcars.optimizer import apply_schedule, candidate_schedules, optimize_schedule
+from myluxcars.synthetic import synthetic_fleet
+
+PARAMS = GlobalParams(horizon_years=4)
+
+
+def brute_force_values(cars, yearly, params, compra, venda, discount_rate):
+    """Objetivo ``(candidatos, carros)`` reavaliando a frota inteira com cada calendário."""
+    values, capital = [], []
+    for c, v in zip(compra, venda):
+        plan = yearly.assign(AnoCompra=c, AnoVenda=v)
+        fm = build_fleet_matrix(cars, plan, params.horizon_years)
+        values.append(npv(car_cash_flows(fm, params), fm.years, discount_rate))
+        capital.append(np.where(fm.activity()[0], fm.preco, 0.0))
+    return np.array(values), np.array(capital)
+
+
+@pytest.fixture
+def fleet():
+    return synthetic_fleet(6, seed=12)
+
+
+def test_candidates():
+    compra, venda = candidate_schedules(3)
+    assert list(zip(compra, np.nan_to_num(venda))) == [(1, 2), (1, 3), (1, 0), (2, 3), (2, 0), (3, 0)]
+    compra, _ = candidate_schedules(3, allow_skip=True)
+    assert np.isnan(compra[-1])
+
+
+def test_unconstrained_picks_the_best_schedule_per_car(fleet):
+    cars, yearly = fleet
+    fm = build_fleet_matrix(cars, yearly, PARAMS.horizon_years)
+    result = optimize_schedule(fm, PARAMS, discount_rate=0.1, processes=1)
+    compra, venda = candidate_schedules(PARAMS.horizon_years)
+    values, _ = brute_force_values(cars, yearly, PARAMS, compra, venda, 0.1)
+    np.testing.assert_allclose(result.schedule["Objetivo"], values.max(axis=0), rtol=1e-9)
+    assert result.feasible and result.objective >= result.current_objective - 1e-6
+
+    # O calendário aplicado reproduz o objetivo
+    fm_new = build_fleet_matrix(cars, apply_schedule(yearly, result.schedule), PARAMS.horizon_years)
+    np.testing.assert_allclose(npv(car_cash_flows(fm_new, PARAMS), fm_new.years, 0.1), result.schedule["Objetivo"],
+                               rtol=1e-9)
+
+
+def test_capital_constraint_is_respected_and_near_optimal(fleet):
+    cars, yearly = fleet
+    cars = cars.iloc[:4]
+    fm = build_fleet_matrix(cars, yearly, PARAMS.horizon_years)
+    limit = float(cars["PrecoCompra"].sum()) * 0.5
+    result = optimize_schedule(fm, PARAMS, discount_rate=0.1, constraint="capital", limit=limit, processes=1)
+    assert result.feasible
+    assert (result.usage <= limit * (1 + 1e-6)).all()
+
+    compra, venda = candidate_schedules(PARAMS.horizon_years, allow_skip=True)
+    values, capital = brute_force_values(cars, yearly, PARAMS, compra, venda, 0.1)
+    best = -np.inf
+    for choice in itertools.product(range(len(compra)), repeat=len(cars)):
+        idx = np.arange(len(cars))
+        if (capital[list(choice), idx].sum(axis=0) <= limit).all():
+            best = max(best, values[list(choice), idx].sum())
+    assert result.objective <= best + 1e-6
+    assert result.objective >= best - 0.05 * abs(best)
+
+
+def test_invalid_arguments(fleet):
+    cars, yearly = fleet
+    fm = build_fleet_matrix(cars, yearly, PARAMS.horizon_years)
+    with pytest.raises(ValueError):
+        optimize_schedule(fm, PARAMS, objective="lucro")
+    with pytest.raises(ValueError):
+        optimize_schedule(fm, PARAMS, constraint="frota")
+
+
+def test_minimum_cash_constraint(fleet):
+    cars, yearly = fleet
+    params = GlobalParams(horizon_years=4, team_cost_by_year={y: 20_000.0 for y in range(1, 7)})
+    fm = build_fleet_matrix(cars, yearly, params.horizon_years)
+    result = optimize_schedule(fm, params, objective="caixa", constraint="caixa_minimo", limit=-50_000.0,
+                               processes=1)
+    assert result.feasible
+    # Fluxo da frota menos custos fixos, por ano, com o calendário escolhido
+    fm_new = build_fleet_matrix(cars, apply_schedule(yearly, result.schedule), params.horizon_years)
+    by_year = car_cash_flows(fm_new, params).sum(axis=0) - 20_000.0
+    assert (by_year >= -50_000.0 - 1e-3).all()
+    np.testing.assert_allclose(result.usage.to_numpy() - 20_000.0, by_year, rtol=1e-5)
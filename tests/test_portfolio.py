@@ -0,0 +1,63 @@
+"""Portfólio: frotas lidas em paralelo, memo por arquivo e consolidado."""
+
+import threading
+
+import pandas as pd
+import pytest
+
+from myluxcars import portfolio
+from myluxcars.core import GlobalParams, compute_per_year_tables
+from myluxcars.memo import MemoCache
+from myluxcars.project import save_project
+from myluxcars.synthetic import synthetic_fleet
+
+
+@pytest.fixture
+def fleet_dir(tmp_path):
+    fleets = {}
+    for i, name in enumerate(["miami", "orlando", "tampa"]):
+        cars, yearly = synthetic_fleet(30 + 10 * i, seed=i)
+        params = GlobalParams(horizon_years=4 + i)
+        suffix = ".sqlite" if name == "tampa" else ".json"
+        save_project(str(tmp_path / f"{name}{suffix}"), cars, yearly, params)
+        fleets[name] = compute_per_year_tables(cars, yearly, params)
+    (tmp_path / "quebrado.json").write_text("{", encoding="utf-8")
+    return tmp_path, fleets
+
+
+def test_small_directories_load_in_threads(fleet_dir, monkeypatch):
+    path, fleets = fleet_dir
+    threads = set()
+    evaluate = portfolio.evaluate_fleet
+
+    def recording(*args):
+        threads.add(threading.current_thread().name)
+        return evaluate(*args)
+
+    monkeypatch.setattr(portfolio, "evaluate_fleet", recording)
+    result = portfolio.evaluate_portfolio(str(path), cache=MemoCache())
+    assert threads and all(name.startswith("myluxcars-frota") for name in threads)
+    assert list(result.fleets) == ["miami", "orlando", "tampa"]
+    assert list(result.errors) == ["quebrado"]
+    for name, tables in fleets.items():
+        pd.testing.assert_frame_equal(result.fleets[name].tables["Cash"], tables["Cash"], check_dtype=False)
+
+
+def test_consolidated_matches_sequential_and_sums_fleets(fleet_dir):
+    path, fleets = fleet_dir
+    parallel = portfolio.evaluate_portfolio(str(path), cache=MemoCache()).consolidated()
+    sequential = portfolio.evaluate_portfolio(str(path), processes=1, cache=MemoCache()).consolidated()
+    pd.testing.assert_frame_equal(parallel["PnL"], sequential["PnL"])
+    expected = pd.concat([t["PnL"]["LucroLiquido"] for t in fleets.values()]).groupby(level=0).sum()
+    pd.testing.assert_series_equal(parallel["PnL"]["LucroLiquido"], expected, check_names=False)
+
+
+def test_unchanged_files_come_from_the_memo(fleet_dir, monkeypatch):
+    path, _ = fleet_dir
+    cache = MemoCache()
+    portfolio.evaluate_portfolio(str(path), cache=cache)
+    calls = []
+    monkeypatch.setattr(portfolio, "evaluate_fleet", lambda *a: calls.append(a))
+    result = portfolio.evaluate_portfolio(str(path), cache=cache)
+    assert [a[0] for a in calls] == [str(path / "quebrado.json")]
+    assert len(result.fleets) == 3
@@ -0,0 +1,108 @@
+"""Histórico de versões em delta do projeto (:class:`myluxcars.snapshots.SnapshotStore`)."""
+
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from myluxcars.core import GlobalParams, compute_per_year_tables
+from myluxcars.project import load_project
+from myluxcars.snapshots import SnapshotStore
+from myluxcars.synthetic import synthetic_fleet
+
+
+def tables(cars, yearly, params):
+    return compute_per_year_tables(cars, yearly, GlobalParams.from_dict(params))
+
+
+def assert_same_project(a, b):
+    for key in ("PnL", "Cash"):
+        pd.testing.assert_frame_equal(tables(*a)[key], tables(*b)[key], rtol=1e-9, check_dtype=False)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path / "frota.json"), checkpoint_every=3)
+
+
+def edits(n_versions: int, seed: int = 0):
+    """Sequência de projetos com edições, carros removidos e adicionados."""
+    rng = np.random.default_rng(seed)
+    cars, yearly = synthetic_fleet(30, seed=seed)
+    params = GlobalParams()
+    for v in range(n_versions):
+        yearly = yearly.copy()
+        pos = rng.integers(0, len(yearly), 3)
+        yearly.loc[yearly.index[pos], "PrecoDiaria"] += 10.0
+        if v % 3 == 1:
+            gone = cars["CarID"].iloc[0]
+            cars = cars.iloc[1:]
+            yearly = yearly[yearly["CarID"] != gone]
+        if v == 4:
+            params = GlobalParams(tax_rate=0.3)
+        yield cars, yearly, params
+
+
+def test_every_version_restores(store):
+    saved = []
+    for cars, yearly, params in edits(8):
+        store.save(cars, yearly, params, description="edição")
+        saved.append((cars, yearly, params.to_dict()))
+    history = store.list()
+    assert history["Versao"].tolist() == list(range(8, 0, -1))
+    assert history.loc[history["Versao"] == 4, "Checkpoint"].item()
+    # Deltas só com os carros alterados
+    assert (history.loc[~history["Checkpoint"], "Alterados"] <= 3).all()
+    for version, project in enumerate(saved, start=1):
+        assert_same_project(store.load(version), project)
+    assert_same_project(load_project(store.path), saved[-1])
+
+
+def test_diff_lists_changed_removed_and_parameters(store):
+    versions = list(edits(6))
+    for cars, yearly, params in versions:
+        store.save(cars, yearly, params)
+    diff = store.diff(1, 6)
+    assert set(diff.loc[diff["Mudanca"] == "removido", "CarID"]) == (
+        set(versions[0][0]["CarID"]) - set(versions[5][0]["CarID"]))
+    assert "tax_rate" in diff.loc[diff["Mudanca"] == "parametro", "Colunas"].tolist()
+    assert diff.loc[diff["Mudanca"] == "alterado", "Colunas"].str.contains("PrecoDiaria").all()
+
+
+def test_restore_appends_a_new_version(store):
+    versions = list(edits(4))
+    for cars, yearly, params in versions:
+        store.save(cars, yearly, params)
+    entry = store.restore(2)
+    assert entry["versao"] == 5
+    assert_same_project(load_project(store.path), store.load(2))
+
+
+def test_existing_project_becomes_first_version(store):
+    cars, yearly = synthetic_fleet(10, seed=1)
+    with open(store.path, "w", encoding="utf-8") as f:
+        json.dump({"cars": cars.to_dict("records"), "yearly": yearly.to_dict("records"), "global_params": {}}, f)
+    store.save(cars.iloc[1:], yearly, GlobalParams())
+    assert store.list()["Descricao"].tolist()[-1] == "estado inicial"
+    assert store.list()["Removidos"].iloc[0] == 1
+
+
+def test_truncated_index_line_is_ignored(store):
+    for cars, yearly, params in edits(2):
+        store.save(cars, yearly, params)
+    with open(store._index, "a", encoding="utf-8") as f:
+        f.write('{"versao": 3, "dat')
+    assert store.list()["Versao"].tolist() == [2, 1]
+
+
+def test_concurrent_saves_are_serialized(store):
+    cars, yearly = synthetic_fleet(10, seed=2)
+    threads = [threading.Thread(target=store.save, args=(cars, yearly, GlobalParams()), kwargs={"description": str(i)})
+               for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(store.list()["Versao"]) == [1, 2, 3, 4]
@@ -0,0 +1,27 @@
+"""Projeto em SQLite: gravação incremental por carro e parâmetros globais."""
+
+from myluxcars.core import GlobalParams
+from myluxcars.storage import load_project_sqlite, save_project_sqlite
+from myluxcars.synthetic import synthetic_fleet
+
+
+def test_incremental_save_round_trip(tmp_path):
+    path = str(tmp_path / "frota.sqlite")
+    cars, yearly = synthetic_fleet(40, seed=6)
+    save_project_sqlite(path, cars, yearly, GlobalParams().to_dict())
+    edited = yearly.copy()
+    edited.loc[edited.index[8], "PrecoDiaria"] = 1.0
+    counts = save_project_sqlite(path, cars.iloc[1:], edited[edited["CarID"] != cars["CarID"].iloc[0]], {})
+    assert counts == {"changed": 1, "removed": 1, "rows_written": 6}
+    loaded_cars, loaded_yearly, _ = load_project_sqlite(path)
+    assert len(loaded_cars) == 39 and len(loaded_yearly) == 39 * 6
+    assert (loaded_yearly["PrecoDiaria"] == 1.0).sum() == 1
+    assert set(loaded_cars["CarID"]) == set(cars["CarID"].iloc[1:])
+
+
+def test_removed_global_params_do_not_come_back(tmp_path):
+    path = str(tmp_path / "frota.sqlite")
+    cars, yearly = synthetic_fleet(5, seed=1)
+    save_project_sqlite(path, cars, yearly, {"horizon_years": 5, "tax_rate": 0.3})
+    save_project_sqlite(path, cars, yearly, {"horizon_years": 4})
+    assert load_project_sqlite(path)[2] == {"horizon_years": 4}
@@ -0,0 +1,66 @@
+"""Jobs em segundo plano: perfil próprio por job, separado do perfil de quem submete."""
+
+import threading
+
+from myluxcars.core import GlobalParams, compute_per_year_tables
+from myluxcars.profiling import profile_run, stage
+from myluxcars.synthetic import synthetic_fleet
+from myluxcars.worker import BackgroundRunner, report_progress
+
+
+def test_job_stages_go_to_the_job_profile():
+    cars, yearly = synthetic_fleet(20, seed=1)
+    slot = BackgroundRunner()
+    with profile_run("rerun") as run:
+        with stage("app.calculo"):
+            job = slot.submit("k", compute_per_year_tables, cars, yearly, GlobalParams(), label="Cálculo")
+            assert job.wait(10) and job.ok
+    assert [s.name for s in run.stages] == ["app.calculo"]
+    assert job.profile is not None and job.profile.label == "Cálculo"
+    names = [s.name for s in job.profile.stages]
+    assert "core.prepare_rows" in names and min(s.depth for s in job.profile.stages) == 0
+    assert slot.take_profiles() == [job.profile]
+    assert slot.take_profiles() == []
+
+
+def test_job_outliving_the_rerun_does_not_touch_its_profile():
+    release = threading.Event()
+
+    def slow():
+        release.wait(10)
+        with stage("job.etapa"):
+            report_progress(0.5)
+        return 1
+
+    slot = BackgroundRunner()
+    with profile_run("rerun") as run:
+        job = slot.submit("lento", slow)
+    release.set()
+    assert job.wait(10) and job.ok
+    assert run.stages == []
+    assert [s.name for s in job.profile.stages] == ["job.etapa"]
+
+
+def test_cancelled_job_profile_is_labelled():
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(10)
+        report_progress(0.5)
+
+    slot = BackgroundRunner()
+    with profile_run():
+        job = slot.submit("a", slow, label="lento")
+    started.wait(10)
+    job.cancel()
+    release.set()
+    assert job.wait(10) and job.cancelled
+    assert [p.label for p in slot.take_profiles()] == ["lento (cancelado)"]
+
+
+def test_no_profile_without_an_active_one():
+    slot = BackgroundRunner()
+    job = slot.submit("k", lambda: 1)
+    assert job.wait(10) and job.result == 1
+    assert job.profile is None and slot.take_profiles() == []